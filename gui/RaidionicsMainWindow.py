@@ -45,6 +45,7 @@ class WorkerThread(QThread):
 class RaidionicsMainWindow(QMainWindow):
     reload_interface = Signal()
     new_patient_clicked = Signal(str)  # Internal unique_id of the clicked patient
+    save_progress = Signal(str, str, int)  # Element name, save state, and number of saves remaining in the queue
 
     def __init__(self, application=None, *args, **kwargs):
         super(RaidionicsMainWindow, self).__init__(*args, **kwargs)
@@ -77,6 +78,10 @@ class RaidionicsMainWindow(QMainWindow):
                 event.ignore()
         if self.logs_thread.isRunning():
             self.logs_thread.stop()
+        if event.isAccepted():
+            self.__flush_save_queue()
+            SoftwareConfigResources.getInstance().stop_backend_workers()
+            SoftwareConfigResources.getInstance().close_dicom_index()
         logging.info("Graceful exit.")
 
     def resizeEvent(self, event):
@@ -99,12 +104,27 @@ class RaidionicsMainWindow(QMainWindow):
             dialog = SavePatientChangesDialog()
             code = dialog.exec()
             if code == 1:  # Operation approved
+                self.__flush_save_queue()
+                SoftwareConfigResources.getInstance().stop_backend_workers()
+                SoftwareConfigResources.getInstance().close_dicom_index()
                 logging.info("Graceful exit.")
                 sys.exit()
         else:
+            self.__flush_save_queue()
+            SoftwareConfigResources.getInstance().stop_backend_workers()
+            SoftwareConfigResources.getInstance().close_dicom_index()
             logging.info("Graceful exit.")
             sys.exit()
 
+    def __flush_save_queue(self) -> None:
+        """
+        Waiting for all patients and studies saves requested in the background to be written on disk before exiting.
+        """
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        self.statusBar().showMessage("Saving on disk before exiting...")
+        SoftwareConfigResources.getInstance().stop_save_queue()
+        QApplication.restoreOverrideCursor()
+
     def __set_interface(self):
         self.setWindowTitle("Raidionics")
         self.__get_screen_dimensions()
@@ -336,6 +356,9 @@ class RaidionicsMainWindow(QMainWindow):
         self.help_action.triggered.connect(self.__on_help_action_triggered)
         self.view_logs_action.triggered.connect(self.__on_view_logs_triggered)
         self.settings_shortcuts_action.triggered.connect(self.__on_shortcuts_action_triggered)
+        # The save progress is reported from the writer thread, hence relayed through a signal to the interface.
+        SoftwareConfigResources.getInstance().get_save_queue().progress_callback = self.save_progress.emit
+        self.save_progress.connect(self.__on_save_progress)
 
     def __cross_widgets_connections(self):
         self.welcome_widget.left_panel_single_patient_pushbutton.clicked.connect(self.__on_single_patient_clicked)
@@ -508,10 +531,23 @@ class RaidionicsMainWindow(QMainWindow):
     def __on_save_file_triggered(self):
         if SoftwareConfigResources.getInstance().get_active_patient_uid() \
                 and SoftwareConfigResources.getInstance().get_active_patient().has_unsaved_changes():
-            SoftwareConfigResources.getInstance().get_active_patient().save_patient()
+            SoftwareConfigResources.getInstance().request_patient_save(
+                SoftwareConfigResources.getInstance().get_active_patient_uid())
         if SoftwareConfigResources.getInstance().get_active_study_uid() \
                 and SoftwareConfigResources.getInstance().get_active_study().has_unsaved_changes():
-            SoftwareConfigResources.getInstance().get_active_study().save()
+            SoftwareConfigResources.getInstance().request_study_save(
+                SoftwareConfigResources.getInstance().get_active_study_uid())
+
+    def __on_save_progress(self, name: str, state: str, remaining: int) -> None:
+        """
+        Displaying in the status bar the state of the saves performed in the background.
+        """
+        if state == 'started':
+            self.statusBar().showMessage("Saving {}... ({} remaining)".format(name, remaining))
+        elif state == 'failed':
+            self.statusBar().showMessage("Saving {} failed, please check the log file.".format(name))
+        elif remaining == 0:
+            self.statusBar().showMessage("All changes saved.", 5000)
 
     def __on_download_example_data(self):
         QDesktopServices.openUrl(QUrl("https://github.com/raidionics/Raidionics-models/releases/download/v1.3.0-rc/Samples-Raidionics-ApprovedExample-v1.3.1.zip"))
@@ -198,7 +198,8 @@ class CentralAreaExecutionWidget(QLabel):
                     raise ValueError(f"Other classification use-cases not handled yet.")
 
             # Automatically saving the patient (with the latest results) for an easier loading afterwards.
-            SoftwareConfigResources.getInstance().get_active_patient().save_patient()
+            SoftwareConfigResources.getInstance().request_patient_save(
+                SoftwareConfigResources.getInstance().get_active_patient_uid())
         except Exception:
             print('{}'.format(traceback.format_exc()))
             self.on_process_finished()
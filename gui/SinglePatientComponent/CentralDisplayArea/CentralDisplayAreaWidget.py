@@ -215,11 +215,37 @@ class CentralDisplayAreaWidget(QWidget):
             logging.info("Collected: {}\n {}".format(e, traceback.format_exc()))
 
     def on_volume_contrast_changed(self, volume_uid):
+        """
+        While the contrast is being adjusted in preview mode, only the three displayed slices are recomputed, the whole
+        display volume being recomputed once the adjustment is confirmed or when the cross-hair is moved.
+        """
         # @TODO. Should group the viewer calls into another function somewhere, since all three above methods use it.
-        self.displayed_image = self.current_patient_parameters.get_mri_by_uid(volume_uid).display_volume
+        mri_volume = self.current_patient_parameters.get_mri_by_uid(volume_uid)
+        if mri_volume.has_contrast_preview() and volume_uid == self.displayed_image_uid:
+            axial_slice, coronal_slice, sagittal_slice = mri_volume.get_contrast_preview_slices(
+                self.point_clicker_position)
+            self.axial_viewer.update_slice_view(axial_slice, self.point_clicker_position[0],
+                                                self.point_clicker_position[1])
+            self.coronal_viewer.update_slice_view(coronal_slice, self.point_clicker_position[0],
+                                                  self.point_clicker_position[2])
+            self.sagittal_viewer.update_slice_view(sagittal_slice, self.point_clicker_position[1],
+                                                   self.point_clicker_position[2])
+            return
+        self.displayed_image = mri_volume.display_volume
         self.displayed_image_uid = volume_uid
         self.update_viewers_image()
 
+    def __apply_contrast_preview(self) -> None:
+        """
+        The displayed image must be fully up-to-date before showing slices at a new cross-hair position, which
+        recomputes the display volume if its contrast was only previewed on the displayed slices.
+        """
+        if self.displayed_image_uid is None or self.current_patient_parameters is None:
+            return
+        if self.displayed_image_uid in self.current_patient_parameters.get_all_mri_volumes_uids() and \
+                self.current_patient_parameters.get_mri_by_uid(self.displayed_image_uid).has_contrast_preview():
+            self.displayed_image = self.current_patient_parameters.get_mri_by_uid(self.displayed_image_uid).display_volume
+
     def update_viewers_image(self):
         """
         Further send the current display image, at the selected point clicker position, to each of the 2D viewers
@@ -257,13 +283,14 @@ class CentralDisplayAreaWidget(QWidget):
 
     def on_atlas_structure_view_toggled(self, atlas_uid, structure_index, state):
         """
-
+        The structure is overlaid through an AtlasStructureMask, for which the binary slices are derived on-demand
+        from the atlas label volume every time the displayed position changes.
         """
         try:
             joint_uid = atlas_uid + '_' + str(structure_index)
             if state:
                 self.current_patient_parameters = SoftwareConfigResources.getInstance().patients_parameters[SoftwareConfigResources.getInstance().active_patient_name]
-                self.overlaid_volumes[joint_uid] = self.current_patient_parameters.get_atlas_by_uid(atlas_uid).get_one_hot_display_volume()[..., structure_index]
+                self.overlaid_volumes[joint_uid] = self.current_patient_parameters.get_atlas_by_uid(atlas_uid).get_structure_mask(structure_index)
                 self.axial_viewer.update_atlas_view(atlas_uid, structure_index, self.overlaid_volumes[joint_uid][:, :, self.point_clicker_position[2]])
                 self.coronal_viewer.update_atlas_view(atlas_uid, structure_index, self.overlaid_volumes[joint_uid][:, self.point_clicker_position[1], :])
                 self.sagittal_viewer.update_atlas_view(atlas_uid, structure_index, self.overlaid_volumes[joint_uid][self.point_clicker_position[0], :, :])
@@ -314,6 +341,7 @@ class CentralDisplayAreaWidget(QWidget):
         When a new location is clicked in the axial plane, the same location is set in focus in the coronal and
         sagittal plane, for the main MRI volume and all overlaid annotations.
         """
+        self.__apply_contrast_preview()
         self.point_clicker_position[0] = min(max(0, y), self.displayed_image.shape[0] - 1)
         self.point_clicker_position[1] = min(max(0, x), self.displayed_image.shape[1] - 1)
         # print("3D point: [{}, {}, {}]".format(self.point_clicker_position[0], self.point_clicker_position[1], self.point_clicker_position[2]))
@@ -325,6 +353,7 @@ class CentralDisplayAreaWidget(QWidget):
             self.sagittal_viewer.update_annotation_view(k, self.overlaid_volumes[k][self.point_clicker_position[0], :, :])
 
     def __on_coronal_coordinates_changed(self, x, y):
+        self.__apply_contrast_preview()
         self.point_clicker_position[0] = min(max(0, y), self.displayed_image.shape[0] - 1)
         self.point_clicker_position[2] = min(max(0, x), self.displayed_image.shape[2] - 1)
         # print("3D point: [{}, {}, {}]".format(self.point_clicker_position[0], self.point_clicker_position[1], self.point_clicker_position[2]))
@@ -336,6 +365,7 @@ class CentralDisplayAreaWidget(QWidget):
             self.sagittal_viewer.update_annotation_view(k, self.overlaid_volumes[k][self.point_clicker_position[0], :, :])
 
     def __on_sagittal_coordinates_changed(self, x, y):
+        self.__apply_contrast_preview()
         self.point_clicker_position[1] = min(max(0, y), self.displayed_image.shape[1] - 1)
         self.point_clicker_position[2] = min(max(0, x), self.displayed_image.shape[2] - 1)
         # print("3D point: [{}, {}, {}]".format(self.point_clicker_position[0], self.point_clicker_position[1], self.point_clicker_position[2]))
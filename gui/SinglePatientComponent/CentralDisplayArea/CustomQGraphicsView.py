@@ -1,16 +1,23 @@
-from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem, QGraphicsOpacityEffect
+from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsPixmapItem
 from PySide6.QtGui import QPixmap, QImage, QPen, QColor, QTransform
-from PySide6.QtCore import Qt, Signal, QPoint, QSize
+from PySide6.QtCore import Qt, Signal, QPoint, QSize, QTimer
 import numpy as np
 import os
 import logging
 
-from scipy.ndimage import rotate
-
 from utils.software_config import SoftwareConfigResources
 from gui.UtilsWidgets.CustomQDialog.ImportDataQDialog import ImportDataQDialog
 
 
+def to_display_orientation(slice_2d: np.ndarray) -> np.ndarray:
+    """
+    Set of transforms to view the different slices as they should (similar to ITK-Snap), i.e. a horizontal flip
+    followed by a 90 degrees clockwise rotation. Expressed as a transpose and flips, hence returning a view of the
+    slice without any interpolation nor copy.
+    """
+    return slice_2d.T[::-1, ::-1]
+
+
 class CustomQGraphicsView(QGraphicsView):
     """
 
@@ -30,9 +37,13 @@ class CustomQGraphicsView(QGraphicsView):
         self.view_type = view_type
         self.original_annotations = {}  # Placeholder for the raw annotation 2d slices
         self.display_annotations = {}  # Placeholder for the annotation 2d slices, after display transform
-        self.overlaid_items = {}  # Placeholder for the QGraphicsPixmapItem
         # Placeholder for color and opacity for now: {color:QColor(255,255,255), opacity:0.5}
         self.overlaid_items_display_parameters = {}
+        # All overlays are composited into a single RGBA image, with buffers reused as long as the slice shape is kept
+        self.overlay_premultiplied_colors = None
+        self.overlay_alpha = None
+        self.overlay_buffer = None
+        self.overlay_repaint_pending = False
 
         self.right_button_on_hold = False
         self.left_button_on_hold = False
@@ -73,6 +84,8 @@ class CustomQGraphicsView(QGraphicsView):
         self.pixmap = QPixmap.fromImage(qimage)
         self.image_item = QGraphicsPixmapItem(self.pixmap)
         self.scene.addItem(self.image_item)
+        self.overlay_item = QGraphicsPixmapItem()
+        self.scene.addItem(self.overlay_item)
 
         pen = QPen()
         pen.setColor(QColor(60, 255, 137))
@@ -245,11 +258,6 @@ class CustomQGraphicsView(QGraphicsView):
         """
 
         """
-        if not annotation_uid in self.overlaid_items.keys():
-            self.original_annotations[annotation_uid] = None
-            self.display_annotations[annotation_uid] = None
-            self.overlaid_items[annotation_uid] = QGraphicsPixmapItem()
-            self.scene.addItem(self.overlaid_items[annotation_uid])
         if not annotation_uid in self.overlaid_items_display_parameters.keys():
             annotation_color = SoftwareConfigResources.getInstance().get_active_patient().get_annotation_by_uid(annotation_uid).display_color
             self.overlaid_items_display_parameters[annotation_uid] = {"color": QColor.fromRgb(annotation_color[0],
@@ -259,21 +267,14 @@ class CustomQGraphicsView(QGraphicsView):
                                                                       "opacity": float(SoftwareConfigResources.getInstance().get_active_patient().get_annotation_by_uid(annotation_uid).get_display_opacity() / 100.)}
 
         self.original_annotations[annotation_uid] = annotation_slice
-        image_2d = annotation_slice[:, ::-1]
-        image_2d = rotate(image_2d, -90).astype('uint8')
-        self.display_annotations[annotation_uid] = image_2d
-        self.__repaint_overlay(annotation_uid)
+        self.display_annotations[annotation_uid] = to_display_orientation(annotation_slice)
+        self.__schedule_overlays_repaint()
 
     def update_atlas_view(self, atlas_uid, structure_index, slice):
         """
 
         """
         joint_uid = atlas_uid + '_' + str(structure_index)
-        if not joint_uid in self.overlaid_items.keys():
-            self.original_annotations[joint_uid] = None
-            self.display_annotations[joint_uid] = None
-            self.overlaid_items[joint_uid] = QGraphicsPixmapItem()
-            self.scene.addItem(self.overlaid_items[joint_uid])
         if not joint_uid in self.overlaid_items_display_parameters.keys():
             color = SoftwareConfigResources.getInstance().get_active_patient().get_atlas_by_uid(atlas_uid).get_all_class_display_color()[structure_index]
             opacity = SoftwareConfigResources.getInstance().get_active_patient().get_atlas_by_uid(atlas_uid).get_all_class_opacity()[structure_index]
@@ -282,10 +283,8 @@ class CustomQGraphicsView(QGraphicsView):
                                                                  "opacity": opacity / 100.}
 
         self.original_annotations[joint_uid] = slice
-        image_2d = slice[:, ::-1]
-        image_2d = rotate(image_2d, -90).astype('uint8')
-        self.display_annotations[joint_uid] = image_2d
-        self.__repaint_overlay(joint_uid)
+        self.display_annotations[joint_uid] = to_display_orientation(slice)
+        self.__schedule_overlays_repaint()
 
     def reset_viewer(self):
         """
@@ -295,41 +294,37 @@ class CustomQGraphicsView(QGraphicsView):
         self.update_slice_view(np.zeros((150, 150), dtype="uint8"), 75, 75)
 
     def cleanse_annotations(self):
-        for k in list(self.overlaid_items):
+        for k in list(self.display_annotations):
             self.remove_annotation_view(k)
         self.overlaid_items_display_parameters.clear()
 
     def remove_annotation_view(self, annotation_uid):
-        graphics_item = self.overlaid_items[annotation_uid]
-        self.scene.removeItem(graphics_item)
-        self.overlaid_items.pop(annotation_uid)
         self.original_annotations.pop(annotation_uid)
         self.display_annotations.pop(annotation_uid)
+        self.__schedule_overlays_repaint()
         # Should we keep the last parameters, so that it shows back as it was when it's toggled back, rather than
         # set to default values? Not much memory use for this.
         # self.overlaid_items_display_parameters.pop(annotation_uid)
 
     def remove_atlas_view(self, atlas_uid, structure_index):
         joint_uid = atlas_uid + '_' + str(structure_index)
-        graphics_item = self.overlaid_items[joint_uid]
-        self.scene.removeItem(graphics_item)
-        self.overlaid_items.pop(joint_uid)
         self.original_annotations.pop(joint_uid)
         self.display_annotations.pop(joint_uid)
+        self.__schedule_overlays_repaint()
 
     def update_annotation_opacity(self, annotation_uid, value):
         """
         Opacity value comes from a QSlider with a value in the range [0, 100]
         """
         self.overlaid_items_display_parameters[annotation_uid]["opacity"] = value / 100.
-        self.__repaint_overlay(annotation_uid)
+        self.__schedule_overlays_repaint()
 
     def update_annotation_color(self, annotation_uid, color):
         """
         Update to the display color for the current annotation, indicated by annotation_uid.
         """
         self.overlaid_items_display_parameters[annotation_uid]["color"] = color
-        self.__repaint_overlay(annotation_uid)
+        self.__schedule_overlays_repaint()
 
     def __update_point_clicker_lines(self, posx, posy):
         """
@@ -368,19 +363,16 @@ class CustomQGraphicsView(QGraphicsView):
         # Set of transforms to view the different slices as they should (similar to ITK-Snap)
         self.slice = slice
         self.original_2d_point = QPoint(x, y)
-        image_2d = slice[:, ::-1]
-        image_2d = rotate(image_2d, -90).astype('uint8')
+        # QImage requires a contiguous buffer, which is the only copy performed
+        image_2d = np.ascontiguousarray(to_display_orientation(slice), dtype=np.uint8)
 
-        # Set of operations to prepare the color QImage
+        # The grayscale slice is used as is, without building an RGB stack
         h, w = image_2d.shape
         self.display_2d = image_2d
         self.ini_slice_shape = slice.shape
         self.image_2d_w = w
         self.image_2d_h = h
-        bytes_per_line = 3 * w
-        color_image = np.stack([image_2d] * 3, axis=-1)
-        qimage = QImage(color_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        qimage = qimage.convertToFormat(QImage.Format_RGBA8888)
+        qimage = QImage(image_2d.data, w, h, w, QImage.Format_Grayscale8)
         scale_ratio = min((self.parent.size().width() / 2) / qimage.size().width(), (self.parent.size().height() / 2) / qimage.size().height())
         # scale_ratio = min(self.size().width() / qimage.size().width(),
         #                   self.size().height() / qimage.size().height())
@@ -394,6 +386,7 @@ class CustomQGraphicsView(QGraphicsView):
         self.pixmap = QPixmap.fromImage(qimage)
 
         self.image_item.setPixmap(self.pixmap)
+        self.overlay_item.setTransform(self.map_transform)
 
         # Converting back the graphical clicked point, based on the custom set of transforms to match ITK-Snap
         graphics_point = self.map_transform.map(QPoint(self.image_2d_w - y, self.image_2d_h - x))
@@ -407,10 +400,7 @@ class CustomQGraphicsView(QGraphicsView):
         Full repainting of the scene, including the MRI volume, the point-position lines, and every overlay.
         """
         h, w = self.display_2d.shape
-        bytes_per_line = 3 * w
-        color_image = np.stack([self.display_2d] * 3, axis=-1)
-        qimage = QImage(color_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        qimage = qimage.convertToFormat(QImage.Format_RGBA8888)
+        qimage = QImage(self.display_2d.data, w, h, w, QImage.Format_Grayscale8)
         scale_ratio = min((self.parent.size().width() / 2) / qimage.size().width(), (self.parent.size().height() / 2) / qimage.size().height())
         # scale_ratio = min(self.size().width() / qimage.size().width(),
         #                   self.size().height() / qimage.size().height())
@@ -429,35 +419,59 @@ class CustomQGraphicsView(QGraphicsView):
         self.graphical_2d_point = self.map_transform.map(self.adapted_2d_point)
         self.__update_point_clicker_lines(self.graphical_2d_point.x(), self.graphical_2d_point.y())
 
-        for anno in list(self.original_annotations.keys()):
-            self.__repaint_overlay(anno)
+        # The composited overlays are only rescaled, not recomputed
+        self.overlay_item.setTransform(self.map_transform)
 
-    def __repaint_overlay(self, overlay_uid):
+    def __schedule_overlays_repaint(self):
         """
-        Recomputes the QPixmap, updates the QGraphicsPixmapItem, which repaints the scene accordingly for the
-        specified annotation to overlay indicated by overlay_uid.
+        Overlays are typically updated one after the other (e.g., for every toggled annotation and atlas structure
+        when the position changes), hence a single repaint is performed for all of them once back in the event loop.
         """
-        overlay_image = self.display_annotations[overlay_uid]
-        h, w = overlay_image.shape
-        bytes_per_line = 3 * w
-        # Coloring the annotation according to the chosen palette
-        color_image = np.stack([np.zeros(overlay_image.shape, dtype=np.uint8)] * 3, axis=-1)
-        color_image[..., 0][overlay_image != 0] = self.overlaid_items_display_parameters[overlay_uid]["color"].red()
-        color_image[..., 1][overlay_image != 0] = self.overlaid_items_display_parameters[overlay_uid]["color"].green()
-        color_image[..., 2][overlay_image != 0] = self.overlaid_items_display_parameters[overlay_uid]["color"].blue()
-        qimage = QImage(color_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        qimage = qimage.convertToFormat(QImage.Format_RGBA8888)
-
-        # Manually setting up the alpha channel to have proper background transparency
-        alpha_channel = np.zeros(overlay_image.shape, dtype=np.uint8)
-        alpha_channel[overlay_image != 0] = 255
-        qimage.setAlphaChannel(QImage(alpha_channel.data, w, h, w, QImage.Format_Alpha8))
+        if not self.overlay_repaint_pending:
+            self.overlay_repaint_pending = True
+            QTimer.singleShot(0, self.__repaint_overlays)
 
-        # Updating the QGraphicsPixmapItem with the QPixmap, after transformation to fit the display space
-        qimage = qimage.transformed(self.map_transform)
-        self.overlaid_items[overlay_uid].setPixmap(QPixmap.fromImage(qimage))
-
-        # Setting up the opacity for the given QGraphicsPixmapItem
-        opacity = QGraphicsOpacityEffect()
-        opacity.setOpacity(self.overlaid_items_display_parameters[overlay_uid]["opacity"])
-        self.overlaid_items[overlay_uid].setGraphicsEffect(opacity)
+    def __repaint_overlays(self):
+        """
+        Composites all overlays (in the order they were toggled) into a single RGBA image, with the color and opacity
+        of each overlay, and updates the overlay QGraphicsPixmapItem, which repaints the scene accordingly.
+        The compositing follows the "over" operator on premultiplied colors, only touching the pixels covered by each
+        overlay, and the buffers are reused between repaints.
+        """
+        self.overlay_repaint_pending = False
+        overlays = [k for k in self.display_annotations.keys() if self.display_annotations[k] is not None]
+        if len(overlays) == 0:
+            self.overlay_item.setPixmap(QPixmap())
+            return
+
+        h, w = self.display_annotations[overlays[0]].shape
+        if self.overlay_buffer is None or self.overlay_buffer.shape[:2] != (h, w):
+            self.overlay_premultiplied_colors = np.zeros((h, w, 3), dtype=np.float32)
+            self.overlay_alpha = np.zeros((h, w), dtype=np.float32)
+            self.overlay_buffer = np.zeros((h, w, 4), dtype=np.uint8)
+        else:
+            self.overlay_premultiplied_colors.fill(0.)
+            self.overlay_alpha.fill(0.)
+
+        for overlay_uid in overlays:
+            overlay_image = self.display_annotations[overlay_uid]
+            if overlay_image.shape != (h, w):
+                continue
+            covered_pixels = np.nonzero(overlay_image)
+            if len(covered_pixels[0]) == 0:
+                continue
+            color = self.overlaid_items_display_parameters[overlay_uid]["color"]
+            opacity = self.overlaid_items_display_parameters[overlay_uid]["opacity"]
+            self.overlay_premultiplied_colors[covered_pixels] = self.overlay_premultiplied_colors[covered_pixels] * \
+                                                                (1. - opacity) + \
+                                                                np.array([color.red(), color.green(), color.blue()],
+                                                                         dtype=np.float32) * opacity
+            self.overlay_alpha[covered_pixels] = self.overlay_alpha[covered_pixels] * (1. - opacity) + opacity
+
+        np.copyto(self.overlay_buffer[..., :3], self.overlay_premultiplied_colors, casting='unsafe')
+        np.multiply(self.overlay_alpha, 255., out=self.overlay_alpha)
+        np.copyto(self.overlay_buffer[..., 3], self.overlay_alpha, casting='unsafe')
+        qimage = QImage(self.overlay_buffer.data, w, h, 4 * w, QImage.Format_RGBA8888_Premultiplied)
+        # The QPixmap holds its own copy of the buffer, which can then be safely reused for the next repaint
+        self.overlay_item.setPixmap(QPixmap.fromImage(qimage))
+        self.overlay_item.setTransform(self.map_transform)
@@ -298,7 +298,7 @@ class SinglePatientResultsWidget(QCollapsibleWidget):
         """
         @TODO. Ideally the push button should only be visible when there is something to save for the patient.
         """
-        SoftwareConfigResources.getInstance().get_patient(self.uid).save_patient()
+        SoftwareConfigResources.getInstance().request_patient_save(self.uid)
 
     def __on_patient_closed(self) -> None:
         """
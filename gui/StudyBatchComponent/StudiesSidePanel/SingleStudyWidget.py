@@ -176,6 +176,9 @@ class SingleStudyWidget(QCollapsibleWidget):
         self.processing_progressbar = QProgressBar()
         self.processing_progressbar.setVisible(False)
         self.processing_layout.addWidget(self.processing_progressbar)
+        self.processing_memory_label = QLabel()
+        self.processing_memory_label.setVisible(False)
+        self.processing_layout.addWidget(self.processing_memory_label)
         self.content_layout.addLayout(self.processing_layout)
 
     def __set_layout_dimensions(self):
@@ -201,6 +204,7 @@ class SingleStudyWidget(QCollapsibleWidget):
         self.processing_layout_text_display_label.setFixedHeight(20)
         self.processing_progressbar.setFixedHeight(20)
         self.processing_progressbar.setMinimumWidth(100)
+        self.processing_memory_label.setFixedHeight(20)
 
     def __set_connections(self):
         self.toggled.connect(self.__on_study_toggled)
@@ -423,6 +427,14 @@ class SingleStudyWidget(QCollapsibleWidget):
         font-size:13px;
         }""")
 
+        self.processing_memory_label.setStyleSheet("""
+        QLabel{
+        color: """ + software_ss["Color7"] + """;
+        text-align:left;
+        font:normal;
+        font-size:13px;
+        }""")
+
         self.batch_processing_combobox.setStyleSheet("""
         QComboBox{
         color: """ + font_color + """;
@@ -482,9 +494,9 @@ class SingleStudyWidget(QCollapsibleWidget):
 
     def __on_study_saved(self) -> None:
         """
-        Save the study on disk.
+        Save the study on disk, in the background.
         """
-        SoftwareConfigResources.getInstance().get_study(self.uid).save()
+        SoftwareConfigResources.getInstance().request_study_save(self.uid)
 
     def __on_study_closed(self) -> None:
         """
@@ -623,6 +635,7 @@ class SingleStudyWidget(QCollapsibleWidget):
         self.processing_layout_text_display_header_label.setVisible(True)
         self.processing_layout_text_display_label.setVisible(True)
         self.processing_layout_text_display_label.setText("1/{} (eta ...)".format(nb_patients))
+        self.processing_memory_label.setText("")
 
         self.batch_processing_run_pushbutton.setEnabled(False)
         self.include_single_patient_folder_pushbutton.setEnabled(False)
@@ -644,6 +657,16 @@ class SingleStudyWidget(QCollapsibleWidget):
                                                                          SoftwareConfigResources.getInstance().study_parameters[self.uid].get_total_included_patients(),
                                                                                   int(hours_left), int(minutes_left)))
 
+    def on_processing_memory_updated(self, current: float, peak: float, budget: int) -> None:
+        """
+        Displays the memory used by the software during the batch processing, with its high-water mark.
+        """
+        text = "Memory: {:.0f} MB (peak {:.0f} MB".format(current, peak)
+        if budget > 0:
+            text = text + ", budget {} MB".format(budget)
+        self.processing_memory_label.setText(text + ")")
+        self.processing_memory_label.setVisible(True)
+
     def on_processing_finished(self) -> None:
         """
 
@@ -651,6 +674,7 @@ class SingleStudyWidget(QCollapsibleWidget):
         self.processing_progressbar.setVisible(False)
         self.processing_layout_text_display_header_label.setVisible(False)
         self.processing_layout_text_display_label.setVisible(False)
+        self.processing_memory_label.setVisible(False)
 
         self.batch_processing_run_pushbutton.setEnabled(True)
         self.include_single_patient_folder_pushbutton.setEnabled(True)
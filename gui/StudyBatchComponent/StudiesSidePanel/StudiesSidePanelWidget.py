@@ -305,6 +305,10 @@ class StudiesSidePanelWidget(QWidget):
     def on_processing_advanced(self):
         self.single_study_widgets[SoftwareConfigResources.getInstance().active_study_name].on_processing_advanced()
 
+    def on_processing_memory_updated(self, current: float, peak: float, budget: int) -> None:
+        self.single_study_widgets[SoftwareConfigResources.getInstance().active_study_name].on_processing_memory_updated(
+            current, peak, budget)
+
     def on_processing_finished(self):
         self.single_study_widgets[SoftwareConfigResources.getInstance().active_study_name].on_processing_finished()
         self.bottom_add_study_pushbutton.setEnabled(True)
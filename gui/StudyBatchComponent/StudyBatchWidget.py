@@ -4,7 +4,12 @@ from PySide6.QtCore import Qt, QSize, Signal
 import logging
 import os
 import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.software_config import SoftwareConfigResources
+from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
+from utils.data_structures.StudyRunJournalStructure import compute_patient_inputs_hash
+from utils.logic.BatchMemoryMonitor import BatchMemoryMonitor
 from gui.StudyBatchComponent.StudiesSidePanel.StudiesSidePanelWidget import StudiesSidePanelWidget
 from gui.StudyBatchComponent.PatientsListingPanel.StudyPatientListingWidget import StudyPatientListingWidget
 from gui.StudyBatchComponent.PatientsSummaryPanel.StudyPatientsSummaryPanelWidget import StudyPatientsSummaryPanelWidget
@@ -32,6 +37,7 @@ class StudyBatchWidget(QWidget):
     study_imported = Signal(str)  # uid of the imported study
     processing_started = Signal()
     processing_advanced = Signal()
+    processing_memory_updated = Signal(float, float, int)  # Current and peak memory usage, and budget, in MB
     processing_finished = Signal()
     patient_report_imported = Signal(str, str)  # Patient unique identifier, report unique identifier
     patient_radiological_sequences_imported = Signal(str)  # Patient unique identifier
@@ -127,6 +133,7 @@ class StudyBatchWidget(QWidget):
         self.patient_refreshed.connect(self.patients_summary_panel.on_patient_refreshed)
 
         self.processing_advanced.connect(self.studies_panel.on_processing_advanced)
+        self.processing_memory_updated.connect(self.studies_panel.on_processing_memory_updated)
         self.processing_finished.connect(self.studies_panel.on_processing_finished)
         self.processing_finished.connect(self.patients_summary_panel.on_processing_finished)
         self.processing_started.connect(self.patient_listing_panel.on_process_started)
@@ -169,33 +176,121 @@ class StudyBatchWidget(QWidget):
         run_segmentation_thread.start()
 
     def on_batch_pipeline_execution(self, study_uid, pipeline_task, tumor_type):
-        from utils.backend_logic import pipeline_main_wrapper
+        """
+        Runs the pipeline for all patients included in the study, with up to N patients processed concurrently (as
+        set in the user preferences). Each patient uses its own output folder, and processing_advanced is emitted as
+        soon as each patient is done, regardless of the order of completion.
+        The progress is recorded in the study run journal, such that an interrupted batch can be resumed: patients
+        already processed with the same pipeline definition and unchanged inputs are skipped.
+        The memory stays bounded regardless of the study size, as each patient (unless displayed) is released from
+        memory once its results have been collected and saved, and no new patient is started while the software is
+        above the memory budget set in the user preferences.
+        """
+        from utils.logic.PipelineCreationHandler import create_pipeline
         self.on_process_started()
         study = SoftwareConfigResources.getInstance().study_parameters[study_uid]
-        patients_uid = study.included_patients_uids
-        for u in patients_uid:
+        patients_uid = list(study.included_patients_uids.keys())
+        concurrent_patients = min(max(1, len(patients_uid)),
+                                  UserPreferencesStructure.getInstance().get_batch_concurrent_patients())
+        memory_monitor = BatchMemoryMonitor(budget=UserPreferencesStructure.getInstance().batch_memory_budget)
+        memory_monitor.sample()
+        logging.info("Batch processing of {} patients, with {} patients processed concurrently.".format(len(patients_uid),
+                                                                                                      concurrent_patients))
+        try:
+            # Making sure enough backend processes are available for the patients to run in parallel
+            SoftwareConfigResources.getInstance().ensure_backend_workers(concurrent_patients)
+            # The pipeline only varies across patients with their inputs, which are already tracked for each patient.
+            pipeline = create_pipeline(tumor_type, SoftwareConfigResources.getInstance().patients_parameters[
+                patients_uid[0]], pipeline_task) if len(patients_uid) != 0 else {}
+            run_key = study.get_run_journal().start_run(task=pipeline_task, tumor_type=tumor_type, pipeline=pipeline,
+                                                        models_folder=SoftwareConfigResources.getInstance().models_path)
+            with ThreadPoolExecutor(max_workers=concurrent_patients) as executor:
+                futures = {executor.submit(self.__run_batch_patient_pipeline, study, run_key, u, pipeline_task,
+                                           tumor_type, memory_monitor): u for u in patients_uid}
+                for f in as_completed(futures):
+                    try:
+                        f.result()
+                    except Exception:
+                        logging.error("[Software error] Batch processing for patient {} failed with: \n{}".format(
+                            futures[f], traceback.format_exc()))
+                    if memory_monitor.high_water_mark is not None:
+                        self.processing_memory_updated.emit(memory_monitor.current_usage,
+                                                            memory_monitor.high_water_mark, memory_monitor.budget)
+                    self.processing_advanced.emit()
+        except Exception:
+            logging.error("[Software error] Batch processing failed with: \n{}".format(traceback.format_exc()))
+        if memory_monitor.high_water_mark is not None:
+            logging.info("Batch processing memory high-water mark: {:.0f} MB.".format(memory_monitor.high_water_mark))
+        self.on_process_finished()
+
+    def __run_batch_patient_pipeline(self, study, run_key: str, patient_uid: str, pipeline_task: str,
+                                     tumor_type: str, memory_monitor: BatchMemoryMonitor) -> None:
+        """
+        Runs the pipeline for one patient of the study, and merges its results inside the study statistics.
+        Called concurrently from the batch thread pool, once the memory budget allows for a new patient.
+        """
+        memory_monitor.acquire()
+        try:
+            self.__run_batch_patient_pipeline_within_budget(study, run_key, patient_uid, pipeline_task, tumor_type)
+        finally:
+            # Results have been collected and saved, non-displayed patients do not need to stay in memory.
+            if patient_uid != SoftwareConfigResources.getInstance().active_patient_name:
+                SoftwareConfigResources.getInstance().patients_parameters[patient_uid].release_from_memory()
+            memory_monitor.release()
+
+    def __run_batch_patient_pipeline_within_budget(self, study, run_key: str, patient_uid: str, pipeline_task: str,
+                                                   tumor_type: str) -> None:
+        from utils.backend_logic import pipeline_main_wrapper
+        u = patient_uid
+        patient_parameters = SoftwareConfigResources.getInstance().patients_parameters[u]
+        journal = study.get_run_journal()
+        inputs_hash = compute_patient_inputs_hash(patient_parameters)
+        if journal.is_patient_completed(run_key=run_key, patient_uid=u, inputs_hash=inputs_hash):
+            logging.info("Skipping patient {}, already processed in a previous run with identical inputs.".format(u))
+            if not study.has_patient_statistics(u):
+                self.__include_batch_patient_results(study, u, journal.get_patient_results(run_key, u))
+            return
+
+        journal.set_patient_status(run_key=run_key, patient_uid=u, status='running', inputs_hash=inputs_hash)
+        try:
             code, results = pipeline_main_wrapper(pipeline_task=pipeline_task,
                                                   tumor_type=tumor_type,
-                                                  patient_parameters=SoftwareConfigResources.getInstance().patients_parameters[u])
-            # Not iterating over the image results as the redrawing will be done when the active patient is changed.
-            if 'Report' in list(results.keys()):
-                for r in results['Report']:
-                    self.patient_report_imported.emit(u, r)
-                study.include_reporting_statistics(patient_uid=u, reporting_uids=results["Report"],
-                                                   patient_parameters=SoftwareConfigResources.getInstance().patients_parameters[u])
-            if 'Classification' in list(results.keys()):
-                # @TODO2. Not connected all the way.
-                if "MRSequence" in results["Classification"]:
-                    self.patient_radiological_sequences_imported.emit(u)
-                else:
-                    raise ValueError(f"Other classification use-cases not handled yet.")
-            if 'Annotation' in list(results.keys()):
-                study.include_segmentation_statistics(patient_uid=u, annotation_uids=results["Annotation"],
-                                                      patient_parameters=SoftwareConfigResources.getInstance().patients_parameters[u])
+                                                  patient_parameters=patient_parameters)
+            self.__include_batch_patient_results(study, u, results)
             # Automatically saving the patient (with the latest results) for an easier loading afterwards.
-            SoftwareConfigResources.getInstance().patients_parameters[u].save_patient()
-            self.processing_advanced.emit()
-        self.on_process_finished()
+            patient_parameters.save_patient()
+        except Exception as e:
+            journal.set_patient_status(run_key=run_key, patient_uid=u, status='failed', error_message=str(e))
+            raise
+        journal.set_patient_status(run_key=run_key, patient_uid=u, status='completed' if code == 0 else 'failed',
+                                   results=results)
+
+    def __include_batch_patient_results(self, study, patient_uid: str, results: dict) -> None:
+        """
+        Propagates the results of a patient processing to the interface and to the study statistics.
+        """
+        u = patient_uid
+        patient_parameters = SoftwareConfigResources.getInstance().patients_parameters[u]
+        # Not iterating over the image results as the redrawing will be done when the active patient is changed.
+        if 'Report' in list(results.keys()):
+            # Results restored from the journal might have been deleted by the user in the meantime.
+            report_uids = [r for r in results['Report'] if r in patient_parameters.reportings.keys()]
+            for r in report_uids:
+                self.patient_report_imported.emit(u, r)
+            if len(report_uids) != 0 or len(results['Report']) == 0:
+                study.include_reporting_statistics(patient_uid=u, reporting_uids=report_uids,
+                                                   patient_parameters=patient_parameters)
+        if 'Classification' in list(results.keys()):
+            # @TODO2. Not connected all the way.
+            if "MRSequence" in results["Classification"]:
+                self.patient_radiological_sequences_imported.emit(u)
+            elif len(results["Classification"]) != 0:
+                raise ValueError(f"Other classification use-cases not handled yet.")
+        if 'Annotation' in list(results.keys()):
+            annotation_uids = [a for a in results['Annotation'] if a in patient_parameters.get_all_annotation_volumes_uids()]
+            if len(annotation_uids) != 0 or len(results['Annotation']) == 0:
+                study.include_segmentation_statistics(patient_uid=u, annotation_uids=annotation_uids,
+                                                      patient_parameters=patient_parameters)
 
     def on_patient_refresh_triggered(self, patient_uid: str) -> None:
         SoftwareConfigResources.getInstance().get_active_study().refresh_patient_statistics(patient_uid,
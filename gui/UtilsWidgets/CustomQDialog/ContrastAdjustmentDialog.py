@@ -134,8 +134,10 @@ class ContrastAdjustmentDialog(QDialog):
         """
         Upon validation of the new contrast values, the unsaved changes state is updated to trigger a save QDialog
         to the user later down the line.
+        The contrast previewed on the displayed slices is then applied to the whole volume.
         """
         SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).confirm_contrast_modifications()
+        self.contrast_intensity_changed.emit()
         self.accept()
 
     def __on_exit_cancel_clicked(self):
@@ -143,34 +145,35 @@ class ContrastAdjustmentDialog(QDialog):
         If the contrast adjustment operation is cancelled by the user, the contrast values are restored to their states
         when launching the contrast editor QDialog.
         """
-        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_minimum(self.starting_contrast[0])
-        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_maximum(self.starting_contrast[1])
+        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_minimum(self.starting_contrast[0], preview=True)
+        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_maximum(self.starting_contrast[1], preview=True)
+        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).confirm_contrast_modifications()
         self.contrast_intensity_changed.emit()
         self.reject()
 
     def __on_minimum_intensity_changed(self, value: int) -> None:
         """
-        Update the internal value for the minimum intensity for the current mri volume, which will recompute the
-        new display volume.
+        Update the internal value for the minimum intensity for the current mri volume, in preview mode such that only
+        the displayed slices are recomputed while the user is adjusting the contrast.
         A signal is then emitted to trigger a repaint of the different central views.
         """
-        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_minimum(value)
+        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_minimum(value, preview=True)
         self.contrast_intensity_changed.emit()
 
     def __on_maximum_intensity_changed(self, value: int) -> None:
         """
-        Update the internal value for the maximum intensity for the current mri volume, which will recompute the
-        new display volume.
+        Update the internal value for the maximum intensity for the current mri volume, in preview mode such that only
+        the displayed slices are recomputed while the user is adjusting the contrast.
         A signal is then emitted to trigger a repaint of the different central views.
         """
-        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_maximum(value)
+        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_maximum(value, preview=True)
         self.contrast_intensity_changed.emit()
 
     def __on_reset_intensity_contrast_window(self):
         self.intensity_window_min_spinbox.setValue(SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).get_resampled_minimum_intensity())
         self.intensity_window_max_spinbox.setValue(SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).get_resampled_maximum_intensity())
-        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_minimum(self.intensity_window_min_spinbox.value())
-        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_maximum(self.intensity_window_max_spinbox.value())
+        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_minimum(self.intensity_window_min_spinbox.value(), preview=True)
+        SoftwareConfigResources.getInstance().get_active_patient().get_mri_by_uid(self.volume_uid).set_contrast_window_maximum(self.intensity_window_max_spinbox.value(), preview=True)
         self.contrast_intensity_changed.emit()
 
     def __set_hist(self):
@@ -236,7 +236,14 @@ class ImportDICOMDataQDialog(QDialog):
                 return
             self.current_folder = os.path.dirname(directory)
             dicom_holder = PatientDICOM(directory)
-            dicom_holder.parse_dicom_folder()
+            self.load_progressbar.reset()
+            self.load_progressbar.setMinimum(0)
+            self.load_progressbar.setVisible(True)
+            try:
+                dicom_holder.parse_dicom_folder(progress_callback=self.__on_dicom_scanning_progress,
+                                                dicom_index=SoftwareConfigResources.getInstance().get_dicom_index())
+            finally:
+                self.load_progressbar.setVisible(False)
             if dicom_holder.patient_id not in list(self.dicom_holders.keys()):
                 self.dicom_holders[dicom_holder.patient_id] = dicom_holder
 
@@ -245,6 +252,14 @@ class ImportDICOMDataQDialog(QDialog):
         except Exception as e:
             logging.error("[Software error] Importing DICOM folder failed. <br><br> Reason: {}".format(e))
 
+    def __on_dicom_scanning_progress(self, scanned_series: int, found_series: int) -> None:
+        """
+        Called from the GUI thread while the DICOM folder is being scanned, hence the direct repaint.
+        """
+        self.load_progressbar.setMaximum(found_series)
+        self.load_progressbar.setValue(scanned_series)
+        self.load_progressbar.repaint()
+
     def __on_import_directory_clicked(self):
         input_image_filedialog = QFileDialog(self)
         input_image_filedialog.setWindowFlags(Qt.WindowStaysOnTopHint)
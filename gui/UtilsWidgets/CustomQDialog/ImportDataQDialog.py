@@ -8,7 +8,6 @@ from PySide6.QtGui import QIcon, QMouseEvent
 import os
 
 from utils.software_config import SoftwareConfigResources
-from utils.utilities import input_file_category_disambiguation
 
 
 class ImportDataQDialog(QDialog):
@@ -172,25 +171,15 @@ class ImportDataQDialog(QDialog):
             input_filepath = w.wid.filepath_lineedit.text()
             selected_files.append(input_filepath)
 
-        mris_selected = []
-        annotations_selected = []
+        volumes_selected = []
         raidionics_selected = []
         for f in selected_files:
-            try:
-                ext = f.split('.')[-1]
-                if ext != SoftwareConfigResources.getInstance().accepted_scene_file_format[0] \
-                        and ext != SoftwareConfigResources.getInstance().accepted_study_file_format[0]:
-                    ft = input_file_category_disambiguation(input_filename=f)
-                    if ft == "MRI":
-                        mris_selected.append(f)
-                    else:
-                        annotations_selected.append(f)
-                else:
-                    raidionics_selected.append(f)
-            except Exception:
-                error_msg = '[Software error] Unable to determine volume category for: {}<br><br>'.format(f) + \
-                    'Try converting the file to nifti before attempting loading it again.'
-                logging.error(error_msg)
+            ext = f.split('.')[-1]
+            if ext != SoftwareConfigResources.getInstance().accepted_scene_file_format[0] \
+                    and ext != SoftwareConfigResources.getInstance().accepted_study_file_format[0]:
+                volumes_selected.append(f)
+            else:
+                raidionics_selected.append(f)
 
         for i, pf in enumerate(raidionics_selected):
             try:
@@ -207,26 +196,24 @@ class ImportDataQDialog(QDialog):
                 logging.error(error_msg)
             self.load_progressbar.setValue(i + 1)
 
+        # The volumes are classified and loaded concurrently, then attached with all MRI volumes first.
         # @TODO. Might try something more advanced for pairing annotations with MRIs
-        for i, pf in enumerate(mris_selected):
-            try:
-                uid = SoftwareConfigResources.getInstance().get_active_patient().import_data(pf, type="MRI")
-                self.mri_volume_imported.emit(uid)
-            except Exception as e:
-                error_msg = '[Software error] Failed to load the following file: {}'.format(pf) + \
-                              '<br><br>Reason: {}.'.format(e)
-                logging.error(error_msg)
-            self.load_progressbar.setValue(i + 1)
-
-        for i, pf in enumerate(annotations_selected):
-            try:
-                uid = SoftwareConfigResources.getInstance().get_active_patient().import_data(pf, type="Annotation")
-                self.annotation_volume_imported.emit(uid)
-            except Exception as e:
-                error_msg = '[Software error] Failed to load the following file: {}'.format(pf) + \
-                              '<br><br>Reason: {}.'.format(e)
-                logging.error(error_msg)
-            self.load_progressbar.setValue(len(mris_selected) + i + 1)
+        if len(volumes_selected) != 0:
+            results = SoftwareConfigResources.getInstance().get_active_patient().import_data_batch(volumes_selected)
+            imported_results = [r for r in results if r[1] == "MRI"] + [r for r in results if r[1] != "MRI"]
+            for pf, (uid, ft, error) in zip(volumes_selected, results):
+                if error:
+                    error_msg = '[Software error] Failed to load the following file: {}'.format(pf) + \
+                                  '<br><br>Reason: {}.'.format(error)
+                    logging.error(error_msg)
+            for uid, ft, error in imported_results:
+                if uid is None:
+                    continue
+                if ft == "MRI":
+                    self.mri_volume_imported.emit(uid)
+                else:
+                    self.annotation_volume_imported.emit(uid)
+            self.load_progressbar.setValue(len(raidionics_selected) + len(volumes_selected))
 
         self.load_progressbar.setVisible(False)
         self.accept()
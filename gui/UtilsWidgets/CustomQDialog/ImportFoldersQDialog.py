@@ -11,8 +11,7 @@ import os
 from typing import Tuple, List
 
 from utils.software_config import SoftwareConfigResources
-from utils.utilities import input_file_category_disambiguation
-from utils.patient_dicom import PatientDICOM
+from utils.patient_dicom import PatientDICOM, parse_dicom_folders
 
 
 class ImportFoldersQDialog(QDialog):
@@ -275,7 +274,7 @@ class ImportFoldersQDialog(QDialog):
                         self.load_progressbar.setValue(self.load_progressbar.value() + 1)
                 elif self.target_type == 'dicom' and self.parsing_mode == 'single':  # Case (iv)
                     dicom_holder = PatientDICOM(input_folderpath)
-                    dicom_holder.parse_dicom_folder()
+                    dicom_holder.parse_dicom_folder(dicom_index=SoftwareConfigResources.getInstance().get_dicom_index())
                     pat_uid = SoftwareConfigResources.getInstance().add_new_empty_patient(active=False)
                     SoftwareConfigResources.getInstance().get_patient(uid=pat_uid).set_display_name(dicom_holder.patient_id)
                     for study_id in dicom_holder.studies.keys():
@@ -289,9 +288,18 @@ class ImportFoldersQDialog(QDialog):
                                                                                                        patient_parameters=SoftwareConfigResources.getInstance().get_patient(pat_uid))
                     self.load_progressbar.setValue(self.load_progressbar.value() + 1)
                 elif self.target_type == 'dicom' and self.parsing_mode == 'multiple':  # Case (v)
-                    for patient in folders_in_path:
-                        dicom_holder = PatientDICOM(os.path.join(input_folderpath, patient))
-                        dicom_holder.parse_dicom_folder()
+                    # All patient folders are scanned concurrently, before importing the patients one by one.
+                    dicom_holders = [PatientDICOM(os.path.join(input_folderpath, patient)) for patient in folders_in_path]
+                    scan_errors = parse_dicom_folders(dicom_holders,
+                                                      progress_callback=self.__on_dicom_scanning_progress,
+                                                      dicom_index=SoftwareConfigResources.getInstance().get_dicom_index())
+                    self.load_progressbar.resetFormat()
+                    for dicom_holder in dicom_holders:
+                        if dicom_holder.dicom_folder in scan_errors.keys():
+                            logging.error("[Software error] DICOM folder import failed for {} with: {}".format(
+                                dicom_holder.dicom_folder, scan_errors[dicom_holder.dicom_folder]))
+                            self.load_progressbar.setValue(self.load_progressbar.value() + 1)
+                            continue
                         pat_uid = SoftwareConfigResources.getInstance().add_new_empty_patient(active=False)
                         SoftwareConfigResources.getInstance().get_patient(uid=pat_uid).set_display_name(dicom_holder.patient_id)
                         for study_id in dicom_holder.studies.keys():
@@ -313,6 +321,13 @@ class ImportFoldersQDialog(QDialog):
         self.load_progressbar.setVisible(False)
         self.accept()
 
+    def __on_dicom_scanning_progress(self, scanned_series: int, found_series: int) -> None:
+        """
+        Called from the GUI thread while the DICOM folders are being scanned, hence the direct repaint.
+        """
+        self.load_progressbar.setFormat("Scanning DICOM series {}/{}".format(scanned_series, found_series))
+        self.load_progressbar.repaint()
+
     def __on_exit_cancel_clicked(self):
         self.reject()
 
@@ -471,20 +486,13 @@ def import_patient_from_folder(folder_path: str) -> dict:
             imports['Patient'] = [pat_uid]
 
             SoftwareConfigResources.getInstance().get_patient(pat_uid).set_display_name(os.path.basename(folder_path))
-            mris_in_path = []
-            annotations_in_path = []
-            for f in files_in_path:
-                ft = input_file_category_disambiguation(input_filename=os.path.join(folder_path, f))
-                if ft == "MRI":
-                    mris_in_path.append(f)
-                else:
-                    annotations_in_path.append(f)
-
+            # The volumes are classified and loaded concurrently, then attached with all MRI volumes first.
             # @TODO. Might try to infer from the filenames if some annotations are belonging to some MRIs.
-            # for now just processing MRIs first and annotations after.
-            files_list = mris_in_path + annotations_in_path
-            for f in files_list:
-                uid = SoftwareConfigResources.getInstance().get_patient(pat_uid).import_data(os.path.join(folder_path, f))
+            results = SoftwareConfigResources.getInstance().get_patient(pat_uid).import_data_batch(
+                [os.path.join(folder_path, f) for f in files_in_path])
+            for uid, ft, error in results:
+                if error:
+                    raise RuntimeError(error)
         SoftwareConfigResources.getInstance().get_patient(pat_uid).save_patient()
         return imports
     except Exception as e:
@@ -553,21 +561,13 @@ def import_patient_from_timestamped_folder(folder_path: str) -> dict:
                             files_in_path.append(f)
                     break
 
-                mris_in_path = []
-                annotations_in_path = []
-                for f in files_in_path:
-                    ft = input_file_category_disambiguation(input_filename=os.path.join(ts_folder, f))
-                    if ft == "MRI":
-                        mris_in_path.append(f)
-                    else:
-                        annotations_in_path.append(f)
-
+                # The volumes are classified and loaded concurrently, then attached with all MRI volumes first.
                 # @TODO. Might try to infer from the filenames if some annotations are belonging to some MRIs.
-                # for now just processing MRIs first and annotations after.
-                files_list = mris_in_path + annotations_in_path
-                for f in files_list:
-                    uid = SoftwareConfigResources.getInstance().get_patient(pat_uid).import_data(filename=os.path.join(ts_folder, f),
-                                                                                                 investigation_ts=ts_uid)
+                results = SoftwareConfigResources.getInstance().get_patient(pat_uid).import_data_batch(
+                    [os.path.join(ts_folder, f) for f in files_in_path], investigation_ts=ts_uid)
+                for uid, ft, error in results:
+                    if error:
+                        raise RuntimeError(error)
             SoftwareConfigResources.getInstance().get_patient(pat_uid).save_patient()
         return imports
     except Exception as e:
@@ -58,7 +58,8 @@ class SavePatientChangesDialog(QDialog):
         return super().exec()
 
     def save_changes(self):
-        SoftwareConfigResources.getInstance().get_active_patient().save_patient()
+        SoftwareConfigResources.getInstance().request_patient_save(
+            SoftwareConfigResources.getInstance().get_active_patient_uid())
         self.accept()
 
     def discard_changes(self):
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from utils.logic.BatchMemoryMonitor import BatchMemoryMonitor
+
+
+def run_patients(memory_monitor: BatchMemoryMonitor, patients_number: int = 4) -> int:
+    """
+    Simulates the concurrent processing of several patients, and returns the highest number of patients processed at
+    the same time.
+    """
+    running = [0, 0]
+    lock = threading.Lock()
+
+    def process_patient():
+        memory_monitor.acquire()
+        with lock:
+            running[0] = running[0] + 1
+            running[1] = max(running)
+        time.sleep(0.2)
+        with lock:
+            running[0] = running[0] - 1
+        memory_monitor.release()
+
+    threads = [threading.Thread(target=process_patient) for _ in range(patients_number)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return running[1]
+
+
+def test_memory_budget_exceeded():
+    """
+    With a memory budget below the memory already used by the software, patients are processed one at a time, and
+    the high-water mark is recorded.
+    """
+    memory_monitor = BatchMemoryMonitor(budget=1)
+    assert run_patients(memory_monitor) == 1
+    if memory_monitor.high_water_mark is not None:
+        assert memory_monitor.high_water_mark >= memory_monitor.current_usage > 1
+
+
+def test_memory_budget_unlimited():
+    memory_monitor = BatchMemoryMonitor(budget=0)
+    assert run_patients(memory_monitor) == 4
+
+
+def test_memory_budget_recovered(monkeypatch):
+    """
+    Once the memory used by the software drops back below the budget, patients are processed concurrently again.
+    """
+    usage = [200.]
+    monkeypatch.setattr("utils.logic.BatchMemoryMonitor.get_process_memory_usage", lambda: usage[0])
+    memory_monitor = BatchMemoryMonitor(budget=100)
+    assert run_patients(memory_monitor) == 1
+    usage[0] = 50.
+    assert run_patients(memory_monitor) == 4
+    assert memory_monitor.current_usage == 50.
+    assert memory_monitor.high_water_mark == 200.
+
+
+def test_memory_budget_unmeasurable(monkeypatch):
+    """
+    When the memory used by the software cannot be measured, the budget is disabled instead of serializing the batch.
+    """
+    monkeypatch.setattr("utils.logic.BatchMemoryMonitor.get_process_memory_usage", lambda: None)
+    memory_monitor = BatchMemoryMonitor(budget=1)
+    assert run_patients(memory_monitor) == 4
@@ -0,0 +1,113 @@
+import os
+import json
+import shutil
+import time
+
+import pytest
+
+from utils.software_config import SoftwareConfigResources
+from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
+from utils.data_structures.PatientParametersStructure import PatientParameters
+from utils.logic.SaveQueue import SaveQueue
+
+def_loc = UserPreferencesStructure.getInstance().user_home_location
+
+@pytest.fixture
+def test_location():
+    test_loc = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'integrationtests')
+    UserPreferencesStructure.getInstance().user_home_location = test_loc
+    os.makedirs(test_loc, exist_ok=True)
+    if os.path.exists(os.path.join(test_loc, "patients")):
+        shutil.rmtree(os.path.join(test_loc, "patients"))
+    if os.path.exists(os.path.join(test_loc, "studies")):
+        shutil.rmtree(os.path.join(test_loc, "studies"))
+    return test_loc
+
+
+def test_background_patient_save(test_location):
+    """
+    Saving a patient through the background writer, and verification that the scene file is on disk once the queue
+    has been flushed.
+    """
+    patient_uid = SoftwareConfigResources.getInstance().add_new_empty_patient(active=False)
+    patient = SoftwareConfigResources.getInstance().get_patient(patient_uid)
+    SoftwareConfigResources.getInstance().request_patient_save(patient_uid)
+    assert SoftwareConfigResources.getInstance().get_save_queue().flush(timeout=60)
+    assert len([f for f in os.listdir(patient.output_folder) if f.endswith('_scene.raidionics')]) == 1
+    assert not patient.has_unsaved_changes()
+    SoftwareConfigResources.getInstance().remove_patient(patient_uid)
+
+
+def test_background_save_coalescing(test_location):
+    """
+    Repeated save requests for an element waiting in the queue are performed only once, while a request issued during
+    the save of the same element is performed afterwards.
+    """
+    save_queue = SoftwareConfigResources.getInstance().get_save_queue()
+    performed = []
+
+    def slow_save():
+        performed.append('slow')
+        time.sleep(0.5)
+
+    save_queue.request_save(key='Element', save_function=slow_save)
+    time.sleep(0.1)
+    for i in range(5):
+        save_queue.request_save(key='Element', save_function=lambda x=i: performed.append(x))
+    assert save_queue.get_remaining_saves() == 2
+    assert save_queue.flush(key='Element', timeout=60)
+    assert performed == ['slow', 4]
+
+
+def test_background_save_failure(tmp_path):
+    """
+    A save which fails, either by raising or by reporting it through its return value as save_patient does, is
+    reported as failed, and the patient keeps its unsaved changes.
+    """
+    states = []
+    save_queue = SaveQueue(progress_callback=lambda description, state, remaining: states.append((description,
+                                                                                                  state)))
+    patient = PatientParameters(id="failing", dest_location=str(tmp_path))
+    ts_uid, _ = patient.insert_investigation_timestamp(order=0)
+
+    def failing_save():
+        raise IOError("Disk full")
+
+    patient.get_timestamp_by_uid(ts_uid).save = failing_save
+    save_queue.request_save(key='Patient', save_function=patient.save_patient, description='Patient')
+    save_queue.request_save(key='Element', save_function=failing_save, description='Element')
+    assert save_queue.stop(timeout=60)
+    assert ('Patient', 'failed') in states and ('Element', 'failed') in states
+    assert patient.has_unsaved_changes() and patient.get_timestamp_by_uid(ts_uid).has_unsaved_changes()
+
+
+def test_modification_while_saving(tmp_path):
+    """
+    A modification performed while the patient is being saved is kept as unsaved, and stored by the next save.
+    """
+    patient = PatientParameters(id="edited", dest_location=str(tmp_path))
+    ts_uid, _ = patient.insert_investigation_timestamp(order=0)
+    timestamp = patient.get_timestamp_by_uid(ts_uid)
+    timestamp_save = timestamp.save
+
+    def save_while_edited():
+        parameters = timestamp_save()
+        timestamp.order = 5
+        return parameters
+
+    timestamp.save = save_while_edited
+    assert patient.save_patient()
+    assert timestamp.has_unsaved_changes()
+
+    timestamp.save = timestamp_save
+    assert patient.save_patient()
+    assert not timestamp.has_unsaved_changes()
+    with open(patient._patient_parameters_dict_filename, 'r') as infile:
+        assert json.load(infile)['Timestamps'][ts_uid]['order'] == 5
+
+
+def test_cleanup(test_location):
+    SoftwareConfigResources.getInstance().stop_save_queue()
+    if os.path.exists(test_location):
+        shutil.rmtree(test_location)
+    UserPreferencesStructure.getInstance().user_home_location = def_loc
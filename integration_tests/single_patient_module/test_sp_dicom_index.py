@@ -0,0 +1,81 @@
+import os
+import shutil
+
+import numpy as np
+import SimpleITK as sitk
+
+from utils.logic.DICOMIndex import DICOMIndex
+from utils.patient_dicom import PatientDICOM, scan_dicom_folder
+
+
+def generate_dicom_series(folder: str, series_uid: str, slices: int = 4) -> None:
+    """
+    Writes on disk a small DICOM series, as one file per slice.
+    """
+    os.makedirs(folder, exist_ok=True)
+    writer = sitk.ImageFileWriter()
+    writer.KeepOriginalImageUIDOn()
+    for z in range(slices):
+        image_slice = sitk.GetImageFromArray((np.random.rand(8, 8) * 1500).astype('int16'))
+        tags = {'0008|0060': 'MR', '0010|0020': 'Patient01', '0020|000d': '1.2.826.0.1.3680043.2.1125.1',
+                '0020|000e': series_uid, '0020|0013': str(z + 1), '0020|0032': '0\\0\\{}'.format(z),
+                '0020|0037': '1\\0\\0\\0\\1\\0', '0008|0018': series_uid + '.{}'.format(z + 1)}
+        for k in tags.keys():
+            image_slice.SetMetaData(k, tags[k])
+        writer.SetFileName(os.path.join(folder, 'IM{:04d}.dcm'.format(z)))
+        writer.Execute(image_slice)
+
+
+def test_dicom_index_hit_miss_invalidation(tmp_path):
+    """
+    A folder is only retrieved from the index once scanned, and until one of its files is added or modified.
+    """
+    series_folder = os.path.normpath(os.path.join(str(tmp_path), 'DICOM', 'S001'))
+    generate_dicom_series(series_folder, '1.2.826.0.1.3680043.2.1125.1.1')
+    dicom_index = DICOMIndex(os.path.join(str(tmp_path), 'cache', 'dicom_index.sqlite'))
+    try:
+        assert dicom_index.get_folder_series(series_folder) is None
+
+        PatientDICOM(os.path.join(str(tmp_path), 'DICOM')).parse_dicom_folder(dicom_index=dicom_index)
+        indexed_series = dicom_index.get_folder_series(series_folder)
+        assert indexed_series is not None and len(indexed_series) == 1
+        assert len(indexed_series[0][0]) == 4
+        series_ids, series = scan_dicom_folder(series_folder, dicom_index)
+        assert series_ids == [] and len(series) == 1
+
+        # Modified file
+        filename = indexed_series[0][0][0]
+        os.utime(filename, ns=(os.stat(filename).st_atime_ns, os.stat(filename).st_mtime_ns + 10 ** 9))
+        assert dicom_index.get_folder_series(series_folder) is None
+        PatientDICOM(os.path.join(str(tmp_path), 'DICOM')).parse_dicom_folder(dicom_index=dicom_index)
+        assert dicom_index.get_folder_series(series_folder) is not None
+
+        # Added file
+        shutil.copyfile(filename, os.path.join(series_folder, 'IM9999.dcm'))
+        assert dicom_index.get_folder_series(series_folder) is None
+    finally:
+        dicom_index.close()
+
+
+def test_dicom_index_pruning(tmp_path):
+    """
+    The folders which no longer exist on disk are removed from the index when reopening it.
+    """
+    index_filename = os.path.join(str(tmp_path), 'cache', 'dicom_index.sqlite')
+    for s in range(2):
+        generate_dicom_series(os.path.join(str(tmp_path), 'DICOM', 'S00{}'.format(s)),
+                              '1.2.826.0.1.3680043.2.1125.1.{}'.format(s + 1))
+    dicom_index = DICOMIndex(index_filename)
+    PatientDICOM(os.path.join(str(tmp_path), 'DICOM')).parse_dicom_folder(dicom_index=dicom_index)
+    dicom_index.close()
+
+    shutil.rmtree(os.path.join(str(tmp_path), 'DICOM', 'S000'))
+    dicom_index = DICOMIndex(index_filename)
+    try:
+        assert dicom_index.prune() == 0
+        assert dicom_index.get_folder_series(os.path.join(str(tmp_path), 'DICOM', 'S001')) is not None
+        with dicom_index._lock:
+            folders = [r[0] for r in dicom_index._connection.execute("SELECT DISTINCT folder FROM series")]
+        assert folders == [os.path.normpath(os.path.join(str(tmp_path), 'DICOM', 'S001'))]
+    finally:
+        dicom_index.close()
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import nibabel as nib
+
+from utils.data_structures.PatientParametersStructure import PatientParameters
+
+
+def generate_input_files(folder: str) -> tuple:
+    """
+    Writes on disk two MRI volumes and their labels, as produced by a segmentation pipeline, with a slightly oblique
+    orientation requiring an actual resampling.
+    """
+    os.makedirs(folder, exist_ok=True)
+    angle = np.pi / 18
+    affine = np.eye(4)
+    affine[:2, :2] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    mris = []
+    labels = []
+    for sequence in ['T1', 'FLAIR']:
+        mris.append(os.path.join(folder, 'Case-{}.nii.gz'.format(sequence)))
+        nib.save(nib.Nifti1Image((np.random.rand(40, 40, 30) * 1500).astype('float32'), affine), mris[-1])
+        for structure in ['tumor', 'brain']:
+            labels.append(os.path.join(folder, 'Case-{}-label_{}.nii.gz'.format(sequence, structure)))
+            nib.save(nib.Nifti1Image((np.random.rand(40, 40, 30) * 2).astype('uint8'), affine), labels[-1])
+    return mris, labels
+
+
+def test_import_data_batch_deterministic_order(tmp_path):
+    """
+    Files imported concurrently are attached in the order of the inputs, MRI volumes first, and the annotations are
+    linked to an MRI volume from the same batch.
+    """
+    mris, labels = generate_input_files(os.path.join(str(tmp_path), 'inputs'))
+    filenames = [labels[0], mris[0], labels[1], labels[2], mris[1], labels[3]]
+    patient = PatientParameters(id="batch", dest_location=os.path.join(str(tmp_path), 'patients'))
+    results = patient.import_data_batch(filenames, max_workers=4)
+
+    assert [r[1] for r in results] == ["Annotation", "MRI", "Annotation", "Annotation", "MRI", "Annotation"]
+    assert [r[2] for r in results] == [None] * len(filenames)
+    assert list(patient.mri_volumes.keys()) == [results[1][0], results[4][0]]
+    assert list(patient.annotation_volumes.keys()) == [results[i][0] for i in [0, 2, 3, 5]]
+    for uid in patient.annotation_volumes.keys():
+        assert patient.annotation_volumes[uid].get_parent_mri_uid() == results[1][0]
+    assert patient.get_all_annotations_for_mri(results[1][0]) == [results[i][0] for i in [0, 2, 3, 5]]
+
+    # Same standardized volumes as the files imported one by one
+    reference = PatientParameters(id="reference", dest_location=os.path.join(str(tmp_path), 'patients'))
+    for filename in mris + labels:
+        reference.import_data(filename)
+    for result, reference_uid in zip([results[1], results[4]], reference.mri_volumes.keys()):
+        assert np.array_equal(patient.mri_volumes[result[0]].display_volume,
+                              reference.mri_volumes[reference_uid].display_volume)
+    for result, reference_uid in zip([results[i] for i in [0, 2, 3, 5]], reference.annotation_volumes.keys()):
+        assert np.array_equal(patient.annotation_volumes[result[0]].display_volume,
+                              reference.annotation_volumes[reference_uid].display_volume)
+
+
+def test_import_data_batch_failures(tmp_path):
+    """
+    A failed import is reported for the corresponding file only, the other files of the batch being attached.
+    """
+    mris, labels = generate_input_files(os.path.join(str(tmp_path), 'inputs'))
+    patient = PatientParameters(id="batch", dest_location=os.path.join(str(tmp_path), 'patients'))
+    filenames = [labels[0], os.path.join(str(tmp_path), 'missing.nii.gz'), mris[0], mris[0]]
+    results = patient.import_data_batch(filenames, types=[None, "MRI", None, None])
+
+    assert results[0][0] is not None and results[2][0] is not None
+    assert results[1][0] is None and results[1][2] is not None
+    assert results[3][0] is None and "Doppelganger" in results[3][2]
+    assert len(patient.mri_volumes) == 1 and len(patient.annotation_volumes) == 1
+
+    # An annotation alone cannot be attached to any MRI volume
+    patient = PatientParameters(id="annotation_only", dest_location=os.path.join(str(tmp_path), 'patients'))
+    results = patient.import_data_batch([labels[0]])
+    assert results[0][0] is None and results[0][1] == "Annotation" and results[0][2] is not None
+    assert len(patient.annotation_volumes) == 0
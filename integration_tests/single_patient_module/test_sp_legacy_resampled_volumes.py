@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+import nibabel as nib
+
+from utils.data_structures.PatientParametersStructure import PatientParameters
+from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
+
+
+def list_resampled_files(patient: PatientParameters) -> list:
+    files = []
+    for root, _, filenames in os.walk(patient.output_folder):
+        files.extend([f for f in filenames if '_resampled' in f])
+    return sorted(files)
+
+
+def test_legacy_resampled_volumes_conversion(tmp_path):
+    """
+    A patient saved with nifti resampled volumes is reloaded without unsaved changes, and its resampled volumes are
+    converted to memory-mappable files by the next save.
+    """
+    default_state = UserPreferencesStructure.getInstance().memory_mapped_volumes
+    inputs_folder = os.path.join(str(tmp_path), 'inputs')
+    os.makedirs(inputs_folder)
+    mri_filename = os.path.join(inputs_folder, 'Case-T1.nii.gz')
+    annotation_filename = os.path.join(inputs_folder, 'Case-T1-label_tumor.nii.gz')
+    nib.save(nib.Nifti1Image((np.random.rand(20, 20, 20) * 1500).astype('int16'), np.eye(4)), mri_filename)
+    nib.save(nib.Nifti1Image((np.random.rand(20, 20, 20) * 2).astype('uint8'), np.eye(4)), annotation_filename)
+    try:
+        UserPreferencesStructure.getInstance().memory_mapped_volumes = False
+        patient = PatientParameters(id="legacy", dest_location=str(tmp_path))
+        patient.import_data(mri_filename, type="MRI")
+        patient.import_data(annotation_filename, type="Annotation")
+        assert patient.save_patient()
+        assert [f.endswith('.nii.gz') for f in list_resampled_files(patient)] == [True, True]
+
+        UserPreferencesStructure.getInstance().memory_mapped_volumes = True
+        reloaded = PatientParameters(id="legacy", patient_filename=patient._patient_parameters_dict_filename)
+        reloaded.import_patient(patient._patient_parameters_dict_filename)
+        assert not reloaded.has_unsaved_changes()
+        assert reloaded.save_patient()
+        assert [f.endswith('.npy') for f in list_resampled_files(reloaded)] == [True, True]
+    finally:
+        UserPreferencesStructure.getInstance().memory_mapped_volumes = default_state
@@ -0,0 +1,168 @@
+import itertools
+import threading
+
+import numpy as np
+import nibabel as nib
+from nibabel.processing import resample_to_output
+
+from utils import utilities
+from utils.logic.ResamplingGridCache import ResamplingGridCache
+from utils.utilities import get_output_axes_mapping, resample_to_output_space
+
+
+def generate_axis_aligned_affines() -> list:
+    """
+    All 48 permutations and flips of the voxel axes, with unit spacing and a non-integer world origin.
+    """
+    affines = []
+    for permutation in itertools.permutations(range(3)):
+        for signs in itertools.product([1, -1], repeat=3):
+            affine = np.eye(4)
+            affine[:3, :3] = 0
+            for k in range(3):
+                affine[permutation[k], k] = signs[k]
+            affine[:3, 3] = [-91.5, 126.25, -72.]
+            affines.append(affine)
+    return affines
+
+
+def test_fast_path_matches_resample_to_output():
+    """
+    For axis-aligned volumes with unit spacing, the standardized volume obtained by permuting and flipping the axes is
+    identical to the output of resample_to_output, for both intensity and label volumes.
+    """
+    volumes = {'int16': (np.random.rand(12, 9, 7) * 1500).astype('int16'),
+               'float32': np.random.rand(12, 9, 7).astype('float32'),
+               'uint8': (np.random.rand(12, 9, 7) * 5).astype('uint8')}
+    for affine in generate_axis_aligned_affines():
+        assert get_output_axes_mapping((12, 9, 7), affine) is not None
+        for dtype in volumes.keys():
+            image_nib = nib.Nifti1Image(volumes[dtype], affine)
+            for order in [0, 1]:
+                expected = resample_to_output(image_nib, order=order)
+                result = resample_to_output_space(image_nib, order=order)
+                assert result.shape == expected.shape
+                assert np.allclose(result.affine, expected.affine)
+                assert np.asanyarray(result.dataobj).dtype == np.asanyarray(expected.dataobj).dtype
+                assert np.allclose(np.asanyarray(result.dataobj), np.asanyarray(expected.dataobj), rtol=0.,
+                                   atol=1e-5)
+
+
+def test_fast_path_with_intensity_scaling():
+    image_nib = nib.Nifti1Image((np.random.rand(8, 8, 8) * 100).astype('int16'), generate_axis_aligned_affines()[7])
+    image_nib.header.set_slope_inter(0.5, 10.)
+    image_nib = nib.Nifti1Image.from_bytes(image_nib.to_bytes())
+    expected = resample_to_output(image_nib, order=1)
+    result = resample_to_output_space(image_nib, order=1)
+    assert np.allclose(np.asanyarray(result.dataobj), np.asanyarray(expected.dataobj))
+
+
+def test_fallback_to_resampling():
+    """
+    Volumes with a non-unit spacing or an oblique orientation still require an actual resampling.
+    """
+    anisotropic_affine = np.diag([1., 1., 2.5, 1.])
+    assert get_output_axes_mapping((10, 10, 10), anisotropic_affine) is None
+
+    angle = np.pi / 12
+    oblique_affine = np.eye(4)
+    oblique_affine[:2, :2] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    assert get_output_axes_mapping((10, 10, 10), oblique_affine) is None
+
+    for affine in [anisotropic_affine, oblique_affine]:
+        image_nib = nib.Nifti1Image(np.random.rand(10, 10, 10).astype('float32'), affine)
+        expected = resample_to_output(image_nib, order=1)
+        result = resample_to_output_space(image_nib, order=1, threads=1)
+        assert np.array_equal(np.asanyarray(result.dataobj), np.asanyarray(expected.dataobj))
+
+
+def test_threaded_resampling_matches_resample_to_output():
+    """
+    The resampling split over multiple threads gives the same result as the single-threaded nibabel implementation,
+    up to the floating-point rounding of the sampling coordinates.
+    """
+    angle = np.pi / 12
+    oblique_affine = np.eye(4)
+    oblique_affine[:2, :2] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    oblique_affine = oblique_affine.dot(np.diag([0.5, 0.5, 0.8, 1.]))
+    volumes = {1: (np.random.rand(60, 50, 40) * 1500).astype('int16'),
+               0: (np.random.rand(60, 50, 40) * 5).astype('uint8')}
+    for order in volumes.keys():
+        image_nib = nib.Nifti1Image(volumes[order], oblique_affine)
+        expected = np.asanyarray(resample_to_output(image_nib, order=order).dataobj)
+        for threads in [2, 3, 8]:
+            result = np.asanyarray(resample_to_output_space(image_nib, order=order, threads=threads).dataobj)
+            assert result.shape == expected.shape and result.dtype == expected.dtype
+            assert np.count_nonzero(result != expected) <= 0.001 * expected.size
+
+
+def test_label_resampling_with_shared_grid():
+    """
+    Label volumes on the same grid are resampled by gathering through a shared sampling map, computed only once per
+    memory layout, with the exact same result as resample_to_output when computed single-threaded.
+    """
+    ResamplingGridCache.getInstance().clear()
+    angle = np.pi / 9
+    oblique_affine = np.eye(4)
+    oblique_affine[1:3, 1:3] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    oblique_affine = oblique_affine.dot(np.diag([0.8, 0.8, 1.5, 1.]))
+    oblique_affine[:3, 3] = [-40.2, 12.5, 3.]
+    labels = [(np.random.rand(40, 30, 20) * 3).astype(dtype) for dtype in ['uint8', 'int16', 'float32', 'uint8']]
+    # Volumes loaded from disk by nibabel are Fortran-ordered, and share a sampling map of their own
+    labels = labels + [np.asfortranarray(label) for label in labels]
+
+    computations = [0]
+    compute_label_sampling_map = utilities.compute_label_sampling_map
+
+    def counted_compute_label_sampling_map(*args, **kwargs):
+        computations[0] = computations[0] + 1
+        return compute_label_sampling_map(*args, **kwargs)
+
+    utilities.compute_label_sampling_map = counted_compute_label_sampling_map
+    try:
+        for label in labels:
+            image_nib = nib.Nifti1Image(label, oblique_affine)
+            expected = resample_to_output(image_nib, order=0)
+            result = resample_to_output_space(image_nib, order=0, threads=1)
+            assert np.allclose(result.affine, expected.affine)
+            assert np.asanyarray(result.dataobj).dtype == np.asanyarray(expected.dataobj).dtype
+            assert np.array_equal(np.asanyarray(result.dataobj), np.asanyarray(expected.dataobj))
+    finally:
+        utilities.compute_label_sampling_map = compute_label_sampling_map
+    assert computations[0] == 2
+    ResamplingGridCache.getInstance().clear()
+
+
+def test_sampling_map_computed_outside_of_lock():
+    """
+    Sampling maps for different grids are computed concurrently, while concurrent requests for the same grid wait for
+    a single computation.
+    """
+    ResamplingGridCache.getInstance().clear()
+    computations = [0]
+    other_grid_started = threading.Event()
+    lock = threading.Lock()
+
+    def compute_first_grid():
+        with lock:
+            computations[0] = computations[0] + 1
+        # Only completes if the other grid can be computed in the meantime
+        assert other_grid_started.wait(timeout=10)
+        return np.zeros(8, dtype=np.intp), np.zeros(8, dtype=bool)
+
+    def compute_second_grid():
+        other_grid_started.set()
+        return np.ones(8, dtype=np.intp), np.zeros(8, dtype=bool)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ResamplingGridCache.getInstance().get_sampling_map(
+        np.eye(4), (2, 2, 2), 'C', compute_first_grid))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    second_result = ResamplingGridCache.getInstance().get_sampling_map(np.eye(4), (2, 2, 2), 'F', compute_second_grid)
+    for t in threads:
+        t.join()
+    assert computations[0] == 1
+    assert len(results) == 3 and all([r is results[0] for r in results])
+    assert np.array_equal(second_result[0], np.ones(8))
+    ResamplingGridCache.getInstance().clear()
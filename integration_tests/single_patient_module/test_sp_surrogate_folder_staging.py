@@ -0,0 +1,81 @@
+import os
+import shutil
+import requests
+import zipfile
+
+import pytest
+
+from utils.software_config import SoftwareConfigResources
+from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
+from utils.backend_logic import generate_surrogate_folder
+from utils.utilities import remove_staged_folder
+
+def_loc = UserPreferencesStructure.getInstance().user_home_location
+
+@pytest.fixture
+def test_location():
+    test_loc = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'integrationtests')
+    UserPreferencesStructure.getInstance().user_home_location = test_loc
+    os.makedirs(test_loc, exist_ok=True)
+    if os.path.exists(os.path.join(test_loc, "patients")):
+        shutil.rmtree(os.path.join(test_loc, "patients"))
+    if os.path.exists(os.path.join(test_loc, "studies")):
+        shutil.rmtree(os.path.join(test_loc, "studies"))
+    return test_loc
+
+@pytest.fixture
+def test_data_folder():
+    test_data_url = 'https://github.com/raidionics/Raidionics-models/releases/download/v1.3.0-rc/Samples-Raidionics-ApprovedExample-v1.3.1.zip'
+    test_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'integrationtests')
+    test_data_dir = os.path.join(test_dir, 'ApprovedExample')
+    if os.path.exists(test_data_dir) and len(os.listdir(test_data_dir)) > 0:
+        return test_data_dir
+
+    archive_dl_dest = os.path.join(test_dir, 'raidionics_resources.zip')
+    headers = {}
+    response = requests.get(test_data_url, headers=headers, stream=True)
+    response.raise_for_status()
+    if response.status_code == requests.codes.ok:
+        with open(archive_dl_dest, "wb") as f:
+            for chunk in response.iter_content(chunk_size=1048576):
+                f.write(chunk)
+    with zipfile.ZipFile(archive_dl_dest, 'r') as zip_ref:
+        zip_ref.extractall(test_dir)
+    return test_data_dir
+
+
+def test_surrogate_folder_no_duplication(test_location, test_data_folder):
+    """
+    Generation of the backend input folder for a patient with two MRI volumes, and verification that the staged files
+    are pointing to the patient files rather than being copies, and that removing the folder leaves the patient
+    files untouched.
+    """
+    patient_uid = SoftwareConfigResources.getInstance().add_new_empty_patient(active=False)
+    patient = SoftwareConfigResources.getInstance().get_patient(patient_uid)
+    patient.import_data(os.path.join(test_data_folder, 'Raw', 'Case27-T1.nii.gz'), type="MRI")
+    patient.import_data(os.path.join(test_data_folder, 'Raw', 'Case27-FLAIR.nii.gz'), type="MRI")
+
+    surrogate_folder = generate_surrogate_folder(patient, patient.output_folder, 'preop_segmentation')
+    staged_files = []
+    for root, _, files in os.walk(surrogate_folder):
+        staged_files.extend([os.path.join(root, f) for f in files])
+    assert len(staged_files) == 2
+
+    for im in patient.get_all_mri_volumes_uids():
+        source = patient.get_mri_by_uid(im).usable_input_filepath
+        staged = [f for f in staged_files if os.path.basename(f) == os.path.basename(source)]
+        assert len(staged) == 1
+        # Either a hard link to the same inode, or a symbolic link: no bytes duplicated on disk in both cases
+        assert os.path.islink(staged[0]) or os.stat(staged[0]).st_ino == os.stat(source).st_ino
+
+    remove_staged_folder(surrogate_folder)
+    assert not os.path.exists(surrogate_folder)
+    for im in patient.get_all_mri_volumes_uids():
+        assert os.path.exists(patient.get_mri_by_uid(im).usable_input_filepath)
+    SoftwareConfigResources.getInstance().remove_patient(patient_uid)
+
+
+def test_cleanup(test_location):
+    if os.path.exists(test_location):
+        shutil.rmtree(test_location)
+    UserPreferencesStructure.getInstance().user_home_location = def_loc
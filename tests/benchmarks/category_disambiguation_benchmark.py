@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import nibabel as nib
+import SimpleITK as sitk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from utils.utilities import input_file_category_disambiguation, input_volume_category_disambiguation
+
+
+def legacy_category_disambiguation(input_filename: str) -> str:
+    """
+    Previous implementation, reading the whole volume and sorting it up to twice.
+    """
+    array = sitk.GetArrayFromImage(sitk.ReadImage(input_filename))
+    if len(np.unique(array)) > 255 or np.max(array) > 255 or np.min(array) < -1:
+        return "MRI"
+    elif len(np.unique(array)) >= 25:
+        return "MRI"
+    return "Annotation"
+
+
+def generate_synthetic_volumes(folder: str, shape: tuple = (256, 256, 180)) -> dict:
+    """
+    Creates on disk the typical inputs found in patient folders: an int16 MRI volume, a float32 MRI volume with
+    intensities normalized in [0, 1], a binary annotation, and a label volume with 10 classes.
+    """
+    affine = np.diag([1., 1., 1., 1.])
+    mri = (np.random.rand(*shape) * 1500).astype('int16')
+    volumes = {'MRI (int16)': mri,
+               'MRI (float32)': (mri / 1500.).astype('float32'),
+               'Annotation (uint8)': (mri > 1400).astype('uint8'),
+               'Labels (uint8)': (mri // 150).astype('uint8')}
+    filenames = {}
+    for i, name in enumerate(volumes.keys()):
+        filenames[name] = os.path.join(folder, 'volume{}.nii.gz'.format(i))
+        nib.save(nib.Nifti1Image(volumes[name], affine), filenames[name])
+    return filenames
+
+
+def category_disambiguation_benchmark():
+    """
+    Compares the time needed to classify typical MRI and label volumes, from disk and from memory, between the legacy
+    implementation and the streaming classifier.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    tmp_folder = tempfile.mkdtemp()
+    try:
+        filenames = generate_synthetic_volumes(tmp_folder)
+        print("{:<22}{:>14}{:>14}{:>14}{:>14}{:>14}".format("Volume", "Category", "Legacy (s)", "File (s)",
+                                                             "Array (s)", "Array legacy"))
+        for name in filenames.keys():
+            start = time.time()
+            legacy_category = legacy_category_disambiguation(filenames[name])
+            legacy_time = time.time() - start
+
+            start = time.time()
+            category = input_file_category_disambiguation(filenames[name])
+            file_time = time.time() - start
+
+            array = np.asanyarray(nib.load(filenames[name]).dataobj)
+            start = time.time()
+            input_volume_category_disambiguation(array)
+            array_time = time.time() - start
+            start = time.time()
+            len(np.unique(array)) > 255 or np.max(array) > 255 or np.min(array) < -1 or len(np.unique(array)) >= 25
+            array_legacy_time = time.time() - start
+
+            assert category == legacy_category
+            print("{:<22}{:>14}{:>14.3f}{:>14.3f}{:>14.3f}{:>14.3f}".format(name, category, legacy_time, file_time,
+                                                                             array_time, array_legacy_time))
+    finally:
+        shutil.rmtree(tmp_folder)
+
+
+category_disambiguation_benchmark()
@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import SimpleITK as sitk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from utils.patient_dicom import PatientDICOM, parse_dicom_folders
+from utils.logic.DICOMIndex import DICOMIndex
+
+
+def generate_synthetic_dicom_tree(folder: str, series_number: int = 12, shape: tuple = (256, 256, 120)) -> None:
+    """
+    Creates on disk a DICOM folder tree for one patient with one study, each series being stored in its own
+    sub-folder as one file per slice, mimicking a typical PACS export.
+    """
+    study_uid = '1.2.826.0.1.3680043.2.1125.1'
+    for s in range(series_number):
+        series_folder = os.path.join(folder, 'DICOM', 'S{:03d}'.format(s))
+        os.makedirs(series_folder, exist_ok=True)
+        series_uid = study_uid + '.{}'.format(s + 1)
+        volume = (np.random.rand(shape[2], shape[1], shape[0]) * 1500).astype('int16')
+        writer = sitk.ImageFileWriter()
+        writer.KeepOriginalImageUIDOn()
+        for z in range(shape[2]):
+            image_slice = sitk.GetImageFromArray(volume[z])
+            tags = {'0008|0060': 'MR', '0008|1030': 'Synthetic study', '0008|103e': 'Series {}'.format(s),
+                    '0010|0020': 'Patient01', '0020|000d': study_uid, '0020|000e': series_uid, '0020|0010': 'Study01',
+                    '0020|0011': str(s + 1), '0020|0013': str(z + 1),
+                    '0020|0032': '0\\0\\{}'.format(z), '0020|0037': '1\\0\\0\\0\\1\\0',
+                    '0008|0018': series_uid + '.{}'.format(z + 1)}
+            for k in tags.keys():
+                image_slice.SetMetaData(k, tags[k])
+            writer.SetFileName(os.path.join(series_folder, 'IM{:04d}.dcm'.format(z)))
+            writer.Execute(image_slice)
+
+
+def scan_with_full_decoding(folder: str) -> int:
+    """
+    Previous behaviour of the DICOM parsing, where the pixel data of every series were decoded while scanning.
+    """
+    series_count = 0
+    for root, dirs, _ in os.walk(folder):
+        if len(dirs) != 0:
+            continue
+        reader = sitk.ImageSeriesReader()
+        for serie in reader.GetGDCMSeriesIDs(root):
+            reader.SetFileNames(reader.GetGDCMSeriesFileNames(root, serie))
+            reader.LoadPrivateTagsOn()
+            reader.SetMetaDataDictionaryArrayUpdate(True)
+            reader.Execute()
+            series_count = series_count + 1
+    return series_count
+
+
+def dicom_scan_benchmark():
+    """
+    Compares the time needed to browse a synthetic DICOM folder tree when decoding the pixel data of all series, against
+    the header-only scanning performed by PatientDICOM, either sequentially, concurrently, or from the DICOM index
+    once the folder has already been scanned.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    tmp_folder = tempfile.mkdtemp()
+    try:
+        generate_synthetic_dicom_tree(tmp_folder)
+
+        start = time.time()
+        full_count = scan_with_full_decoding(tmp_folder)
+        full_time = time.time() - start
+
+        start = time.time()
+        parse_dicom_folders([PatientDICOM(tmp_folder)], max_workers=1)
+        sequential_time = time.time() - start
+
+        start = time.time()
+        dicom_holder = PatientDICOM(tmp_folder)
+        dicom_holder.parse_dicom_folder()
+        header_time = time.time() - start
+        header_count = sum([len(dicom_holder.studies[st].dicom_series) for st in dicom_holder.studies.keys()])
+
+        index_folder = tempfile.mkdtemp()
+        try:
+            dicom_index = DICOMIndex(os.path.join(index_folder, 'dicom_index.sqlite'))
+            PatientDICOM(tmp_folder).parse_dicom_folder(dicom_index=dicom_index)
+            start = time.time()
+            PatientDICOM(tmp_folder).parse_dicom_folder(dicom_index=dicom_index)
+            indexed_time = time.time() - start
+            dicom_index.close()
+        finally:
+            shutil.rmtree(index_folder)
+
+        start = time.time()
+        first_series = list(list(dicom_holder.studies.values())[0].dicom_series.values())[0]
+        first_series.volume
+        import_time = time.time() - start
+
+        print("{:<30}{:>10}{:>12}".format("Scanning mode", "Series", "Time (s)"))
+        print("{:<30}{:>10}{:>12.2f}".format("Full decoding", full_count, full_time))
+        print("{:<30}{:>10}{:>12.2f}".format("Header only, single thread", header_count, sequential_time))
+        print("{:<30}{:>10}{:>12.2f}".format("Header only, thread pool", header_count, header_time))
+        print("{:<30}{:>10}{:>12.3f}".format("Header only, indexed", header_count, indexed_time))
+        print("{:<30}{:>10}{:>12.2f}".format("Decoding one series on import", 1, import_time))
+        print("Speed-up for scanning: {:.1f}x".format(full_time / header_time))
+    finally:
+        shutil.rmtree(tmp_folder)
+
+
+dicom_scan_benchmark()
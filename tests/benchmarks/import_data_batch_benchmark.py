@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import nibabel as nib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from utils.data_structures.PatientParametersStructure import PatientParameters
+
+
+def generate_synthetic_files(folder: str, mris_number: int = 6, labels_number: int = 4,
+                             shape: tuple = (192, 192, 128)) -> list:
+    """
+    Writes on disk the typical content dropped onto the viewer: a few slightly oblique MRI volumes, each with the
+    labels produced by a segmentation pipeline.
+    """
+    angle = np.pi / 36
+    affine = np.eye(4)
+    affine[:2, :2] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    filenames = []
+    for m in range(mris_number):
+        mri = (np.random.rand(*shape) * 1500).astype('int16')
+        filenames.append(os.path.join(folder, 'MRI{}.nii.gz'.format(m)))
+        nib.save(nib.Nifti1Image(mri, affine), filenames[-1])
+        for l in range(labels_number):
+            filenames.append(os.path.join(folder, 'MRI{}_label_{}.nii.gz'.format(m, l)))
+            nib.save(nib.Nifti1Image((mri > 1500 - 100 * (l + 1)).astype('uint8'), affine), filenames[-1])
+    return filenames
+
+
+def import_data_batch_benchmark():
+    """
+    Compares the time needed to import 30 volumes into a patient when imported one by one with import_data, as
+    previously done by the import dialogs, against the bulk import processing the files concurrently.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    folder = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(folder, 'inputs'))
+        filenames = generate_synthetic_files(os.path.join(folder, 'inputs'))
+
+        start = time.time()
+        sequential_patient = PatientParameters(id='sequential', dest_location=os.path.join(folder, 'home'))
+        for filename in filenames:
+            sequential_patient.import_data(filename)
+        sequential_time = time.time() - start
+
+        start = time.time()
+        batch_patient = PatientParameters(id='batch', dest_location=os.path.join(folder, 'home'))
+        results = batch_patient.import_data_batch(filenames)
+        batch_time = time.time() - start
+
+        assert [r[2] for r in results] == [None] * len(filenames)
+        assert len(batch_patient.mri_volumes) == len(sequential_patient.mri_volumes)
+        assert len(batch_patient.annotation_volumes) == len(sequential_patient.annotation_volumes)
+
+        print("Available CPU cores: {}".format(os.cpu_count()))
+        print("{:<10}{:>16}{:>12}{:>10}".format("Files", "Sequential (s)", "Batch (s)", "Speed-up"))
+        print("{:<10}{:>16.2f}{:>12.2f}{:>10.1f}".format(len(filenames), sequential_time, batch_time,
+                                                        sequential_time / batch_time))
+    finally:
+        shutil.rmtree(folder)
+
+
+import_data_batch_benchmark()
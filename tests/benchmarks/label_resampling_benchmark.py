@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import logging
+import numpy as np
+import nibabel as nib
+from nibabel.processing import resample_to_output
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from utils.logic.ResamplingGridCache import ResamplingGridCache
+from utils.utilities import resample_to_output_space
+
+
+def generate_synthetic_segmentation(labels_number: int = 8) -> list:
+    """
+    Creates in memory the typical output of a segmentation pipeline for a slightly oblique 0.5 mm isotropic series,
+    as many label volumes sharing the voxel grid of their parent MRI.
+    """
+    angle = np.pi / 36
+    oblique = np.eye(4)
+    oblique[:2, :2] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    affine = oblique.dot(np.diag([0.5, 0.5, 0.5, 1.]))
+    return [nib.Nifti1Image((np.random.rand(384, 384, 256) * 2).astype('uint8'), affine)
+            for _ in range(labels_number)]
+
+
+def label_resampling_benchmark():
+    """
+    Compares the time needed to import all labels of a segmentation result between the nibabel resample_to_output
+    performed independently for each label, and the resampling gathering through the sampling map shared by all labels.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    labels = generate_synthetic_segmentation()
+    ResamplingGridCache.getInstance().clear()
+    nibabel_times = []
+    cached_times = []
+    for label in labels:
+        start = time.time()
+        expected = np.asanyarray(resample_to_output(label, order=0).dataobj)
+        nibabel_times.append(time.time() - start)
+
+        start = time.time()
+        result = np.asanyarray(resample_to_output_space(label, order=0, threads=1).dataobj)
+        cached_times.append(time.time() - start)
+        assert np.array_equal(result, expected)
+
+    print("{:<10}{:>14}{:>14}".format("Label", "nibabel (s)", "Shared (s)"))
+    for i in range(len(labels)):
+        print("{:<10}{:>14.2f}{:>14.2f}".format(i, nibabel_times[i], cached_times[i]))
+    print("{:<10}{:>14.2f}{:>14.2f}".format("Total", sum(nibabel_times), sum(cached_times)))
+    print("Speed-up: {:.1f}".format(sum(nibabel_times) / sum(cached_times)))
+
+
+label_resampling_benchmark()
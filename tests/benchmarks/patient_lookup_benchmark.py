@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import nibabel as nib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from utils.data_structures.PatientParametersStructure import PatientParameters
+from utils.data_structures.AnnotationStructure import AnnotationClassType, AnnotationGenerationType
+
+
+def legacy_specific_annotations_for_mri(patient: PatientParameters, mri_volume_uid: str,
+                                        annotation_class: AnnotationClassType = None,
+                                        generation_type: AnnotationGenerationType = None) -> list:
+    """
+    Previous implementation, iterating over all annotations of the patient for every query.
+    """
+    res = []
+    for an in patient.annotation_volumes:
+        annotation = patient.annotation_volumes[an]
+        if annotation.get_parent_mri_uid() != mri_volume_uid:
+            continue
+        if annotation_class and annotation.get_annotation_class_enum() != annotation_class:
+            continue
+        if generation_type and annotation.get_generation_type_enum() != generation_type:
+            continue
+        res.append(an)
+    return res
+
+
+def legacy_mri_volumes_for_timestamp(patient: PatientParameters, timestamp_uid: str) -> list:
+    return [im for im in patient.mri_volumes if patient.mri_volumes[im].timestamp_uid == timestamp_uid]
+
+
+def surrogate_folder_queries(patient: PatientParameters, specific_annotations, mri_volumes_for_timestamp) -> list:
+    """
+    Lookups performed when generating the surrogate folder before running a pipeline, i.e., for each radiological
+    volume, for each annotation class, the manual then automatic annotations.
+    """
+    results = []
+    for ts in patient.get_all_timestamps_uids():
+        for im in mri_volumes_for_timestamp(patient, ts):
+            for c in AnnotationClassType:
+                results.append(specific_annotations(patient, im, c, AnnotationGenerationType.Manual))
+                results.append(specific_annotations(patient, im, c, AnnotationGenerationType.Automatic))
+    return results
+
+
+def indexed_specific_annotations_for_mri(patient, mri_volume_uid, annotation_class, generation_type):
+    return patient.get_specific_annotations_for_mri(mri_volume_uid=mri_volume_uid, annotation_class=annotation_class,
+                                                    generation_type=generation_type)
+
+
+def indexed_mri_volumes_for_timestamp(patient, timestamp_uid):
+    return patient.get_all_mri_volumes_for_timestamp(timestamp_uid=timestamp_uid)
+
+
+def grow_synthetic_patient(patient: PatientParameters, folder: str, volumes_number: int,
+                           shape: tuple = (8, 8, 8)) -> None:
+    """
+    Adds radiological volumes to the patient, spread over four timestamps, each with a manual tumor annotation and an
+    automatic brain annotation.
+    """
+    affine = np.diag([1., 1., 1., 1.])
+    timestamps = patient.get_all_timestamps_uids()
+    start_index = len(patient.mri_volumes)
+    for v in range(start_index, start_index + volumes_number):
+        ts_uid = timestamps[v % len(timestamps)]
+        ts_folder_name = patient.get_timestamp_by_uid(ts_uid).folder_name
+        mri_filename = os.path.join(folder, 'MRI{}.nii.gz'.format(v))
+        mri = (np.random.rand(*shape) * 1500).astype('int16')
+        nib.save(nib.Nifti1Image(mri, affine), mri_filename)
+        mri_uid = patient.import_data(mri_filename, investigation_ts=ts_uid, type="MRI")
+        for annotation_class, generation_type in [(AnnotationClassType.Tumor, AnnotationGenerationType.Manual),
+                                                  (AnnotationClassType.Brain, AnnotationGenerationType.Automatic)]:
+            annotation_filename = os.path.join(folder, 'MRI{}_label_{}.nii.gz'.format(v, annotation_class.name))
+            nib.save(nib.Nifti1Image((mri > 1400).astype('uint8'), affine), annotation_filename)
+            anno_uid = patient.import_data(annotation_filename, investigation_ts=ts_uid,
+                                           investigation_ts_folder_name=ts_folder_name, type="Annotation")
+            annotation = patient.get_annotation_by_uid(anno_uid)
+            annotation.set_parent_mri_uid(mri_uid)
+            annotation.set_annotation_class_type(annotation_class)
+            annotation.set_generation_type(generation_type)
+
+
+def patient_lookup_benchmark():
+    """
+    Compares, for a patient growing up to hundreds of objects, the time needed for the lookups performed when
+    generating a surrogate folder with the previous linear scans against the secondary indexes of the patient.
+    The linear scans grow quadratically with the number of objects, while the indexed lookups grow linearly.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    tmp_folder = tempfile.mkdtemp()
+    try:
+        inputs_folder = os.path.join(tmp_folder, 'inputs')
+        os.makedirs(inputs_folder)
+        patient = PatientParameters(id='benchmark', dest_location=os.path.join(tmp_folder, 'home'))
+        for t in range(4):
+            patient.insert_investigation_timestamp(order=t)
+
+        print("{:>10}{:>14}{:>16}{:>16}{:>12}".format("MRIs", "Objects", "Linear (s)", "Indexed (s)", "Speed-up"))
+        for step in [25, 25, 50, 100]:
+            grow_synthetic_patient(patient, inputs_folder, volumes_number=step)
+            objects_number = len(patient.mri_volumes) + len(patient.annotation_volumes)
+
+            start = time.time()
+            legacy_results = surrogate_folder_queries(patient, legacy_specific_annotations_for_mri,
+                                                      legacy_mri_volumes_for_timestamp)
+            legacy_time = time.time() - start
+
+            start = time.time()
+            indexed_results = surrogate_folder_queries(patient, indexed_specific_annotations_for_mri,
+                                                       indexed_mri_volumes_for_timestamp)
+            indexed_time = time.time() - start
+
+            assert legacy_results == indexed_results
+            print("{:>10}{:>14}{:>16.4f}{:>16.4f}{:>12.1f}".format(len(patient.mri_volumes), objects_number,
+                                                                 legacy_time, indexed_time,
+                                                                 legacy_time / indexed_time))
+
+        # The indexes must follow the modifications and removals of the objects
+        mri_uid = patient.get_all_mri_volumes_uids()[0]
+        anno_uid = patient.get_all_annotations_for_mri(mri_uid)[0]
+        patient.get_annotation_by_uid(anno_uid).set_annotation_class_type(AnnotationClassType.Necrosis)
+        patient.remove_annotation(patient.get_all_annotations_for_mri(mri_uid)[1])
+        patient.remove_mri_volume(patient.get_all_mri_volumes_uids()[1])
+        assert surrogate_folder_queries(patient, legacy_specific_annotations_for_mri,
+                                        legacy_mri_volumes_for_timestamp) == \
+            surrogate_folder_queries(patient, indexed_specific_annotations_for_mri, indexed_mri_volumes_for_timestamp)
+    finally:
+        shutil.rmtree(tmp_folder)
+
+
+patient_lookup_benchmark()
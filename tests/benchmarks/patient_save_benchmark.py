@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import tempfile
+import numpy as np
+import nibabel as nib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from utils.data_structures.PatientParametersStructure import PatientParameters
+
+
+def generate_synthetic_patient(folder: str, timestamps_number: int = 4, volumes_number: int = 10,
+                               shape: tuple = (64, 64, 48)) -> PatientParameters:
+    """
+    Creates a patient with many objects: for each timestamp, several MRI volumes, one annotation per volume, and one
+    report, mimicking a patient followed over many investigations.
+    """
+    affine = np.diag([1., 1., 1., 1.])
+    inputs_folder = os.path.join(folder, 'inputs')
+    os.makedirs(inputs_folder)
+    patient = PatientParameters(id='benchmark', dest_location=os.path.join(folder, 'home'))
+    for t in range(timestamps_number):
+        ts_uid, _ = patient.insert_investigation_timestamp(order=t)
+        patient.set_active_investigation_timestamp(ts_uid)
+        for v in range(volumes_number):
+            mri_filename = os.path.join(inputs_folder, 'T{}_MRI{}.nii.gz'.format(t, v))
+            annotation_filename = os.path.join(inputs_folder, 'T{}_MRI{}_label_tumor.nii.gz'.format(t, v))
+            mri = (np.random.rand(*shape) * 1500).astype('int16')
+            nib.save(nib.Nifti1Image(mri, affine), mri_filename)
+            nib.save(nib.Nifti1Image((mri > 1400).astype('uint8'), affine), annotation_filename)
+            patient.import_data(mri_filename, investigation_ts=ts_uid, type="MRI")
+            patient.import_data(annotation_filename, investigation_ts=ts_uid,
+                                investigation_ts_folder_name=patient.get_timestamp_by_uid(ts_uid).folder_name,
+                                type="Annotation")
+        report_filename = os.path.join(patient.output_folder, patient.get_timestamp_by_uid(ts_uid).folder_name,
+                                       'report.json')
+        os.makedirs(os.path.dirname(report_filename), exist_ok=True)
+        with open(report_filename, 'w') as outfile:
+            json.dump({'Main': {'Total': {'Volume (ml)': t}}}, outfile)
+        patient.import_report(report_filename, ts_uid)
+    return patient
+
+
+def read_scene(patient: PatientParameters) -> dict:
+    with open(patient._patient_parameters_dict_filename, 'r') as infile:
+        scene = json.load(infile)
+    del scene['Parameters']['Default']['last_editing_timestamp']
+    return scene
+
+
+def patient_save_benchmark():
+    """
+    Compares the time needed to save a patient with many objects when all objects are dumped again, as was done for
+    every save previously, against the incremental save where only the modified objects are dumped.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    tmp_folder = tempfile.mkdtemp()
+    try:
+        patient = generate_synthetic_patient(tmp_folder)
+        objects_number = len(patient.investigation_timestamps) + len(patient.mri_volumes) + \
+            len(patient.annotation_volumes) + len(patient.reportings)
+
+        start = time.time()
+        patient.save_patient()
+        first_time = time.time() - start
+
+        repeats = 10
+        start = time.time()
+        for r in range(repeats):
+            patient.set_unsaved_changes_state(True)
+            patient.save_patient()
+        full_time = (time.time() - start) / repeats
+        full_scene = read_scene(patient)
+
+        start = time.time()
+        for r in range(repeats):
+            patient.save_patient()
+        unchanged_time = (time.time() - start) / repeats
+
+        mri_uids = patient.get_all_mri_volumes_uids()
+        start = time.time()
+        for r in range(repeats):
+            patient.get_mri_by_uid(mri_uids[r % len(mri_uids)]).display_name = 'Renamed{}'.format(r)
+            patient.save_patient()
+        incremental_time = (time.time() - start) / repeats
+
+        # The incremental saves must produce the exact same scene as dumping all objects again
+        incremental_scene = read_scene(patient)
+        patient.set_unsaved_changes_state(True)
+        patient.save_patient()
+        assert incremental_scene == read_scene(patient)
+        assert full_scene['Volumes'].keys() == incremental_scene['Volumes'].keys()
+
+        print("Patient with {} objects".format(objects_number))
+        print("{:<40}{:>12}".format("Save mode", "Time (s)"))
+        print("{:<40}{:>12.3f}".format("First save", first_time))
+        print("{:<40}{:>12.3f}".format("All objects dumped (previous behaviour)", full_time))
+        print("{:<40}{:>12.3f}".format("Incremental, one object modified", incremental_time))
+        print("{:<40}{:>12.3f}".format("Incremental, no modification", unchanged_time))
+        print("Speed-up for saving after one modification: {:.1f}x".format(full_time / incremental_time))
+    finally:
+        shutil.rmtree(tmp_folder)
+
+
+patient_save_benchmark()
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import logging
+import numpy as np
+import nibabel as nib
+from nibabel.processing import resample_to_output
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from utils.utilities import resample_to_output_space
+
+
+def generate_synthetic_series() -> dict:
+    """
+    Creates in memory the typical series requiring an actual resampling: a 0.5 mm isotropic post-operative scan with a
+    slightly oblique orientation, and an anisotropic series with thick slices.
+    """
+    angle = np.pi / 36
+    oblique = np.eye(4)
+    oblique[:2, :2] = [[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]]
+    return {'0.5 mm isotropic, oblique': nib.Nifti1Image((np.random.rand(448, 448, 320) * 1500).astype('int16'),
+                                                         oblique.dot(np.diag([0.5, 0.5, 0.5, 1.]))),
+            'Anisotropic (0.9x0.9x5 mm)': nib.Nifti1Image((np.random.rand(256, 256, 30) * 1500).astype('int16'),
+                                                          np.diag([0.9, 0.9, 5., 1.]))}
+
+
+def resampling_benchmark():
+    """
+    Compares the time needed to standardize large or anisotropic series with the single-threaded nibabel
+    resample_to_output against the resampling split over an increasing number of threads.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    series = generate_synthetic_series()
+    threads_numbers = sorted(set([2, 4, max(2, os.cpu_count() or 1)]))
+    print("Available CPU cores: {}".format(os.cpu_count()))
+    print("{:<30}{:>14}".format("Series", "nibabel (s)") + "".join(["{:>14}".format("{} threads (s)".format(t))
+                                                                   for t in threads_numbers]))
+    for name in series.keys():
+        start = time.time()
+        expected = np.asanyarray(resample_to_output(series[name], order=1).dataobj)
+        reference_time = time.time() - start
+
+        threaded_times = []
+        for threads in threads_numbers:
+            start = time.time()
+            result = np.asanyarray(resample_to_output_space(series[name], order=1, threads=threads).dataobj)
+            threaded_times.append(time.time() - start)
+            assert np.count_nonzero(result != expected) <= 0.001 * expected.size
+
+        print("{:<30}{:>14.2f}".format(name, reference_time) + "".join(["{:>14.2f}".format(t)
+                                                                        for t in threaded_times]))
+
+
+resampling_benchmark()
@@ -0,0 +1,71 @@
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import numpy as np
+import nibabel as nib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..'))
+from utils.data_structures.MRIVolumeStructure import MRIVolume
+from utils.data_structures.AnnotationStructure import AnnotationVolume
+from utils.data_structures.AtlasStructure import AtlasVolume
+
+
+def generate_synthetic_patient(folder: str, shape: tuple = (256, 256, 180)) -> dict:
+    """
+    Creates on disk an int16 MRI volume, a binary annotation, and an atlas with 100 labels, mimicking the content of a
+    typical patient.
+    """
+    affine = np.diag([1., 1., 1., 1.])
+    mri = (np.random.rand(*shape) * 1500).astype('int16')
+    annotation = (mri > 1400).astype('uint8')
+    atlas = (np.random.rand(*shape) * 100).astype('uint8')
+    filenames = {'MRI': os.path.join(folder, 'mri.nii.gz'), 'Annotation': os.path.join(folder, 'annotation.nii.gz'),
+                 'Atlas': os.path.join(folder, 'atlas.nii.gz')}
+    nib.save(nib.Nifti1Image(mri, affine), filenames['MRI'])
+    nib.save(nib.Nifti1Image(annotation, affine), filenames['Annotation'])
+    nib.save(nib.Nifti1Image(atlas, affine), filenames['Atlas'])
+    return filenames
+
+
+def volume_memory_benchmark():
+    """
+    Compares the memory footprint of the volumes held by the data structures, against the float64 arrays
+    materialised by get_fdata for the same files.
+    """
+    logging.basicConfig()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    tmp_folder = tempfile.mkdtemp()
+    try:
+        filenames = generate_synthetic_patient(tmp_folder)
+        patient_folder = os.path.join(tmp_folder, 'patient')
+        mri = MRIVolume(uid='MRI', inv_ts_uid='T0', input_filename=filenames['MRI'],
+                        output_patient_folder=patient_folder)
+        annotation = AnnotationVolume(uid='Annotation', input_filename=filenames['Annotation'],
+                                      output_patient_folder=patient_folder, inv_ts_uid='T0', parent_mri_uid='MRI')
+        atlas = AtlasVolume(uid='Atlas', input_filename=filenames['Atlas'], output_patient_folder=patient_folder,
+                            inv_ts_uid='T0', parent_mri_uid='MRI', description_filename=None)
+
+        print("{:<12}{:>12}{:>20}{:>20}{:>12}".format("Volume", "Dtype", "Structure (MB)", "get_fdata (MB)",
+                                                       "Reduction"))
+        total_compact = 0
+        total_float64 = 0
+        for name, volume in [('MRI', mri), ('Annotation', annotation), ('Atlas', atlas)]:
+            compact = volume._resampled_input_volume
+            float64_size = nib.load(filenames[name]).get_fdata().nbytes
+            total_compact = total_compact + compact.nbytes
+            total_float64 = total_float64 + float64_size
+            print("{:<12}{:>12}{:>20.1f}{:>20.1f}{:>11.1f}x".format(name, str(compact.dtype),
+                                                                     compact.nbytes / (1024 * 1024),
+                                                                     float64_size / (1024 * 1024),
+                                                                     float64_size / compact.nbytes))
+        print("{:<12}{:>12}{:>20.1f}{:>20.1f}{:>11.1f}x".format('Total', '', total_compact / (1024 * 1024),
+                                                                 total_float64 / (1024 * 1024),
+                                                                 total_float64 / total_compact))
+    finally:
+        shutil.rmtree(tmp_folder)
+
+
+volume_memory_benchmark()
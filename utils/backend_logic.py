@@ -11,14 +11,16 @@ import configparser
 import threading
 import shutil
 import pandas as pd
-from typing import Any, Tuple
-import multiprocessing as mp
+from typing import Any
 from utils.software_config import SoftwareConfigResources
 from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
 from utils.data_structures.PatientParametersStructure import PatientParameters
 from utils.data_structures.AnnotationStructure import AnnotationGenerationType, AnnotationClassType
 from utils.logic.PipelineCreationHandler import create_pipeline
 from utils.logic.PipelineResultsCollector import collect_results
+from utils.utilities import stage_file, remove_staged_folder
+
+_logging_reset_lock = threading.Lock()  # Pipelines can run concurrently in batch mode, the log handler is shared
 
 
 def pipeline_main_wrapper(pipeline_task: str, tumor_type: str, patient_parameters: PatientParameters) -> Any:
@@ -125,24 +127,31 @@ def run_pipeline(task: str, tumor_type: str, patient_parameters: PatientParamete
         with open(rads_config_filename, 'w') as outfile:
             rads_config.write(outfile)
 
-        #mp.set_start_method('spawn', force=True)
-        with mp.Pool(processes=1, maxtasksperchild=1) as p:  # , initializer=initializer)
-            result = p.map_async(run_pipeline_wrapper, ((rads_config_filename, SoftwareConfigResources.getInstance().get_session_log_filename()),))
-            ret = result.get()[0]
+        # Identical inputs already processed with the same pipeline and options are restored from the local cache.
+        results_cache = SoftwareConfigResources.getInstance().get_results_cache()
+        cache_key = None
+        if results_cache.is_enabled():
+            cache_key = results_cache.compute_key(input_folder=surrogate_folder_path, pipeline=pipeline,
+                                                  runtime_options=UserPreferencesStructure.getInstance().get_pipeline_runtime_options(),
+                                                  models_folder=SoftwareConfigResources.getInstance().models_path)
+        if cache_key is None or not results_cache.retrieve(cache_key, reporting_folder):
+            # The backend is run inside one of the warm worker processes, which are kept alive between calls.
+            ret, error_message = SoftwareConfigResources.getInstance().get_backend_workers().run(
+                rads_config_filename, SoftwareConfigResources.getInstance().get_session_log_filename())
 
-        # Must start again the logging, otherwise it writes in the middle of the file somehow...
-        log_handler = logging.getLogger().handlers[-1]
-        logging.getLogger().removeHandler(log_handler)
-        log_handler.close()
-        logging.basicConfig(filename=SoftwareConfigResources.getInstance().get_session_log_filename(), filemode='a',
-                            format="%(asctime)s ; %(name)s ; %(levelname)s ; %(message)s", datefmt='%d/%m/%Y %H.%M')
+            # Must start again the logging, otherwise it writes in the middle of the file somehow...
+            with _logging_reset_lock:
+                log_handler = logging.getLogger().handlers[-1]
+                logging.getLogger().removeHandler(log_handler)
+                log_handler.close()
+                logging.basicConfig(filename=SoftwareConfigResources.getInstance().get_session_log_filename(), filemode='a',
+                                    format="%(asctime)s ; %(name)s ; %(levelname)s ; %(message)s", datefmt='%d/%m/%Y %H.%M')
+            if ret != 0:
+                raise RuntimeError("Backend execution failed with: {}".format(error_message))
 
-        # logging.debug("Spawning multiprocess...")
-        # mp.set_start_method('spawn', force=True)
-        # with mp.Pool(processes=1, maxtasksperchild=1) as p:  # , initializer=initializer)
-        #     result = p.map_async(run_rads, [rads_config_filename])
-        #     logging.debug("Collecting results from multiprocess...")
-        #     ret = result.get()[0]
+            # Storing the raw backend outputs before they are moved inside the patient folder by collect_results.
+            if cache_key is not None:
+                results_cache.store(cache_key, reporting_folder)
 
         results = collect_results(patient_parameters, pipeline)
     except Exception as e:
@@ -153,7 +162,7 @@ def run_pipeline(task: str, tumor_type: str, patient_parameters: PatientParamete
         if os.path.exists(pipeline_filename):
             os.remove(pipeline_filename)
         if os.path.exists(os.path.join(patient_parameters.output_folder, 'pipeline_input')):
-            shutil.rmtree(os.path.join(patient_parameters.output_folder, 'pipeline_input'))
+            remove_staged_folder(os.path.join(patient_parameters.output_folder, 'pipeline_input'))
         if os.path.exists(os.path.join(patient_parameters.output_folder, 'reporting')):
             shutil.rmtree(os.path.join(patient_parameters.output_folder, 'reporting'))
         if os.path.exists(os.path.join(patient_parameters.output_folder, "mri_sequences.csv")):
@@ -166,7 +175,7 @@ def run_pipeline(task: str, tumor_type: str, patient_parameters: PatientParamete
     if os.path.exists(pipeline_filename):
         os.remove(pipeline_filename)
     if os.path.exists(os.path.join(patient_parameters.output_folder, 'pipeline_input')):
-        shutil.rmtree(os.path.join(patient_parameters.output_folder, 'pipeline_input'))
+        remove_staged_folder(os.path.join(patient_parameters.output_folder, 'pipeline_input'))
     if os.path.exists(os.path.join(patient_parameters.output_folder, 'reporting')):
         shutil.rmtree(os.path.join(patient_parameters.output_folder, 'reporting'))
     if os.path.exists(os.path.join(patient_parameters.output_folder, "mri_sequences.csv")):
@@ -175,23 +184,6 @@ def run_pipeline(task: str, tumor_type: str, patient_parameters: PatientParamete
     queue.put((0, results))
 
 
-def run_pipeline_wrapper(params: Tuple[str]) -> None:
-    """
-    Additional wrapper around the run_rads method from the raidionics_rads_lib, necessary for multiprocessing to work.
-    Being able to run it in another process is also mandatory for the study/batch mode, given the existing memory leaks
-    inside TensorFlow.
-
-    Parameters
-    ----------
-    params: Tuple[str]
-        The first element is the runtime configuration filename containing the specific information for the process
-        (e.g., model name, input MRI volume filename). The second element is the log filename to be able to track
-        what is happening inside the spawned processes, by filling in the same file on disk as Raidionics.
-    """
-    from raidionicsrads.compute import run_rads
-    run_rads(params[0], params[1])
-
-
 def generate_sequences_file(patient_parameters: PatientParameters, output_folder: str) -> None:
     """
     Generating a temporary file with the manually set sequences for all MRI series input, for use as input in the
@@ -217,6 +209,9 @@ def generate_sequences_file(patient_parameters: PatientParameters, output_folder
 def generate_surrogate_folder(patient_parameters: PatientParameters, output_folder: str, pipeline_task: str) -> str:
     """
     Generating a temporary input folder for the backend, containing only the necessary files.
+    The files are staged as links to the patient files whenever possible (hard links, then symbolic links), and only
+    copied as a last resort, such that no data is duplicated on disk. The folder must hence be removed with
+    remove_staged_folder.
     When manual annotations exist, the choice is left to the user to ship them to the backend for re-use, or to
     generate them from scratch (through the Settings > Preferences panel).
     @Behaviour. For segmentation tasks, should it compute an automatic annotation even when a manual one has already
@@ -235,7 +230,7 @@ def generate_surrogate_folder(patient_parameters: PatientParameters, output_fold
     try:
         if os.path.exists(surrogate_folder):
             # Should not happen as we should try/except around the processing and delete it there always.
-            shutil.rmtree(surrogate_folder)
+            remove_staged_folder(surrogate_folder)
 
         os.makedirs(surrogate_folder)
         use_manual_files = UserPreferencesStructure.getInstance().use_manual_annotations
@@ -245,9 +240,9 @@ def generate_surrogate_folder(patient_parameters: PatientParameters, output_fold
         for im in patient_parameters.get_all_mri_volumes_uids():
             ts = patient_parameters.get_mri_by_uid(im).timestamp_uid
             ts_object = patient_parameters.get_timestamp_by_uid(ts)
-            shutil.copyfile(src=patient_parameters.get_mri_by_uid(im).usable_input_filepath,
-                            dst=os.path.join(surrogate_folder, "T" + str(ts_object.order),
-                                             os.path.basename(patient_parameters.get_mri_by_uid(im).usable_input_filepath)))
+            stage_file(src=patient_parameters.get_mri_by_uid(im).usable_input_filepath,
+                       dst=os.path.join(surrogate_folder, "T" + str(ts_object.order),
+                                        os.path.basename(patient_parameters.get_mri_by_uid(im).usable_input_filepath)))
             annotation_classes = [c for c in AnnotationClassType]
             for c in annotation_classes:
                 manual_annos = patient_parameters.get_specific_annotations_for_mri(mri_volume_uid=im,
@@ -255,17 +250,17 @@ def generate_surrogate_folder(patient_parameters: PatientParameters, output_fold
                                                                             annotation_class=c)
                 if use_manual_files and len(manual_annos) != 0 and 'segmentation' not in pipeline_task.lower():
                     for anno in manual_annos:
-                        shutil.copyfile(src=patient_parameters.get_annotation_by_uid(anno).usable_input_filepath,
-                                        dst=os.path.join(surrogate_folder, "T" + str(ts_object.order), os.path.basename(
-                                            patient_parameters.get_mri_by_uid(im).usable_input_filepath[:-7] + '-label_' + c.name + '.nii.gz')))
+                        stage_file(src=patient_parameters.get_annotation_by_uid(anno).usable_input_filepath,
+                                   dst=os.path.join(surrogate_folder, "T" + str(ts_object.order), os.path.basename(
+                                       patient_parameters.get_mri_by_uid(im).usable_input_filepath[:-7] + '-label_' + c.name + '.nii.gz')))
                 else:
                     annos = patient_parameters.get_specific_annotations_for_mri(mri_volume_uid=im,
                                                                                 generation_type=AnnotationGenerationType.Automatic,
                                                                                 annotation_class=c)
                     for anno in annos:
-                        shutil.copyfile(src=patient_parameters.get_annotation_by_uid(anno).usable_input_filepath,
-                                        dst=os.path.join(surrogate_folder, "T" + str(ts_object.order), os.path.basename(
-                                            patient_parameters.get_mri_by_uid(im).usable_input_filepath[:-7] + '-label_' + c.name + '.nii.gz')))
+                        stage_file(src=patient_parameters.get_annotation_by_uid(anno).usable_input_filepath,
+                                   dst=os.path.join(surrogate_folder, "T" + str(ts_object.order), os.path.basename(
+                                       patient_parameters.get_mri_by_uid(im).usable_input_filepath[:-7] + '-label_' + c.name + '.nii.gz')))
 
     except Exception:
         logging.error('Pipeline surrogate folder creation failed with: \n{}'.format(traceback.format_exc()))
@@ -2,16 +2,17 @@ import traceback
 import shutil
 from aenum import Enum, unique
 import logging
-from typing import Union, Any, Tuple, List
+from typing import Union, Any, Tuple, List, Callable
 import numpy as np
 import nibabel as nib
-from nibabel.processing import resample_to_output
 from copy import deepcopy
 import os
 from pathlib import PurePath
 import re
 
-from utils.utilities import get_type_from_string, get_type_from_name, input_file_type_conversion
+from utils.utilities import get_type_from_string, get_type_from_name, input_file_type_conversion, \
+    save_resampled_volume, load_resampled_volume, get_resampled_volume_extension, get_compact_volume_data, \
+    save_input_image, resample_to_output_space
 from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
 
 @unique
@@ -84,9 +85,11 @@ class AnnotationVolume:
     _display_color = [255, 255, 255, 255]  # Visible color for the annotation, with format: [r, g, b, a]
     _default_affine = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]]  # Affine matrix for dumping resampled files
     _unsaved_changes = False  # Documenting any change, for suggesting saving when swapping between patients
+    _index_update_callback = None  # Function notified when an attribute used for indexing the volume is modified
 
     def __init__(self, uid: str, input_filename: str, output_patient_folder: str, inv_ts_uid: str,
-                 parent_mri_uid: str, inv_ts_folder_name: str = None, reload_params: {} = None) -> None:
+                 parent_mri_uid: str, inv_ts_folder_name: str = None, reload_params: {} = None,
+                 input_image: nib.Nifti1Image = None) -> None:
         try:
             self.__reset()
             self._unique_id = uid
@@ -103,7 +106,7 @@ class AnnotationVolume:
             if reload_params:
                 self.__reload_from_disk(reload_params)
             else:
-                self.__init_from_scratch()
+                self.__init_from_scratch(input_image)
         except Exception as e:
             raise RuntimeError(e)
 
@@ -131,20 +134,19 @@ class AnnotationVolume:
         self._display_color = [255, 255, 255, 255]
         self._default_affine = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]]
         self._unsaved_changes = False
+        self._index_update_callback = None
 
     @property
     def unique_id(self) -> str:
         return self._unique_id
 
     def load_in_memory(self) -> None:
-        try:
-            if self._resampled_input_volume_filepath and os.path.exists(self._resampled_input_volume_filepath):
-                self._resampled_input_volume = nib.load(self._resampled_input_volume_filepath).get_fdata()[:]
-            else:
-                self.__generate_standardized_input_volume()
-            self.__generate_display_volume()
-        except Exception as e:
-            raise ValueError("[AnnotationStructure] Loading in memory failed with: {}".format(e))
+        """
+        The annotation arrays are only read from disk the first time the annotation is toggled for viewing (i.e., when
+        accessing the display volume). The previous display volume is discarded, as the display space might have
+        changed since the last loading of the patient in memory.
+        """
+        self._display_volume = None
 
     def release_from_memory(self) -> None:
         self._display_volume = None
@@ -177,6 +179,18 @@ class AnnotationVolume:
     def has_unsaved_changes(self) -> bool:
         return self._unsaved_changes
 
+    @property
+    def index_update_callback(self) -> Callable[[str], None]:
+        return self._index_update_callback
+
+    @index_update_callback.setter
+    def index_update_callback(self, callback: Callable[[str], None]) -> None:
+        """
+        Function called with the unique id of the volume whenever one of the attributes used by the patient for
+        indexing its volumes (parent MRI, timestamp, class, and generation type) is modified, None to stop notifying.
+        """
+        self._index_update_callback = callback
+
     def get_annotation_class_enum(self) -> Enum:
         return self._annotation_class
 
@@ -206,8 +220,10 @@ class AnnotationVolume:
             self._annotation_class = anno_type
 
         if manual:
-            logging.debug("Unsaved changes - Annotation volume class changed to {}.".format(str(self._annotation_class)))
             self._unsaved_changes = True
+            logging.debug("Unsaved changes - Annotation volume class changed to {}.".format(str(self._annotation_class)))
+        if self._index_update_callback is not None:
+            self._index_update_callback(self._unique_id)
 
     @property
     def raw_input_filepath(self) -> str:
@@ -228,9 +244,15 @@ class AnnotationVolume:
     @registered_volume_filepaths.setter
     def registered_volume_filepaths(self, new_filepaths: dict) -> None:
         self._registered_volume_filepaths = new_filepaths
+        self._unsaved_changes = True
 
     @property
     def registered_volumes(self) -> dict:
+        """
+        Numpy arrays for all registered volumes, read from disk on-demand for the ones not yet in memory.
+        """
+        for k in list(self._registered_volume_filepaths.keys()):
+            self.__get_registered_volume(k)
         return self._registered_volumes
 
     @registered_volumes.setter
@@ -267,6 +289,7 @@ class AnnotationVolume:
                 self.registered_volume_filepaths[fn] = self.registered_volume_filepaths[fn].replace(self._output_patient_folder, output_folder)
 
             self._output_patient_folder = output_folder
+            self._unsaved_changes = True
         except Exception as e:
             raise ValueError("Changing the output patient folder name for the AnnotationStructure failed with: {}".format(e))
 
@@ -330,6 +353,7 @@ class AnnotationVolume:
                                                         self.output_patient_folder).split('/')[1:])
                     self._resampled_input_volume_filepath = os.path.join(self.output_patient_folder,
                                                                          self._timestamp_folder_name, rel_path)
+            self._unsaved_changes = True
         except Exception as e:
             raise ValueError("Changing the timestamp folder name for the AnnotationStructure failed with: {}".format(e))
 
@@ -353,6 +377,15 @@ class AnnotationVolume:
 
     @property
     def display_volume(self) -> np.ndarray:
+        """
+        Display version of the annotation volume, generated on-demand the first time it is accessed after the
+        annotation has been loaded in memory.
+        """
+        if self._display_volume is None:
+            try:
+                self.__generate_display_volume()
+            except Exception as e:
+                raise ValueError("[AnnotationStructure] Loading in memory failed with: {}".format(e))
         return self._display_volume
 
     # @TODO. Has to be updated to match the @getter @setter pattern.
@@ -363,6 +396,8 @@ class AnnotationVolume:
         self._parent_mri_uid = parent_uid
         self._unsaved_changes = True
         logging.debug("Unsaved changes - Annotation volume parent MRI uid changed to {}.".format(parent_uid))
+        if self._index_update_callback is not None:
+            self._index_update_callback(self._unique_id)
 
     def get_generation_type_enum(self) -> Enum:
         return self._generation_type
@@ -390,33 +425,37 @@ class AnnotationVolume:
             self._generation_type = generation_type
 
         if manual:
+            self._unsaved_changes = True
             logging.debug("Unsaved changes - Annotation volume generation type changed to {}.".format(
                 str(self._generation_type)))
-            self._unsaved_changes = True
+        if self._index_update_callback is not None:
+            self._index_update_callback(self._unique_id)
 
     def set_usable_filepath_as_raw(self) -> None:
         """
         @TODO. Should make it so that we also save the dicom metadata in that case.
-        In case of DICOM MRI Series loading, the raw input filepath is a temporary conversion as nifti format of
-        the raw DICOM content, which is deleted upon creation completion, and as such the filepath should be adjusted.
-        The display volume needs also to be created as it is a first time use.
+        In case of DICOM MRI Series loading, the raw input filepath is only a nominal filename for the DICOM content
+        converted in memory, which never existed on disk, and as such the filepath should be adjusted.
+        The display volume will be created upon first use.
         """
         self._raw_input_filepath = self.usable_input_filepath
-        self.__generate_display_volume()
+        self._display_volume = None
+        self._unsaved_changes = True
 
     def save(self) -> dict:
         """
 
         """
         try:
+            self._unsaved_changes = False
+
             # Disk operations
-            if not self._resampled_input_volume is None:
-                self._resampled_input_volume_filepath = os.path.join(self.output_patient_folder,
-                                                                     self._timestamp_folder_name, 'display',
-                                                                     self._unique_id + '_resampled.nii.gz')
-                if not os.path.exists(self._resampled_input_volume_filepath):
-                    nib.save(nib.Nifti1Image(self._resampled_input_volume, affine=self._default_affine),
-                             self._resampled_input_volume_filepath)
+            resampled_filepath = os.path.join(self.output_patient_folder, self._timestamp_folder_name, 'display',
+                                              self._unique_id + '_resampled' + get_resampled_volume_extension())
+            if not os.path.exists(resampled_filepath):
+                save_resampled_volume(self.__get_resampled_input_volume(), resampled_filepath, self._default_affine)
+                self.__remove_previous_resampled_volume(resampled_filepath)
+            self._resampled_input_volume_filepath = resampled_filepath
 
             # Parameters-filling operations
             volume_params = {}
@@ -449,9 +488,9 @@ class AnnotationVolume:
             volume_params['display_name'] = self._display_name
             volume_params['display_color'] = self._display_color
             volume_params['display_opacity'] = self._display_opacity
-            self._unsaved_changes = False
             return volume_params
         except Exception as e:
+            self._unsaved_changes = True
             raise RuntimeError("AnnotationStructure saving failed with: {}".format(e))
 
     def import_registered_volume(self, filepath: str, registration_space: str) -> None:
@@ -465,27 +504,37 @@ class AnnotationVolume:
             dest_path = os.path.join(registered_space_folder, os.path.basename(filepath))
             shutil.copyfile(filepath, dest_path)
             self.registered_volume_filepaths[registration_space] = dest_path
-            self.registered_volumes[registration_space] = nib.load(dest_path).get_fdata()[:]
+            # The volume will be read from disk when first needed
+            self._registered_volumes.pop(registration_space, None)
             logging.debug("""Unsaved changes - Registered annotation volume to space {} added in {}.""".format(
                 registration_space, dest_path))
             self._unsaved_changes = True
         except Exception as e:
             raise RuntimeError("Error while importing a registered annotation volume with: {}".format(e))
 
-    def __init_from_scratch(self) -> None:
+    def __init_from_scratch(self, input_image: nib.Nifti1Image = None) -> None:
+        """
+        Parameters
+        ----------
+        input_image: nib.Nifti1Image
+            Content of the volume when only existing in memory (e.g., converted from a DICOM series), which is then
+            saved once inside the patient folder, and used as is for the standardization.
+        """
         try:
             os.makedirs(self.output_patient_folder, exist_ok=True)
             os.makedirs(os.path.join(self.output_patient_folder, self._timestamp_folder_name), exist_ok=True)
             os.makedirs(os.path.join(self.output_patient_folder, self._timestamp_folder_name, 'raw'), exist_ok=True)
             os.makedirs(os.path.join(self.output_patient_folder, self._timestamp_folder_name, 'display'), exist_ok=True)
 
-            self.usable_input_filepath = input_file_type_conversion(input_filename=self._raw_input_filepath,
-                                                                     output_folder=os.path.join(self.output_patient_folder,
-                                                                                                self._timestamp_folder_name,
-                                                                                                'raw'))
-            self.__generate_standardized_input_volume()
-            if self.output_patient_folder not in self.raw_input_filepath:
-                self.__generate_display_volume()
+            raw_folder = os.path.join(self.output_patient_folder, self._timestamp_folder_name, 'raw')
+            if input_image is not None:
+                self.usable_input_filepath = save_input_image(input_image=input_image,
+                                                              input_filename=self._raw_input_filepath,
+                                                              output_folder=raw_folder)
+            else:
+                self.usable_input_filepath = input_file_type_conversion(input_filename=self._raw_input_filepath,
+                                                                        output_folder=raw_folder)
+            self.__generate_standardized_input_volume(input_image)
         except Exception as e:
             raise RuntimeError("""Initializing annotation structure from scratch failed  for: {} 
             with: {}.""".format(self._raw_input_filepath, e))
@@ -515,19 +564,15 @@ class AnnotationVolume:
 
             # The resampled volume can only be inside the output patient folder as it is internally computed and cannot be
             # manually imported into the software.
+            # Only the filepaths are restored, the volumes being read from disk (or recomputed if the patient wasn't
+            # saved after loading) the first time they are needed.
             self._resampled_input_volume_filepath = os.path.join(self.output_patient_folder,
                                                                  parameters['resample_input_filepath'])
-            if os.path.exists(self._resampled_input_volume_filepath):
-                self._resampled_input_volume = nib.load(self._resampled_input_volume_filepath).get_fdata()[:]
-            else:
-                # Patient wasn't saved after loading, hence the volume was not stored on disk and must be recomputed
-                self.__generate_standardized_input_volume()
 
             if 'registered_volume_filepaths' in parameters.keys():
                 for k in list(parameters['registered_volume_filepaths'].keys()):
                     self.registered_volume_filepaths[k] = os.path.join(self.output_patient_folder,
                                                                        parameters['registered_volume_filepaths'][k])
-                    self.registered_volumes[k] = nib.load(self.registered_volume_filepaths[k]).get_fdata()[:]
 
             self.set_annotation_class_type(anno_type=parameters['annotation_class'], manual=False)
             self.set_generation_type(generation_type=parameters['generation_type'], manual=False)
@@ -543,41 +588,78 @@ class AnnotationVolume:
             raise RuntimeError("""Reloading annotation structure from disk failed for: {} 
             with: {}.""".format(self.display_name, e))
 
-    def __generate_standardized_input_volume(self) -> None:
+    def __generate_standardized_input_volume(self, image_nib: nib.Nifti1Image = None) -> None:
         """
         In order to make sure the annotation volume will be displayed correctly across the three views, a
         standardization is necessary to set the volume orientation to a common standard.
         """
         try:
-            if not self.usable_input_filepath or not os.path.exists(self.usable_input_filepath):
-                raise NameError("Usable input filepath does not exist on disk with value: {}".format(
-                    self.usable_input_filepath))
-
-            image_nib = nib.load(self.usable_input_filepath)
-            resampled_input_ni = resample_to_output(image_nib, order=0)
-            self._resampled_input_volume = resampled_input_ni.get_fdata()[:].astype('uint8')
+            if image_nib is None:
+                if not self.usable_input_filepath or not os.path.exists(self.usable_input_filepath):
+                    raise NameError("Usable input filepath does not exist on disk with value: {}".format(
+                        self.usable_input_filepath))
+                image_nib = nib.load(self.usable_input_filepath)
+            resampled_input_ni = resample_to_output_space(image_nib, order=0)
+            self._resampled_input_volume = get_compact_volume_data(resampled_input_ni, labels=True)
         except Exception as e:
             raise RuntimeError("Input volume standardization failed with: {}".format(e))
 
+    def __get_resampled_input_volume(self) -> np.ndarray:
+        """
+        Returns the resampled volume, after reading it from disk (or recomputing it if it was never saved) if it is
+        not in memory yet.
+        """
+        if self._resampled_input_volume is None:
+            if self._resampled_input_volume_filepath and os.path.exists(self._resampled_input_volume_filepath):
+                self._resampled_input_volume = load_resampled_volume(self._resampled_input_volume_filepath,
+                                                                     labels=True)
+            else:
+                self.__generate_standardized_input_volume()
+        return self._resampled_input_volume
+
+    def __remove_previous_resampled_volume(self, new_filepath: str) -> None:
+        """
+        Removes the resampled volume saved in a different format than the current one (i.e., after the user changed
+        the memory_mapped_volumes preference), as it is superseded by the newly saved file.
+        """
+        if self._resampled_input_volume_filepath and self._resampled_input_volume_filepath != new_filepath \
+                and os.path.exists(self._resampled_input_volume_filepath):
+            try:
+                os.remove(self._resampled_input_volume_filepath)
+            except OSError:
+                # A memory-mapped file cannot be removed on Windows while still in use
+                logging.warning("Previous resampled volume could not be removed from {}.".format(
+                    self._resampled_input_volume_filepath))
+
+    def __get_registered_volume(self, registration_space: str) -> np.ndarray:
+        """
+        Returns the annotation registered to the given space, after reading it from disk if it is not in memory yet.
+        """
+        if registration_space not in self._registered_volumes.keys():
+            self._registered_volumes[registration_space] = get_compact_volume_data(
+                nib.load(self._registered_volume_filepaths[registration_space]), labels=True)
+        return self._registered_volumes[registration_space]
+
     def __generate_display_volume(self) -> None:
         """
         Generate a display-compatible copy of the annotation volume, either in raw patient space or any atlas space.
         If the viewing should be performed in a desired reference space, but no annotation has been generated for it,
         the default annotation in patient space will be shown.
 
-        A display copy of the annotation volume is set up, allowing for on-the-fly modifications.
+        The display volume is a direct reference to the base volume, which is never modified in-place, such that a
+        memory-mapped resampled volume is only read from disk for the slices actually viewed.
 
         @TODO. Check if more than one label in the file?
         @TODO. Warning is triggered for a double registered annotation (FLAIR > T1 > MNI)...
         """
-        base_volume = self._resampled_input_volume
-
         if UserPreferencesStructure.getInstance().display_space != 'Patient' and\
-            UserPreferencesStructure.getInstance().display_space in self.registered_volumes.keys():
-            base_volume = self.registered_volumes[UserPreferencesStructure.getInstance().display_space]
-        self._display_volume = deepcopy(base_volume)
+            UserPreferencesStructure.getInstance().display_space in self.registered_volume_filepaths.keys():
+            base_volume = self.__get_registered_volume(UserPreferencesStructure.getInstance().display_space)
+        else:
+            base_volume = self.__get_resampled_input_volume()
+        self._display_volume = base_volume
 
         if UserPreferencesStructure.getInstance().display_space != 'Patient' and \
-                UserPreferencesStructure.getInstance().display_space not in self.registered_volumes.keys():
+                UserPreferencesStructure.getInstance().display_space not in self.registered_volume_filepaths.keys():
             logging.warning(""" [Software warning] The selected annotation ({}) does not have any expression in {} space. The default annotation in patient space is therefore used.""".format(self.get_annotation_class_str(),
                        UserPreferencesStructure.getInstance().display_space))
\ No newline at end of file
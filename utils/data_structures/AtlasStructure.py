@@ -1,16 +1,69 @@
 import os
 import logging
 import shutil
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Callable
 import pandas as pd
 import numpy as np
 import nibabel as nib
-from nibabel.processing import resample_to_output
+from scipy.ndimage import find_objects
 import traceback
 from copy import deepcopy
 from pathlib import PurePath
 
 from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
+from utils.utilities import save_resampled_volume, load_resampled_volume, get_resampled_volume_extension, \
+    get_compact_volume_data, resample_to_output_space
+
+
+class AtlasStructureMask:
+    """
+    Binary mask for a single structure of an atlas, derived on-demand from the atlas label volume. Only the requested
+    slices are computed, and slices not intersecting the structure bounding box are returned empty without reading
+    the label volume, such that no binary volume is ever materialised for the structure.
+    Supports the same indexing as a numpy array for extracting 2D slices, e.g. mask[:, :, z].
+    """
+    _label_volume = None  # Atlas label volume shared between all structures
+    _label = 0  # Label value for the structure inside the label volume
+    _bounding_box = None  # Tuple of slices, one per axis, enclosing the structure (None if the structure is empty)
+
+    def __init__(self, label_volume: np.ndarray, label: int, bounding_box: Tuple[slice]) -> None:
+        self._label_volume = label_volume
+        self._label = label
+        self._bounding_box = bounding_box
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return self._label_volume.shape
+
+    @property
+    def bounding_box(self) -> Tuple[slice]:
+        return self._bounding_box
+
+    def __getitem__(self, key) -> np.ndarray:
+        key = key if isinstance(key, tuple) else (key,)
+        # Zero-strided view with the volume shape, for retrieving the output shape without any allocation
+        result_shape = np.broadcast_to(np.zeros(1, dtype='uint8'), self.shape)[key].shape
+        fast_path = len(key) == len(self.shape) and all([isinstance(k, (int, np.integer)) or k == slice(None)
+                                                         for k in key])
+        if not fast_path:
+            return (self._label_volume[key] == self._label).astype('uint8')
+
+        result = np.zeros(result_shape, dtype='uint8')
+        if self._bounding_box is None:
+            return result
+        sub_key = []
+        result_index = []
+        for axis, k in enumerate(key):
+            if isinstance(k, slice):
+                sub_key.append(self._bounding_box[axis])
+                result_index.append(self._bounding_box[axis])
+            else:
+                k = int(k) % self.shape[axis]
+                if k < self._bounding_box[axis].start or k >= self._bounding_box[axis].stop:
+                    return result
+                sub_key.append(k)
+        result[tuple(result_index)] = self._label_volume[tuple(sub_key)] == self._label
+        return result
 
 class AtlasVolume:
     """
@@ -30,7 +83,7 @@ class AtlasVolume:
     _atlas_space_filepaths = {}  # List of atlas structures filepaths on disk expressed in an atlas space
     _atlas_space_volumes = {}  # List of numpy arrays with the atlases structures expressed in an atlas space
     _parent_mri_uid = ""  # Internal unique identifier for the MRI volume to which this annotation is linked
-    _one_hot_display_volume = None
+    _class_bounding_boxes = {}  # Tuple of slices enclosing each class in the display volume, by class index
     _visible_class_labels = []
     _class_number = 0
     _class_description = {}  # DataFrame containing a look-up-table between atlas labels and descriptive names
@@ -39,6 +92,7 @@ class AtlasVolume:
     _class_display_opacity = {}  # Integer value in [0, 100] for each class key
     _default_affine = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]]
     _unsaved_changes = False  # Documenting any change, for suggesting saving when swapping between patients
+    _index_update_callback = None  # Function notified when an attribute used for indexing the volume is modified
 
     def __init__(self, uid: str, input_filename: str, output_patient_folder: str, inv_ts_uid: str, parent_mri_uid: str,
                  description_filename: str, inv_ts_folder_name: str = None, reload_params: dict = None) -> None:
@@ -80,7 +134,7 @@ class AtlasVolume:
         self._atlas_space_filepaths = {}
         self._atlas_space_volumes = {}
         self._parent_mri_uid = ""
-        self._one_hot_display_volume = None
+        self._class_bounding_boxes = {}
         self._visible_class_labels = []
         self._class_number = 0
         self._class_description = {}
@@ -89,6 +143,7 @@ class AtlasVolume:
         self._class_display_opacity = {}
         self._default_affine = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]]
         self._unsaved_changes = False
+        self._index_update_callback = None
 
     def __init_from_scratch(self) -> None:
         """
@@ -140,19 +195,15 @@ class AtlasVolume:
             self._raw_input_filepath = os.path.join(self._output_patient_folder, parameters['raw_input_filepath'])
             self._class_description = pd.read_csv(self._class_description_filename)
 
+            # Only the filepaths are restored, the volumes being read from disk (or recomputed if the patient wasn't
+            # saved after loading) the first time they are needed.
             self._resampled_input_volume_filepath = os.path.join(self._output_patient_folder,
                                                                  parameters['resample_input_filepath'])
-            if os.path.exists(self._resampled_input_volume_filepath):
-                self._resampled_input_volume = nib.load(self._resampled_input_volume_filepath).get_fdata()[:]
-            else:
-                # Patient wasn't saved after loading, hence the volume was not stored on disk and must be recomputed
-                self.__generate_standardized_input_volume()
 
             if 'atlas_space_filepaths' in parameters.keys():
                 for k in list(parameters['atlas_space_filepaths'].keys()):
                     self.atlas_space_filepaths[k] = os.path.join(self._output_patient_folder,
                                                                        parameters['atlas_space_filepaths'][k])
-                    self.atlas_space_volumes[k] = nib.load(self.atlas_space_filepaths[k]).get_fdata()[:]
 
             if 'display_colors' in parameters.keys():
                 self._class_display_color = {int(k): v for k, v in parameters['display_colors'].items()}
@@ -163,13 +214,18 @@ class AtlasVolume:
             with: {}.""".format(self.display_name, e))
 
     def load_in_memory(self) -> None:
-        try:
-            self.__generate_display_volume()
-        except Exception as e:
-            raise ValueError("[AtlasStructure] Loading in memory failed with: {}".format(e))
+        """
+        The atlas arrays are only read from disk the first time the atlas is toggled for viewing, or when its
+        structures are queried. The previous display volume is discarded, as the display space might have changed
+        since the last loading of the patient in memory.
+        """
+        self._display_volume = None
+        self._class_bounding_boxes = {}
 
     def release_from_memory(self) -> None:
         self._display_volume = None
+        self._class_bounding_boxes = {}
+        self._resampled_input_volume = None
         self.atlas_space_volumes = {}
 
     @property
@@ -182,6 +238,18 @@ class AtlasVolume:
     def has_unsaved_changes(self) -> bool:
         return self._unsaved_changes
 
+    @property
+    def index_update_callback(self) -> Callable[[str], None]:
+        return self._index_update_callback
+
+    @index_update_callback.setter
+    def index_update_callback(self, callback: Callable[[str], None]) -> None:
+        """
+        Function called with the unique id of the volume whenever one of the attributes used by the patient for
+        indexing its volumes (parent MRI and timestamp) is modified, None to stop notifying.
+        """
+        self._index_update_callback = callback
+
     @property
     def display_name(self) -> str:
         return self._display_name
@@ -199,15 +267,27 @@ class AtlasVolume:
     @atlas_space_filepaths.setter
     def atlas_space_filepaths(self, new_filepaths: dict) -> None:
         self._atlas_space_filepaths = new_filepaths
+        self._unsaved_changes = True
 
     @property
     def atlas_space_volumes(self) -> dict:
+        """
+        Numpy arrays for the atlas expressed in all atlas spaces, read from disk on-demand for the ones not yet in
+        memory.
+        """
+        for k in list(self._atlas_space_filepaths.keys()):
+            self.__get_atlas_space_volume(k)
         return self._atlas_space_volumes
 
     @atlas_space_volumes.setter
     def atlas_space_volumes(self, new_volumes: dict) -> None:
         self._atlas_space_volumes = new_volumes
 
+    @property
+    def display_volume(self) -> np.ndarray:
+        self.__ensure_display_volume()
+        return self._display_volume
+
     def get_parent_mri_uid(self) -> str:
         return self._parent_mri_uid
 
@@ -215,21 +295,42 @@ class AtlasVolume:
         self._parent_mri_uid = parent_uid
         self._unsaved_changes = True
         logging.debug("Unsaved changes - Atlas volume parent mri uid changed to {}.".format(parent_uid))
+        if self._index_update_callback is not None:
+            self._index_update_callback(self._unique_id)
+
+    def get_structure_mask(self, index: int) -> AtlasStructureMask:
+        """
+        Binary mask for the structure with the given index, computing its slices on-demand from the display volume.
 
-    def get_one_hot_display_volume(self):
-        return self._one_hot_display_volume
+        Parameters
+        ----------
+        index: int
+            Index of the structure inside the visible class labels (i.e., in [1, class_number]).
+
+        Returns
+        -------
+        AtlasStructureMask
+            Array-like object to index like the display volume for retrieving binary slices of the structure.
+        """
+        self.__ensure_display_volume()
+        return AtlasStructureMask(label_volume=self._display_volume, label=self._visible_class_labels[index],
+                                  bounding_box=self._class_bounding_boxes[index])
 
     def get_structure_index_by_name(self, name: str) -> int:
+        self.__ensure_display_volume()
         label = int(self._class_description.loc[self._class_description['text'] == name]['label'].values[0])
         return self._visible_class_labels.index(label)
 
     def get_all_class_display_color(self):
+        self.__ensure_display_volume()
         return self._class_display_color
 
     def get_class_display_color_by_index(self, index: int):
+        self.__ensure_display_volume()
         return self._class_display_color[index]
 
     def get_class_display_color_by_label(self, label: int):
+        self.__ensure_display_volume()
         index = self._visible_class_labels.index(label)
         return self._class_display_color[index]
 
@@ -238,25 +339,31 @@ class AtlasVolume:
         return self._class_display_color[index]
 
     def set_class_display_color_by_index(self, index: int, color: Tuple[int]) -> None:
+        self.__ensure_display_volume()
         self._class_display_color[index] = color
         self._unsaved_changes = True
 
     def get_all_class_opacity(self):
+        self.__ensure_display_volume()
         return self._class_display_opacity
 
     def get_class_opacity_by_index(self, index: int):
+        self.__ensure_display_volume()
         return self._class_display_opacity[index]
 
     def get_class_opacity_by_label(self, label: int):
+        self.__ensure_display_volume()
         index = self._visible_class_labels.index(label)
         return self._class_display_opacity[index]
 
     def get_class_opacity_by_name(self, name: str):
+        self.__ensure_display_volume()
         label = int(self._class_description.loc[self._class_description['text'] == name]['label'].index.values[0])
         index = self._visible_class_labels.index(label)
         return self._class_display_opacity[index]
 
     def set_class_opacity_by_index(self, index: int, opacity: int) -> None:
+        self.__ensure_display_volume()
         self._class_display_opacity[index] = opacity
         self._unsaved_changes = True
 
@@ -278,6 +385,7 @@ class AtlasVolume:
             for i, fn in enumerate(self.atlas_space_filepaths.keys()):
                 self.atlas_space_filepaths[fn] = self.atlas_space_filepaths[fn].replace(self._output_patient_folder, output_folder)
             self._output_patient_folder = output_folder
+            self._unsaved_changes = True
         except Exception as e:
             raise ValueError("Changing the output patient folder name for the AtlasStructure failed with: {}".format(e))
 
@@ -327,6 +435,7 @@ class AtlasVolume:
                     self._resampled_input_volume_filepath = os.path.join(self._output_patient_folder,
                                                                          self._timestamp_folder_name,
                                                                          rel_path)
+            self._unsaved_changes = True
         except Exception as e:
             raise ValueError("Changing the timestamp folder name for the AtlasStructure failed with: {}".format(e))
 
@@ -335,6 +444,7 @@ class AtlasVolume:
 
     @property
     def visible_class_labels(self) -> List:
+        self.__ensure_display_volume()
         return self._visible_class_labels
 
     def delete(self):
@@ -369,8 +479,8 @@ class AtlasVolume:
         """
         try:
             self.atlas_space_filepaths[registration_space] = filepath
-            image_nib = nib.load(filepath)
-            self.atlas_space_volumes[registration_space] = image_nib.get_fdata()[:]
+            # The volume will be read from disk when first needed
+            self._atlas_space_volumes.pop(registration_space, None)
             logging.debug("""Unsaved changes - Structures atlas in space {} added in {}.""".format(
                 registration_space, filepath))
             self._unsaved_changes = True
@@ -382,12 +492,15 @@ class AtlasVolume:
 
         """
         try:
+            self._unsaved_changes = False
+
             # Disk operations
-            self._resampled_input_volume_filepath = os.path.join(self._output_patient_folder,
-                                                                 self._timestamp_folder_name, 'display',
-                                                                 self._unique_id + '_resampled.nii.gz')
-            nib.save(nib.Nifti1Image(self._resampled_input_volume, affine=self._default_affine),
-                     self._resampled_input_volume_filepath)
+            resampled_filepath = os.path.join(self._output_patient_folder, self._timestamp_folder_name, 'display',
+                                              self._unique_id + '_resampled' + get_resampled_volume_extension())
+            if not os.path.exists(resampled_filepath):
+                save_resampled_volume(self.__get_resampled_input_volume(), resampled_filepath, self._default_affine)
+                self.__remove_previous_resampled_volume(resampled_filepath)
+            self._resampled_input_volume_filepath = resampled_filepath
 
             # Parameters-filling operations
             volume_params = {}
@@ -410,9 +523,9 @@ class AtlasVolume:
             volume_params['investigation_timestamp_uid'] = self._timestamp_uid
             volume_params['display_colors'] = self._class_display_color
             volume_params['display_opacities'] = self._class_display_opacity
-            self._unsaved_changes = False
             return volume_params
         except Exception as e:
+            self._unsaved_changes = True
             raise RuntimeError("AtlasStructure saving failed with: {}".format(e))
 
     def __generate_standardized_input_volume(self) -> None:
@@ -426,37 +539,88 @@ class AtlasVolume:
                     self._raw_input_filepath))
 
             image_nib = nib.load(self._raw_input_filepath)
-            resampled_input_ni = resample_to_output(image_nib, order=0)
-            self._resampled_input_volume = resampled_input_ni.get_fdata()[:].astype('uint8')
+            resampled_input_ni = resample_to_output_space(image_nib, order=0)
+            self._resampled_input_volume = get_compact_volume_data(resampled_input_ni, labels=True)
         except Exception as e:
             raise RuntimeError("Input volume standardization failed with: {}".format(e))
 
+    def __get_resampled_input_volume(self) -> np.ndarray:
+        """
+        Returns the resampled volume, after reading it from disk (or recomputing it if it was never saved) if it is
+        not in memory yet.
+        """
+        if self._resampled_input_volume is None:
+            if self._resampled_input_volume_filepath and os.path.exists(self._resampled_input_volume_filepath):
+                self._resampled_input_volume = load_resampled_volume(self._resampled_input_volume_filepath,
+                                                                     labels=True)
+            else:
+                self.__generate_standardized_input_volume()
+        return self._resampled_input_volume
+
+    def __remove_previous_resampled_volume(self, new_filepath: str) -> None:
+        """
+        Removes the resampled volume saved in a different format than the current one (i.e., after the user changed
+        the memory_mapped_volumes preference), as it is superseded by the newly saved file.
+        """
+        if self._resampled_input_volume_filepath and self._resampled_input_volume_filepath != new_filepath \
+                and os.path.exists(self._resampled_input_volume_filepath):
+            try:
+                os.remove(self._resampled_input_volume_filepath)
+            except OSError:
+                # A memory-mapped file cannot be removed on Windows while still in use
+                logging.warning("Previous resampled volume could not be removed from {}.".format(
+                    self._resampled_input_volume_filepath))
+
+    def __get_atlas_space_volume(self, registration_space: str) -> np.ndarray:
+        """
+        Returns the atlas expressed in the given atlas space, after reading it from disk if it is not in memory yet.
+        """
+        if registration_space not in self._atlas_space_volumes.keys():
+            self._atlas_space_volumes[registration_space] = get_compact_volume_data(
+                nib.load(self._atlas_space_filepaths[registration_space]), labels=True)
+        return self._atlas_space_volumes[registration_space]
+
+    def __ensure_display_volume(self) -> None:
+        """
+        Generates the display volume, and with it the structures information, if it has not been generated since the
+        atlas was loaded in memory.
+        """
+        if self._display_volume is None:
+            try:
+                self.__generate_display_volume()
+            except Exception as e:
+                raise ValueError("[AtlasStructure] Loading in memory failed with: {}".format(e))
+
     def __generate_display_volume(self) -> None:
         """
         Generate a display-compatible volume from the raw atlas volume the first time it is loaded in the software.
         """
-        base_volume = self._resampled_input_volume
         if UserPreferencesStructure.getInstance().display_space != 'Patient' and\
-            UserPreferencesStructure.getInstance().display_space in self.atlas_space_volumes.keys():
-            base_volume = self.atlas_space_volumes[UserPreferencesStructure.getInstance().display_space]
+            UserPreferencesStructure.getInstance().display_space in self.atlas_space_filepaths.keys():
+            base_volume = self.__get_atlas_space_volume(UserPreferencesStructure.getInstance().display_space)
+        else:
+            base_volume = self.__get_resampled_input_volume()
 
-        self._display_volume = deepcopy(base_volume)
+        # The display volume is never modified in-place, hence the base volume can be referenced without any copy.
+        self._display_volume = base_volume
 
         if UserPreferencesStructure.getInstance().display_space != 'Patient' and \
-                UserPreferencesStructure.getInstance().display_space not in self.atlas_space_volumes.keys():
+                UserPreferencesStructure.getInstance().display_space not in self.atlas_space_filepaths.keys():
             logging.warning(""" [Software warning] The selected structure atlas ({}) does not have any expression in {} space. The default structure atlas in patient space is therefore used.""".format(self.display_name,
                        UserPreferencesStructure.getInstance().display_space))
 
         try:
-            self._visible_class_labels = list(np.unique(self._display_volume))
+            # A single pass over the label volume gives the bounding box of every label present, the per-structure
+            # binary masks being derived from the label volume only when displayed (c.f. AtlasStructureMask).
+            boxes = find_objects(np.asarray(self._display_volume))
+            self._visible_class_labels = [0] + [l + 1 for l, b in enumerate(boxes) if b is not None]
             self._class_number = len(self._visible_class_labels) - 1
-            self._one_hot_display_volume = np.zeros(shape=(self._display_volume.shape + (self._class_number + 1,)),
-                                                    dtype='uint8')
+            self._class_bounding_boxes = {}
             self._class_display_color = {}
             self._class_display_opacity = {}
             for c in range(1, self._class_number + 1):
                 self._class_display_color[c] = [255, 255, 255, 255]
                 self._class_display_opacity[c] = 50
-                self._one_hot_display_volume[..., c][self._display_volume == self._visible_class_labels[c]] = 1
+                self._class_bounding_boxes[c] = boxes[self._visible_class_labels[c] - 1]
         except Exception as e:
-            raise IndexError("Generating a one-hot version of the display volume failed with: {}".format(e))
\ No newline at end of file
+            raise IndexError("Generating the structures bounding boxes of the display volume failed with: {}".format(e))
\ No newline at end of file
@@ -99,6 +99,7 @@ class InvestigationTimestamp:
     @folder_name.setter
     def folder_name(self, value: str):
         self._folder_name = value
+        self._unsaved_changes = True
 
     @property
     def display_name(self) -> str:
@@ -130,6 +131,7 @@ class InvestigationTimestamp:
 
     def set_datetime(self, inv_time: str) -> None:
         self._datetime = datetime.datetime.strptime(inv_time, "%d/%m/%Y, %H:%M:%S")
+        self._unsaved_changes = True
 
     def get_datetime(self) -> datetime:
         return self._datetime
@@ -141,6 +143,7 @@ class InvestigationTimestamp:
     @order.setter
     def order(self, value: int) -> None:
         self._order = value
+        self._unsaved_changes = True
 
     @property
     def output_patient_folder(self) -> str:
@@ -155,14 +158,15 @@ class InvestigationTimestamp:
 
         """
         try:
+            self._unsaved_changes = False
             timestamp_params = {}
             timestamp_params['display_name'] = self._display_name
             timestamp_params['folder_name'] = self.folder_name
             timestamp_params['order'] = self._order
             timestamp_params['datetime'] = self._datetime.strftime("%d/%m/%Y, %H:%M:%S") if self._datetime else None
-            self._unsaved_changes = False
             return timestamp_params
         except Exception as e:
+            self._unsaved_changes = True
             raise RuntimeError("InvestigationTimestampStructure saving failed with: {}".format(e))
 
     def delete(self) -> None:
@@ -5,17 +5,17 @@ import dateutil.tz
 from aenum import Enum, unique
 import logging
 import os
-from copy import deepcopy
-from typing import Union, Any
+from typing import Union, Any, Callable, List, Tuple
 import nibabel as nib
-from nibabel.processing import resample_to_output
 import numpy as np
 import json
 from pathlib import PurePath
 import re
 
 from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
-from utils.utilities import get_type_from_string, input_file_type_conversion
+from utils.utilities import get_type_from_string, input_file_type_conversion, save_resampled_volume, \
+    load_resampled_volume, get_resampled_volume_extension, get_compact_volume_data, save_input_image, \
+    apply_contrast_window, get_contrast_window_work_buffer, resample_to_output_space
 
 
 @unique
@@ -53,15 +53,18 @@ class MRIVolume:
     _intensity_histogram = None  #
     _display_name = ""  # Name shown to the user to identify the current volume, and which can be modified.
     _display_volume = None
+    _contrast_work_buffer = None  # Preallocated buffer reused for every contrast change of a floating-point volume
     _registered_volume_filepaths = {}  # List of filepaths on disk with the registered volumes
     _registered_volumes = {}  # List of numpy arrays with the registered volumes
     _default_affine = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0],
                        [0, 0, 0, 0]]  # Affine matrix for dumping resampled files
     _unsaved_changes = False  # Documenting any change, for suggesting saving when swapping between patients
     _contrast_changed = False
+    _contrast_preview_pending = False  # Contrast window modified in preview mode, not yet applied to the display volume
+    _index_update_callback = None  # Function notified when an attribute used for indexing the volume is modified
 
     def __init__(self, uid: str, inv_ts_uid: str, input_filename: str, output_patient_folder: str,
-                 ts_folder_name: str = "", reload_params: dict = None) -> None:
+                 ts_folder_name: str = "", reload_params: dict = None, input_image: nib.Nifti1Image = None) -> None:
         try:
             self.__reset()
             self._unique_id = uid
@@ -74,7 +77,7 @@ class MRIVolume:
             if reload_params:
                 self.__reload_from_disk(reload_params)
             else:
-                self.__init_from_scratch()
+                self.__init_from_scratch(input_image)
         except Exception as e:
             raise RuntimeError(e)
 
@@ -97,31 +100,30 @@ class MRIVolume:
         self._intensity_histogram = None
         self._display_name = ""
         self._display_volume = None
+        self._contrast_work_buffer = None
         self._registered_volume_filepaths = {}
         self._registered_volumes = {}
         self._default_affine = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]]
         self._unsaved_changes = False
         self._contrast_changed = False
+        self._contrast_preview_pending = False
+        self._index_update_callback = None
 
     def load_in_memory(self) -> None:
         """
-        When a new patient is selected for display, its corresponding radiological volumes are loaded into memory
-        for a smoother visual interaction.
+        When a new patient is selected for display, its corresponding radiological volumes are made available for
+        display. The arrays are not read from disk at this point, but only the first time the volume is actually
+        toggled for viewing (i.e., when accessing the display volume), or when its intensities are queried.
         The display volume must be recomputed everytime as the display space might have changed since the last
-        loading of the patient in memory!
+        loading of the patient in memory, hence the previous display volume is discarded.
         """
-        try:
-            if self.resampled_input_volume_filepath and os.path.exists(self.resampled_input_volume_filepath):
-                self._resampled_input_volume = nib.load(self.resampled_input_volume_filepath).get_fdata()[:]
-            else:
-                self.__generate_standardized_input_volume()
-            self.__generate_display_volume()
-        except Exception as e:
-            raise ValueError("[MRIVolumeStructure] Loading in memory failed with: {}".format(e))
+        self._display_volume = None
+        self._contrast_work_buffer = None
 
     def release_from_memory(self) -> None:
         self._resampled_input_volume = None
         self._display_volume = None
+        self._contrast_work_buffer = None
         self.registered_volumes = {}
 
     @property
@@ -161,6 +163,7 @@ class MRIVolume:
                 self._dicom_metadata_filepath = self._dicom_metadata_filepath.replace(self._timestamp_folder_name,
                                                                                       folder_name)
             self._timestamp_folder_name = folder_name
+            self._unsaved_changes = True
         except Exception as e:
             raise ValueError("Changing the timestamp folder name for the MRIVolumeStructure failed with: {}".format(e))
 
@@ -217,6 +220,18 @@ class MRIVolume:
     def has_unsaved_changes(self) -> bool:
         return self._unsaved_changes
 
+    @property
+    def index_update_callback(self) -> Callable[[str], None]:
+        return self._index_update_callback
+
+    @index_update_callback.setter
+    def index_update_callback(self, callback: Callable[[str], None]) -> None:
+        """
+        Function called with the unique id of the volume whenever one of the attributes used by the patient for
+        indexing its volumes (timestamp and display name) is modified, None to stop notifying.
+        """
+        self._index_update_callback = callback
+
     @property
     def display_name(self) -> str:
         return self._display_name
@@ -226,6 +241,8 @@ class MRIVolume:
         self._display_name = text
         self._unsaved_changes = True
         logging.debug("Unsaved changes - MRI volume display name changed to {}".format(self._display_name))
+        if self._index_update_callback is not None:
+            self._index_update_callback(self._unique_id)
 
     @property
     def raw_input_filepath(self) -> str:
@@ -233,10 +250,11 @@ class MRIVolume:
 
     def set_usable_filepath_as_raw(self) -> None:
         """
-        In case of DICOM MRI Series loading, the raw input filepath is a temporary conversion as nifti format of
-        the raw DICOM content, which is deleted upon creation completion, and as such the filepath should be adjusted.
+        In case of DICOM MRI Series loading, the raw input filepath is only a nominal filename for the DICOM content
+        converted in memory, which never existed on disk, and as such the filepath should be adjusted.
         """
         self._raw_input_filepath = self._usable_input_filepath
+        self._unsaved_changes = True
 
     @property
     def output_patient_folder(self) -> str:
@@ -267,6 +285,7 @@ class MRIVolume:
                 self.registered_volume_filepaths[fn] = self.registered_volume_filepaths[fn].replace(self._output_patient_folder, output_folder)
 
             self._output_patient_folder = output_folder
+            self._unsaved_changes = True
         except Exception as e:
             raise ValueError("Changing the output patient folder name for the MRIVolumeStructure failed with: {}".format(e))
 
@@ -300,6 +319,13 @@ class MRIVolume:
 
     @property
     def display_volume(self) -> np.ndarray:
+        """
+        Display version of the radiological volume, generated on-demand the first time it is accessed after the
+        volume has been loaded in memory. A contrast window modified in preview mode is applied at this point.
+        """
+        self.__ensure_display_volume()
+        if self._contrast_preview_pending:
+            self.__apply_contrast_scaling_to_display_volume()
         return self._display_volume
 
     @display_volume.setter
@@ -323,44 +349,78 @@ class MRIVolume:
         self._resampled_input_volume_filepath = filepath
 
     def get_resampled_minimum_intensity(self) -> int:
-        return np.min(self._resampled_input_volume)
+        return int(np.min(self.__get_resampled_input_volume()))
 
     def get_resampled_maximum_intensity(self) -> int:
-        return np.max(self._resampled_input_volume)
+        return int(np.max(self.__get_resampled_input_volume()))
 
     def get_contrast_window_minimum(self) -> int:
+        self.__ensure_display_volume()
         return self._contrast_window[0]
 
     def get_contrast_window_maximum(self) -> int:
+        self.__ensure_display_volume()
         return self._contrast_window[1]
 
-    def set_contrast_window_minimum(self, value: int) -> None:
+    def set_contrast_window_minimum(self, value: int, preview: bool = False) -> None:
         """
         Sets the lower boundary for the contrast window and then triggers a recompute of the displayed volume
         according to the new contrast range.
+        In preview mode, the recompute is postponed until the display volume is next accessed, and only the
+        displayed slices should be queried meanwhile, see get_contrast_preview_slices.
         """
+        self.__ensure_display_volume()
         self._contrast_window[0] = value
-        self.__apply_contrast_scaling_to_display_volume()
+        self.__on_contrast_window_changed(preview)
 
-    def set_contrast_window_maximum(self, value: int) -> None:
+    def set_contrast_window_maximum(self, value: int, preview: bool = False) -> None:
         """
         Sets the upper boundary for the contrast window and then triggers a recompute of the displayed volume
         according to the new contrast range.
+        In preview mode, the recompute is postponed until the display volume is next accessed, and only the
+        displayed slices should be queried meanwhile, see get_contrast_preview_slices.
         """
+        self.__ensure_display_volume()
         self._contrast_window[1] = value
-        self.__apply_contrast_scaling_to_display_volume()
+        self.__on_contrast_window_changed(preview)
+
+    def has_contrast_preview(self) -> bool:
+        return self._contrast_preview_pending
+
+    def get_contrast_preview_slices(self, position: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Generates the axial, coronal, and sagittal slices going through the given voxel with the current contrast
+        window, without recomputing the whole display volume.
+
+        Parameters
+        ----------
+        position: List[int]
+            Voxel coordinates, in the display volume space, of the point where the three slices intersect.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            The axial, coronal, and sagittal uint8 slices.
+        """
+        self.__ensure_display_volume()
+        base_volume = self.__get_display_base_volume()
+        slices = (base_volume[:, :, position[2]], base_volume[:, position[1], :], base_volume[position[0], :, :])
+        return tuple([apply_contrast_window(s, self._contrast_window[0], self._contrast_window[1]) for s in slices])
 
     def confirm_contrast_modifications(self) -> None:
         """
         Since contrast adjustment modifications can be cancelled for various reasons (e.g. not satisfied with the
         selection), the changes should not be saved until the QDialog has been successfully exited.
+        The contrast window modified in preview mode is applied to the whole display volume.
         """
-        pass
+        if self._contrast_preview_pending:
+            self.__apply_contrast_scaling_to_display_volume()
         # No longer saving this info as the contrast will change if viewing the volume in patient or atlas space.
         # self._unsaved_changes = True
         # logging.debug("Unsaved changes - MRI volume contrast range edited.")
 
     def get_intensity_histogram(self):
+        self.__ensure_display_volume()
         return self._intensity_histogram
 
     @property
@@ -370,6 +430,7 @@ class MRIVolume:
     @dicom_metadata.setter
     def dicom_metadata(self, metadata: dict) -> None:
         self._dicom_metadata = metadata
+        self._unsaved_changes = True
 
     @property
     def registered_volume_filepaths(self) -> dict:
@@ -378,9 +439,15 @@ class MRIVolume:
     @registered_volume_filepaths.setter
     def registered_volume_filepaths(self, new_filepaths: dict) -> None:
         self._registered_volume_filepaths = new_filepaths
+        self._unsaved_changes = True
 
     @property
     def registered_volumes(self) -> dict:
+        """
+        Numpy arrays for all registered volumes, read from disk on-demand for the ones not yet in memory.
+        """
+        for k in list(self._registered_volume_filepaths.keys()):
+            self.__get_registered_volume(k)
         return self._registered_volumes
 
     @registered_volumes.setter
@@ -411,14 +478,17 @@ class MRIVolume:
         Only storing when a change of contrast happened, or if they don't exist already on disk.
         """
         try:
+            # Cleared beforehand, such that modifications performed while saving in the background are kept for the next save
+            self._unsaved_changes = False
+            self._contrast_changed = False
+
             # Disk operations
-            if not self._resampled_input_volume is None:
-                self.resampled_input_volume_filepath = os.path.join(self.output_patient_folder,
-                                                                     self.timestamp_folder_name, 'display',
-                                                                     self.unique_id + '_resampled.nii.gz')
-                if not os.path.exists(self.resampled_input_volume_filepath):
-                    nib.save(nib.Nifti1Image(self._resampled_input_volume, affine=self._default_affine),
-                             self.resampled_input_volume_filepath)
+            resampled_filepath = os.path.join(self.output_patient_folder, self.timestamp_folder_name, 'display',
+                                              self.unique_id + '_resampled' + get_resampled_volume_extension())
+            if not os.path.exists(resampled_filepath):
+                save_resampled_volume(self.__get_resampled_input_volume(), resampled_filepath, self._default_affine)
+                self.__remove_previous_resampled_volume(resampled_filepath)
+            self.resampled_input_volume_filepath = resampled_filepath
 
             if self._dicom_metadata:
                 self._dicom_metadata_filepath = os.path.join(self.output_patient_folder, self.timestamp_folder_name,
@@ -451,10 +521,9 @@ class MRIVolume:
                     reg_volumes[k] = os.path.relpath(self.registered_volume_filepaths[k], self.output_patient_folder)
                 volume_params['registered_volume_filepaths'] = reg_volumes
 
-            self._unsaved_changes = False
-            self._contrast_changed = False
             return volume_params
         except Exception as e:
+            self._unsaved_changes = True
             raise RuntimeError("MRIVolumeStructure saving failed with: {}".format(e))
 
     def import_registered_volume(self, filepath: str, registration_space: str) -> None:
@@ -468,28 +537,38 @@ class MRIVolume:
             dest_path = os.path.join(registered_space_folder, os.path.basename(filepath))
             shutil.copyfile(filepath, dest_path)
             self.registered_volume_filepaths[registration_space] = dest_path
-            image_nib = nib.load(dest_path)
-            self.registered_volumes[registration_space] = image_nib.get_fdata()[:]
+            # The volume will be read from disk when first needed
+            self._registered_volumes.pop(registration_space, None)
             logging.debug("""Unsaved changes - Registered radiological volume to space {} added in {}.""".format(
                 registration_space, dest_path))
             self._unsaved_changes = True
         except Exception:
             raise RuntimeError("Error while importing a registered radiological volume.\n {}".format(traceback.format_exc()))
 
-    def __init_from_scratch(self) -> None:
+    def __init_from_scratch(self, input_image: nib.Nifti1Image = None) -> None:
+        """
+        Parameters
+        ----------
+        input_image: nib.Nifti1Image
+            Content of the volume when only existing in memory (e.g., converted from a DICOM series), which is then
+            saved once inside the patient folder, and used as is for the standardization.
+        """
         try:
             self.timestamp_folder_name = re.sub(' +', '_', self._timestamp_uid.strip()) if self.timestamp_folder_name == "" else self.timestamp_folder_name
             os.makedirs(os.path.join(self.output_patient_folder, self.timestamp_folder_name), exist_ok=True)
             os.makedirs(os.path.join(self.output_patient_folder, self.timestamp_folder_name, 'raw'), exist_ok=True)
             os.makedirs(os.path.join(self.output_patient_folder, self.timestamp_folder_name, 'display'), exist_ok=True)
 
-            self._usable_input_filepath = input_file_type_conversion(input_filename=self._raw_input_filepath,
-                                                                     output_folder=os.path.join(self.output_patient_folder,
-                                                                                                self.timestamp_folder_name,
-                                                                                                'raw'))
-            self.__generate_standardized_input_volume()
+            raw_folder = os.path.join(self.output_patient_folder, self.timestamp_folder_name, 'raw')
+            if input_image is not None:
+                self._usable_input_filepath = save_input_image(input_image=input_image,
+                                                               input_filename=self._raw_input_filepath,
+                                                               output_folder=raw_folder)
+            else:
+                self._usable_input_filepath = input_file_type_conversion(input_filename=self._raw_input_filepath,
+                                                                         output_folder=raw_folder)
+            self.__generate_standardized_input_volume(input_image)
             self.__parse_sequence_type()
-            self.__generate_display_volume()
         except Exception as e:
             raise RuntimeError("""Initializing radiological structure from scratch failed for: {} with: {}.""".format(self._raw_input_filepath, e))
 
@@ -518,19 +597,15 @@ class MRIVolume:
 
             # The resampled volume can only be inside the output patient folder as it is internally computed and cannot
             # be manually imported into the software.
+            # Only the filepaths are restored, the volumes being read from disk (or recomputed if the patient wasn't
+            # saved after loading) the first time they are needed.
             self.resampled_input_volume_filepath = os.path.join(self.output_patient_folder,
                                                                  parameters['resample_input_filepath'])
-            if os.path.exists(self.resampled_input_volume_filepath):
-                self._resampled_input_volume = nib.load(self.resampled_input_volume_filepath).get_fdata()[:]
-            else:
-                # Patient wasn't saved after loading, hence the volume was not stored on disk and must be recomputed
-                self.__generate_standardized_input_volume()
 
             if 'registered_volume_filepaths' in parameters.keys():
                 for k in list(parameters['registered_volume_filepaths'].keys()):
                     self.registered_volume_filepaths[k] = os.path.join(self.output_patient_folder,
                                                                        parameters['registered_volume_filepaths'][k])
-                    self.registered_volumes[k] = nib.load(self.registered_volume_filepaths[k]).get_fdata()[:]
         except Exception as e:
             raise RuntimeError("""Reloading radiological structure from disk failed for {} with {}.""".format(self.display_name, e))
 
@@ -553,22 +628,68 @@ class MRIVolume:
         """
         self._intensity_histogram = np.histogram(input_array[input_array != 0], bins=30)
 
-    def __generate_standardized_input_volume(self) -> None:
+    def __generate_standardized_input_volume(self, image_nib: nib.Nifti1Image = None) -> None:
         """
         In order to make sure the radiological volume will be displayed correctly across the three views, a
         standardization is necessary to set the volume orientation to a common standard.
         """
         try:
-            if not self._usable_input_filepath or not os.path.exists(self._usable_input_filepath):
-                raise NameError("Usable input filepath does not exist on disk with value: {}".format(
-                    self._usable_input_filepath))
-
-            image_nib = nib.load(self._usable_input_filepath)
-            resampled_input_ni = resample_to_output(image_nib, order=1)
-            self._resampled_input_volume = resampled_input_ni.get_fdata()[:]
+            if image_nib is None:
+                if not self._usable_input_filepath or not os.path.exists(self._usable_input_filepath):
+                    raise NameError("Usable input filepath does not exist on disk with value: {}".format(
+                        self._usable_input_filepath))
+                image_nib = nib.load(self._usable_input_filepath)
+            resampled_input_ni = resample_to_output_space(image_nib, order=1)
+            self._resampled_input_volume = get_compact_volume_data(resampled_input_ni)
         except Exception as e:
             raise RuntimeError("Input volume standardization failed with: {}".format(e))
 
+    def __get_resampled_input_volume(self) -> np.ndarray:
+        """
+        Returns the resampled volume, after reading it from disk (or recomputing it if it was never saved) if it is
+        not in memory yet.
+        """
+        if self._resampled_input_volume is None:
+            if self.resampled_input_volume_filepath and os.path.exists(self.resampled_input_volume_filepath):
+                self._resampled_input_volume = load_resampled_volume(self.resampled_input_volume_filepath,
+                                                                     labels=False)
+            else:
+                self.__generate_standardized_input_volume()
+        return self._resampled_input_volume
+
+    def __remove_previous_resampled_volume(self, new_filepath: str) -> None:
+        """
+        Removes the resampled volume saved in a different format than the current one (i.e., after the user changed
+        the memory_mapped_volumes preference), as it is superseded by the newly saved file.
+        """
+        if self.resampled_input_volume_filepath and self.resampled_input_volume_filepath != new_filepath \
+                and os.path.exists(self.resampled_input_volume_filepath):
+            try:
+                os.remove(self.resampled_input_volume_filepath)
+            except OSError:
+                # A memory-mapped file cannot be removed on Windows while still in use
+                logging.warning("Previous resampled volume could not be removed from {}.".format(
+                    self.resampled_input_volume_filepath))
+
+    def __get_registered_volume(self, registration_space: str) -> np.ndarray:
+        """
+        Returns the volume registered to the given space, after reading it from disk if it is not in memory yet.
+        """
+        if registration_space not in self._registered_volumes.keys():
+            self._registered_volumes[registration_space] = get_compact_volume_data(
+                nib.load(self._registered_volume_filepaths[registration_space]))
+        return self._registered_volumes[registration_space]
+
+    def __ensure_display_volume(self) -> None:
+        """
+        Generates the display volume if it has not been generated since the volume was loaded in memory.
+        """
+        if self._display_volume is None:
+            try:
+                self.__generate_display_volume()
+            except Exception as e:
+                raise ValueError("[MRIVolumeStructure] Loading in memory failed with: {}".format(e))
+
     def __generate_display_volume(self) -> None:
         """
         Generate a display-compatible copy of the radiological volume, either in raw patient space or any atlas space.
@@ -578,11 +699,7 @@ class MRIVolume:
         A display copy of the radiological volume is set up, allowing for on-the-fly contrast modifications.
         """
         try:
-            base_volume = self._resampled_input_volume
-            if UserPreferencesStructure.getInstance().display_space != 'Patient' and\
-                UserPreferencesStructure.getInstance().display_space in self.registered_volumes.keys():
-                base_volume = self.registered_volumes[UserPreferencesStructure.getInstance().display_space]
-
+            base_volume = self.__get_display_base_volume()
             self.__generate_intensity_histogram(input_array=base_volume)
             self._contrast_window[0] = int(np.min(base_volume))
             self._contrast_window[1] = int(np.max(base_volume))
@@ -591,13 +708,31 @@ class MRIVolume:
             raise RuntimeError("Display volume generation failed with: {}".format(e))
 
         if UserPreferencesStructure.getInstance().display_space != 'Patient' and \
-        UserPreferencesStructure.getInstance().display_space not in self.registered_volumes.keys():
+        UserPreferencesStructure.getInstance().display_space not in self.registered_volume_filepaths.keys():
             logging.warning(""" [Software warning] The selected image ({} {}) does not have any expression in {} space. The default image in patient space is therefore used.""".format(self.timestamp_folder_name, self.get_sequence_type_str(),
                        UserPreferencesStructure.getInstance().display_space))
 
+    def __get_display_base_volume(self) -> np.ndarray:
+        """
+        Intensity volume from which the display volume is generated, either in raw patient space or any atlas space.
+        """
+        if UserPreferencesStructure.getInstance().display_space != 'Patient' and\
+                UserPreferencesStructure.getInstance().display_space in self.registered_volume_filepaths.keys():
+            return self.__get_registered_volume(UserPreferencesStructure.getInstance().display_space)
+        return self.__get_resampled_input_volume()
+
+    def __on_contrast_window_changed(self, preview: bool) -> None:
+        if preview:
+            self._contrast_preview_pending = True
+            self._contrast_changed = True
+        else:
+            self.__apply_contrast_scaling_to_display_volume()
+
     def __apply_contrast_scaling_to_display_volume(self, display_volume: np.ndarray = None) -> None:
         """
         Generate a display volume according to the contrast parameters set by the user.
+        The uint8 display volume and the floating-point work buffer are reused across contrast modifications, such that
+        no full-size array is allocated when the user drags the contrast window.
 
         Parameters
         ----------
@@ -605,19 +740,15 @@ class MRIVolume:
             Base display volume to use to generate a contrast-scaled version of.
         """
         if display_volume is None:
-            display_volume = self._resampled_input_volume
-            if UserPreferencesStructure.getInstance().display_space != 'Patient' and\
-                UserPreferencesStructure.getInstance().display_space in self.registered_volumes.keys():
-                display_volume = self.registered_volumes[UserPreferencesStructure.getInstance().display_space]
+            display_volume = self.__get_display_base_volume()
 
         # Scaling data to uint8
-        image_res = deepcopy(display_volume)
-        image_res[image_res < self._contrast_window[0]] = self._contrast_window[0]
-        image_res[image_res > self._contrast_window[1]] = self._contrast_window[1]
-        if (self._contrast_window[1] - self._contrast_window[0]) != 0:
-            tmp = (image_res - self._contrast_window[0]) / (self._contrast_window[1] - self._contrast_window[0])
-            image_res = tmp * 255.
-        image_res = image_res.astype('uint8')
-
-        self._display_volume = deepcopy(image_res)
+        if self._display_volume is None or self._display_volume.shape != display_volume.shape \
+                or self._display_volume.dtype != np.uint8:
+            self._display_volume = np.empty(display_volume.shape, dtype='uint8')
+        if self._contrast_work_buffer is None or self._contrast_work_buffer.shape != display_volume.shape:
+            self._contrast_work_buffer = get_contrast_window_work_buffer(display_volume)
+        apply_contrast_window(display_volume, self._contrast_window[0], self._contrast_window[1],
+                              out=self._display_volume, work_buffer=self._contrast_work_buffer)
         self._contrast_changed = True
+        self._contrast_preview_pending = False
@@ -2,8 +2,11 @@ import os
 import configparser
 import datetime
 import dateutil
+import functools
 import shutil
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from os.path import expanduser
 import nibabel as nib
 import SimpleITK as sitk
@@ -20,7 +23,8 @@ from utils.data_structures.AnnotationStructure import AnnotationVolume, Annotati
 from utils.data_structures.AtlasStructure import AtlasVolume
 from utils.data_structures.InvestigationTimestampStructure import InvestigationTimestamp, InvestigationType
 from utils.data_structures.ReportingStructure import ReportingStructure
-from utils.utilities import input_file_category_disambiguation, dicom_write_slice, sanitize_filename
+from utils.utilities import input_file_category_disambiguation, input_volume_category_disambiguation, \
+    dicom_write_slice, sanitize_filename, convert_sitk_image_to_nibabel, get_resampled_volume_extension
 from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
 
 
@@ -40,6 +44,11 @@ class PatientParameters:
     _reportings = {}  # All standardized reports computed for the current patient.
     _active_investigation_timestamp_uid = None  # Convenience for now, to know into which TS to load the imported data.
     _unsaved_changes = False  # Documenting any change, for suggesting saving when swapping between patients.
+    _outdated_scene_entries = set()  # Objects (scene section, unique id) with discarded changes, to dump when saving
+    _save_lock = None  # Lock preventing concurrent saves, and folder or objects removals while saving in the background
+    _lookup_indexes = {}  # Secondary indexes over the volumes, by index name, then by key, as {unique id: rank}
+    _indexed_keys = {}  # Keys under which each volume is indexed, by (scene section, unique id)
+    _indexing_rank = 0  # Counter of indexed volumes, for returning the lookups in the order the volumes were added
 
     def __init__(self, id: str = "-1", dest_location: str = None, patient_filename: str = None):
         """
@@ -75,6 +84,11 @@ class PatientParameters:
         self._reportings = {}
         self._active_investigation_timestamp_uid = None
         self._unsaved_changes = False
+        self._outdated_scene_entries = set()
+        self._save_lock = threading.RLock()
+        self._lookup_indexes = {}
+        self._indexed_keys = {}
+        self._indexing_rank = 0
 
     def __init_from_scratch(self, dest_location: str) -> None:
         self._display_name = self._unique_id
@@ -181,11 +195,10 @@ class PatientParameters:
 
     def load_in_memory(self) -> None:
         """
-        When a patient has been manually selected to be visible, all data objects are loaded from disk and restored
-        in memory. Necessary for performing on-the-fly operations such as contrast adjustment for which a grip on the
-        raw MRI volumes is mandatory.
-        @TODO. Have to check the speed, but it might be too slow if many volumes/annotations/etc..., might be better
-        to load in memory only if the objects is actually being toggled for viewing.
+        When a patient has been manually selected to be visible, all data objects are made available for display.
+        The volumes are not read from disk at this point, each array being materialised only the first time the
+        corresponding object is toggled for viewing or queried (e.g., for contrast adjustment), such that selecting a
+        patient with many volumes/annotations/atlases remains fast.
         """
         logging.debug("Loading patient {} from memory.".format(self._unique_id))
         try:
@@ -203,30 +216,111 @@ class PatientParameters:
         """
         Should only be used internally by the system when reloading a patient scene from file (*.raidionics), since the
         modifications are simply related to reading from disk and not real modifications.
+        When changes are discarded by the user, the modified objects are remembered such that they are still dumped
+        the next time the patient is saved.
         """
         self._unsaved_changes = state
-        for ts in self.investigation_timestamps:
-            self.investigation_timestamps[ts].set_unsaved_changes_state(state)
-        for im in self.mri_volumes:
-            self.mri_volumes[im].set_unsaved_changes_state(state)
-        for an in self._annotation_volumes:
-            self._annotation_volumes[an].set_unsaved_changes_state(state)
-        for at in self._atlas_volumes:
-            self._atlas_volumes[at].set_unsaved_changes_state(state)
+        for category, objects in self.__get_scene_objects():
+            for uid in objects:
+                if not state and objects[uid].has_unsaved_changes():
+                    self._outdated_scene_entries.add((category, uid))
+                objects[uid].set_unsaved_changes_state(state)
 
     def has_unsaved_changes(self) -> bool:
         status = self._unsaved_changes
-        for ts in self.investigation_timestamps:
-            status = status | self.investigation_timestamps[ts].has_unsaved_changes()
-        for im in self.mri_volumes:
-            status = status | self.mri_volumes[im].has_unsaved_changes()
-        for an in self._annotation_volumes:
-            status = status | self._annotation_volumes[an].has_unsaved_changes()
-        for at in self._atlas_volumes:
-            status = status | self._atlas_volumes[at].has_unsaved_changes()
+        for _, objects in self.__get_scene_objects():
+            for uid in objects:
+                status = status | objects[uid].has_unsaved_changes()
 
         return status
 
+    def __get_scene_objects(self) -> List[Tuple[str, dict]]:
+        """
+        All objects stored inside the scene file, as (scene section name, objects by unique id) pairs.
+        """
+        return [('Timestamps', self.investigation_timestamps), ('Volumes', self.mri_volumes),
+                ('Annotations', self._annotation_volumes), ('Atlases', self._atlas_volumes),
+                ('Reports', self._reportings)]
+
+    def __get_index_keys(self, category: str, uid: str) -> dict:
+        """
+        Keys under which the volume should be indexed given its current attributes, by index name.
+        """
+        if category == 'Volumes':
+            volume = self.mri_volumes[uid]
+            return {'mri_by_timestamp': volume.timestamp_uid, 'mri_by_display_name': volume.display_name}
+        elif category == 'Annotations':
+            volume = self._annotation_volumes[uid]
+            parent_uid = volume.get_parent_mri_uid()
+            annotation_class = volume.get_annotation_class_enum()
+            generation_type = volume.get_generation_type_enum()
+            return {'annotation_by_mri': parent_uid, 'annotation_by_timestamp': volume.timestamp_uid,
+                    'annotation_by_mri_and_class': (parent_uid, annotation_class),
+                    'annotation_by_mri_and_generation': (parent_uid, generation_type),
+                    'annotation_by_mri_class_and_generation': (parent_uid, annotation_class, generation_type)}
+        else:
+            volume = self._atlas_volumes[uid]
+            return {'atlas_by_mri': volume.get_parent_mri_uid(), 'atlas_by_timestamp': volume.timestamp_uid}
+
+    def __get_volume(self, category: str, uid: str) -> Union[MRIVolume, AnnotationVolume, AtlasVolume]:
+        if category == 'Volumes':
+            return self.mri_volumes[uid]
+        elif category == 'Annotations':
+            return self._annotation_volumes[uid]
+        return self._atlas_volumes[uid]
+
+    def __add_to_indexes(self, category: str, uid: str) -> None:
+        """
+        Registers a newly imported volume in the lookup indexes, which are then kept up-to-date by the volume itself
+        notifying any modification of the indexed attributes.
+
+        Parameters
+        ----------
+        category: str
+            Scene section of the volume, from [Volumes, Annotations, Atlases].
+        uid: str
+            Internal unique identifier of the volume.
+        """
+        self._indexing_rank = self._indexing_rank + 1
+        keys = self.__get_index_keys(category, uid)
+        for name in keys.keys():
+            self._lookup_indexes.setdefault(name, {}).setdefault(keys[name], {})[uid] = self._indexing_rank
+        self._indexed_keys[(category, uid)] = (keys, self._indexing_rank)
+        self.__get_volume(category, uid).index_update_callback = functools.partial(self.__update_indexes, category)
+
+    def __remove_from_indexes(self, category: str, uid: str) -> None:
+        keys, _ = self._indexed_keys.pop((category, uid), ({}, None))
+        for name in keys.keys():
+            self.__remove_index_entry(name, keys[name], uid)
+        self.__get_volume(category, uid).index_update_callback = None
+
+    def __update_indexes(self, category: str, uid: str) -> None:
+        """
+        Moves the volume to its new keys in the indexes where the indexed attribute has changed, keeping its rank.
+        """
+        if (category, uid) not in self._indexed_keys.keys():
+            return
+        previous_keys, rank = self._indexed_keys[(category, uid)]
+        keys = self.__get_index_keys(category, uid)
+        for name in keys.keys():
+            if keys[name] != previous_keys[name]:
+                self.__remove_index_entry(name, previous_keys[name], uid)
+                self._lookup_indexes.setdefault(name, {}).setdefault(keys[name], {})[uid] = rank
+        self._indexed_keys[(category, uid)] = (keys, rank)
+
+    def __remove_index_entry(self, name: str, key: Any, uid: str) -> None:
+        entries = self._lookup_indexes[name][key]
+        entries.pop(uid, None)
+        if len(entries) == 0:
+            del self._lookup_indexes[name][key]
+
+    def __lookup(self, name: str, key: Any) -> List[str]:
+        """
+        Unique identifiers of the volumes indexed under the given key, in the order the volumes were added.
+        """
+        entries = self._lookup_indexes.get(name, {}).get(key, {})
+        return sorted(entries.keys(), key=entries.get)
+
     @property
     def display_name(self) -> str:
         return self._display_name
@@ -260,42 +354,44 @@ class PatientParameters:
             'Destination folder: {}.'.format(os.path.dirname(self._output_folder))
             raise ValueError(msg)
         else:
-            try:
-                self._display_name = new_name.strip()
-                new_patient_parameters_dict_filename = os.path.join(self._output_folder,
-                                                                    self._display_name.strip().lower().replace(" ", "_")
-                                                                    + '_scene.raidionics')
-                if os.path.exists(self._patient_parameters_dict_filename):
-                    os.rename(src=self._patient_parameters_dict_filename, dst=new_patient_parameters_dict_filename)
-                self._patient_parameters_dict_filename = os.path.join(os.path.dirname(self._output_folder),
-                                                                      self._display_name.strip().lower().replace(" ", "_"),
-                                                                      self._display_name.strip().lower().replace(" ", "_")
-                                                                      + '_scene.raidionics')
-
-                for i, disp in enumerate(list(self.investigation_timestamps.keys())):
-                    self.investigation_timestamps[disp].output_patient_folder = new_output_folder
-
-                for i, disp in enumerate(list(self.mri_volumes.keys())):
-                    self.mri_volumes[disp].output_patient_folder = new_output_folder
-
-                for i, disp in enumerate(list(self._annotation_volumes.keys())):
-                    self._annotation_volumes[disp].output_patient_folder = new_output_folder
-
-                for i, disp in enumerate(list(self._atlas_volumes.keys())):
-                    self._atlas_volumes[disp].output_patient_folder = new_output_folder
-
-                for i, disp in enumerate(list(self._reportings.keys())):
-                    self._reportings[disp].output_patient_folder = new_output_folder
-
-                shutil.move(src=self._output_folder, dst=new_output_folder, copy_function=shutil.copytree)
-                self._output_folder = new_output_folder
-                logging.info("Renamed current output folder to: {}".format(self._output_folder))
-                if manual_change:
-                    self._unsaved_changes = True
-                    logging.debug("Unsaved changes - Patient object display name edited to {}.".format(new_name))
-            except Exception as e:
-                raise RuntimeError(f"Attempting to change the patient display name failed with: {e}.\n "
-                                   f"Traceback: {traceback.format_exc()}")
+            # Moving the patient folder only in-between background saves
+            with self._save_lock:
+                try:
+                    self._display_name = new_name.strip()
+                    new_patient_parameters_dict_filename = os.path.join(self._output_folder,
+                                                                        self._display_name.strip().lower().replace(" ", "_")
+                                                                        + '_scene.raidionics')
+                    if os.path.exists(self._patient_parameters_dict_filename):
+                        os.rename(src=self._patient_parameters_dict_filename, dst=new_patient_parameters_dict_filename)
+                    self._patient_parameters_dict_filename = os.path.join(os.path.dirname(self._output_folder),
+                                                                          self._display_name.strip().lower().replace(" ", "_"),
+                                                                          self._display_name.strip().lower().replace(" ", "_")
+                                                                          + '_scene.raidionics')
+
+                    for i, disp in enumerate(list(self.investigation_timestamps.keys())):
+                        self.investigation_timestamps[disp].output_patient_folder = new_output_folder
+
+                    for i, disp in enumerate(list(self.mri_volumes.keys())):
+                        self.mri_volumes[disp].output_patient_folder = new_output_folder
+
+                    for i, disp in enumerate(list(self._annotation_volumes.keys())):
+                        self._annotation_volumes[disp].output_patient_folder = new_output_folder
+
+                    for i, disp in enumerate(list(self._atlas_volumes.keys())):
+                        self._atlas_volumes[disp].output_patient_folder = new_output_folder
+
+                    for i, disp in enumerate(list(self._reportings.keys())):
+                        self._reportings[disp].output_patient_folder = new_output_folder
+
+                    shutil.move(src=self._output_folder, dst=new_output_folder, copy_function=shutil.copytree)
+                    self._output_folder = new_output_folder
+                    logging.info("Renamed current output folder to: {}".format(self._output_folder))
+                    if manual_change:
+                        self._unsaved_changes = True
+                        logging.debug("Unsaved changes - Patient object display name edited to {}.".format(new_name))
+                except Exception as e:
+                    raise RuntimeError(f"Attempting to change the patient display name failed with: {e}.\n "
+                                       f"Traceback: {traceback.format_exc()}")
 
     def import_report(self, filename: str, inv_ts_uid: str) -> Tuple[str, Union[None, str]]:
         """
@@ -359,6 +455,7 @@ class PatientParameters:
                                        output_patient_folder=self._output_folder,
                                        reload_params=self._patient_parameters_dict['Volumes'][volume_id])
                 self.mri_volumes[volume_id] = mri_volume
+                self.__add_to_indexes('Volumes', volume_id)
 
             for volume_id in list(self._patient_parameters_dict['Annotations'].keys()):
                 annotation_volume = AnnotationVolume(uid=volume_id,
@@ -368,6 +465,7 @@ class PatientParameters:
                                                      inv_ts_uid=self._patient_parameters_dict['Annotations'][volume_id]['investigation_timestamp_uid'],
                                                      reload_params=self._patient_parameters_dict['Annotations'][volume_id])
                 self._annotation_volumes[volume_id] = annotation_volume
+                self.__add_to_indexes('Annotations', volume_id)
 
             for volume_id in list(self._patient_parameters_dict['Atlases'].keys()):
                 atlas_volume = AtlasVolume(uid=volume_id,
@@ -378,6 +476,7 @@ class PatientParameters:
                                            description_filename=os.path.join(self._output_folder, self._patient_parameters_dict['Atlases'][volume_id]['description_filepath']),
                                            reload_params=self._patient_parameters_dict['Atlases'][volume_id])
                 self._atlas_volumes[volume_id] = atlas_volume
+                self.__add_to_indexes('Atlases', volume_id)
 
             for report_id in list(self._patient_parameters_dict['Reports'].keys()):
                 report = ReportingStructure(uid=report_id,
@@ -386,12 +485,22 @@ class PatientParameters:
                                             inv_ts_uid=self._patient_parameters_dict['Reports'][report_id]['investigation_timestamp_uid'],
                                             reload_params=self._patient_parameters_dict['Reports'][report_id])
                 self._reportings[report_id] = report
+
+            # The scene content on disk matches the objects just reloaded from it, nothing to dump until modified.
+            # Resampled volumes stored in another format (e.g., legacy nifti files) are still dumped by the next save,
+            # for being converted.
+            for category, objects in self.__get_scene_objects():
+                for uid in objects:
+                    objects[uid].set_unsaved_changes_state(False)
+                    resampled_filepath = self._patient_parameters_dict[category][uid].get('resample_input_filepath')
+                    if resampled_filepath and not resampled_filepath.endswith(get_resampled_volume_extension()):
+                        self._outdated_scene_entries.add((category, uid))
         except Exception as e:
             raise RuntimeError("Import patient failed for {} with: {}.".format(os.path.basename(filename), e))
         return error_message
 
     def import_data(self, filename: str, investigation_ts: str = None, investigation_ts_folder_name: str = None,
-                    type: str = None) -> str:
+                    type: str = None, input_image: nib.Nifti1Image = None) -> str:
         """
         Defining how stand-alone MRI volumes or annotation volumes are loaded into the system for the current patient.
 
@@ -412,6 +521,9 @@ class PatientParameters:
         type: str
             Logical type for the volume to load from [None, "MRI", "Annotation"]. If None, the type will be determined
             automatically
+        input_image: nib.Nifti1Image
+            Content of the volume if already in memory (e.g., converted from a DICOM series), in which case filename is
+            only a nominal filename and the volume is saved once inside the patient folder.
 
         Returns
         -------
@@ -422,7 +534,10 @@ class PatientParameters:
 
         try:
             if not type:
-                type = input_file_category_disambiguation(filename)
+                if input_image is not None:
+                    type = input_volume_category_disambiguation(np.asanyarray(input_image.dataobj))
+                else:
+                    type = input_file_category_disambiguation(filename)
 
             # @TODO. Maybe not the best solution to fix the QDialog push button multiple clicks issue.
             if type == "MRI" and self.is_mri_raw_filepath_already_loaded(filename):
@@ -430,49 +545,31 @@ class PatientParameters:
             if type == "Annotation" and self.is_annotation_raw_filepath_already_loaded(filename):
                 raise ValueError("[Doppelganger] An annotation with the provided filename ({}) has already been loaded for the patient".format(filename))
 
-            # When including data for a patient, creating a Timestamp if none exists, otherwise assign to the first one
-            if not investigation_ts:
-                if len(self.investigation_timestamps) == 0:
-                    investigation_ts = 'T0'
-                    curr_ts = InvestigationTimestamp(investigation_ts, order=0,
-                                                     output_patient_folder=self._output_folder)
-                    self.investigation_timestamps[investigation_ts] = curr_ts
-                elif self._active_investigation_timestamp_uid:
-                    investigation_ts = self._active_investigation_timestamp_uid
-                else:
-                    investigation_ts = list(self.investigation_timestamps.keys())[0]
+            investigation_ts = self.__get_import_timestamp(investigation_ts)
 
             if type == 'MRI':
-                # Generating a unique id for the MRI volume
-                base_data_uid = os.path.basename(filename).strip().split('.')[0]
-                non_available_uid = True
-                while non_available_uid:
-                    data_uid = str(np.random.randint(0, 10000)) + '_' + base_data_uid
-                    if data_uid not in list(self.mri_volumes.keys()):
-                        non_available_uid = False
+                data_uid = self.__generate_data_uid(filename, self.mri_volumes.keys())
 
                 self.mri_volumes[data_uid] = MRIVolume(uid=data_uid, inv_ts_uid=investigation_ts,
                                                         input_filename=filename,
                                                         output_patient_folder=self._output_folder,
-                                                       ts_folder_name=self.investigation_timestamps[investigation_ts].folder_name)
+                                                       ts_folder_name=self.investigation_timestamps[investigation_ts].folder_name,
+                                                       input_image=input_image)
+                self.__add_to_indexes('Volumes', data_uid)
             else:
                 if len(self.mri_volumes) != 0:
                     # @TODO. Not optimal to set a default parent MRI, forces a manual update after, must be improved.
                     # Should at least take the first MRI series for the correct timestamp.
                     default_parent_mri_uid = self.get_all_mri_volumes_for_timestamp(investigation_ts)[0] # list(self.mri_volumes.keys())[0]
-                    # Generating a unique id for the annotation volume
-                    base_data_uid = os.path.basename(filename).strip().split('.')[0]
-                    non_available_uid = True
-                    while non_available_uid:
-                        data_uid = str(np.random.randint(0, 10000)) + '_' + base_data_uid
-                        if data_uid not in list(self._annotation_volumes.keys()):
-                            non_available_uid = False
+                    data_uid = self.__generate_data_uid(filename, self._annotation_volumes.keys())
 
                     self._annotation_volumes[data_uid] = AnnotationVolume(uid=data_uid, input_filename=filename,
                                                                           output_patient_folder=self._output_folder,
                                                                           parent_mri_uid=default_parent_mri_uid,
                                                                           inv_ts_uid=investigation_ts,
-                                                                          inv_ts_folder_name=investigation_ts_folder_name)
+                                                                          inv_ts_folder_name=investigation_ts_folder_name,
+                                                                          input_image=input_image)
+                    self.__add_to_indexes('Annotations', data_uid)
                 else:
                     raise ValueError("Annotation import failed, no MRI volume has been imported yet (mandatory for importing an annotation).")
         except Exception as e:
@@ -483,11 +580,157 @@ class PatientParameters:
         logging.debug("Unsaved changes - Patient object expanded with new volumes.")
         return data_uid
 
+    def import_data_batch(self, filenames: List[str], investigation_ts: str = None,
+                          investigation_ts_folder_name: str = None, types: List[str] = None,
+                          max_workers: int = None) -> List[Tuple[str, str, str]]:
+        """
+        Bulk counterpart of import_data, for loading multiple stand-alone MRI volumes or annotation volumes at once
+        (e.g., dropped together onto the viewer).
+        The per-file work (i.e., classification, conversion, copy inside the patient folder, standardization) is
+        fanned out over a pool of threads, the heavy lifting happening in nibabel, zlib, and scipy which release the
+        GIL. The resulting objects are only attached to the patient once all files are processed, in a deterministic
+        order regardless of which file finished first: all MRI volumes in the order of the inputs, then all annotation
+        volumes in the order of the inputs. Annotations can therefore be linked to an MRI volume imported in the same
+        batch, as when importing the files one by one with the MRI volumes first.
+
+        Parameters
+        ----------
+        filenames: List[str]
+            Disk locations containing the volumes to be loaded inside Raidionics for the current patient.
+        investigation_ts: str
+            Unique internal identifier to attach all loaded volumes to.
+        investigation_ts_folder_name: str
+            Folder name on disk where all volumes for the specified investigation timestamp should be stored.
+        types: List[str]
+            Logical type for each volume to load from [None, "MRI", "Annotation"]. If None, or None for a given
+            volume, the type will be determined automatically.
+        max_workers: int
+            Maximum number of volumes processed concurrently, None to use as many as CPU cores.
+
+        Returns
+        -------
+        List[Tuple[str, str, str]]
+            For each input filename, in the same order, the new internal unique identifier for the loaded volume (None
+            if the import failed), its logical type, and the reason of the failure (None if successful).
+        """
+        if types is None:
+            types = [None] * len(filenames)
+        if len(filenames) != len(types):
+            raise ValueError("Importing data failed with: {} types provided for {} files.".format(len(types),
+                                                                                                  len(filenames)))
+        results = [[None, types[i], None] for i in range(len(filenames))]
+        if len(filenames) == 0:
+            return [tuple(r) for r in results]
+
+        investigation_ts = self.__get_import_timestamp(investigation_ts)
+        ts_folder_name = self.investigation_timestamps[investigation_ts].folder_name
+        # Unique ids are generated beforehand in the order of the inputs, such that concurrent imports cannot collide
+        reserved_uids = list(self.mri_volumes.keys()) + list(self._annotation_volumes.keys())
+        data_uids = []
+        for filename in filenames:
+            data_uids.append(self.__generate_data_uid(filename, reserved_uids))
+            reserved_uids.append(data_uids[-1])
+
+        def import_file(index: int) -> Union[MRIVolume, AnnotationVolume, None]:
+            filename = filenames[index]
+            try:
+                if filenames.index(filename) != index:
+                    raise ValueError("[Doppelganger] The provided filename ({}) is already part of the batch".format(
+                        filename))
+                type = results[index][1]
+                if not type:
+                    type = input_file_category_disambiguation(filename)
+                    results[index][1] = type
+
+                # The patient is only read here, all objects being attached once the pool is done
+                if type == "MRI" and self.is_mri_raw_filepath_already_loaded(filename):
+                    raise ValueError("[Doppelganger] An MRI with the provided filename ({}) has already been loaded for the patient".format(filename))
+                if type == "Annotation" and self.is_annotation_raw_filepath_already_loaded(filename):
+                    raise ValueError("[Doppelganger] An annotation with the provided filename ({}) has already been loaded for the patient".format(filename))
+
+                if type == 'MRI':
+                    return MRIVolume(uid=data_uids[index], inv_ts_uid=investigation_ts, input_filename=filename,
+                                     output_patient_folder=self._output_folder, ts_folder_name=ts_folder_name)
+                # The parent MRI volume is only known once the MRI volumes of the batch are attached
+                return AnnotationVolume(uid=data_uids[index], input_filename=filename,
+                                        output_patient_folder=self._output_folder, parent_mri_uid=None,
+                                        inv_ts_uid=investigation_ts,
+                                        inv_ts_folder_name=investigation_ts_folder_name)
+            except Exception as e:
+                results[index][2] = "Importing data (i.e., radiological volume or annotation) failed with: {}".format(e)
+                logging.error(results[index][2])
+                return None
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(filenames)))) as executor:
+            imported_volumes = list(executor.map(import_file, range(len(filenames))))
+
+        for index in range(len(filenames)):
+            if isinstance(imported_volumes[index], MRIVolume):
+                self.mri_volumes[data_uids[index]] = imported_volumes[index]
+                self.__add_to_indexes('Volumes', data_uids[index])
+                results[index][0] = data_uids[index]
+                logging.info("New data file imported: {}".format(data_uids[index]))
+
+        for index in range(len(filenames)):
+            if isinstance(imported_volumes[index], AnnotationVolume):
+                if len(self.get_all_mri_volumes_for_timestamp(investigation_ts)) == 0:
+                    results[index][2] = "Importing data (i.e., radiological volume or annotation) failed with: " \
+                                        "Annotation import failed, no MRI volume has been imported yet (mandatory " \
+                                        "for importing an annotation)."
+                    logging.error(results[index][2])
+                    continue
+                # @TODO. Not optimal to set a default parent MRI, forces a manual update after, must be improved.
+                imported_volumes[index].set_parent_mri_uid(self.get_all_mri_volumes_for_timestamp(investigation_ts)[0])
+                self._annotation_volumes[data_uids[index]] = imported_volumes[index]
+                self.__add_to_indexes('Annotations', data_uids[index])
+                results[index][0] = data_uids[index]
+                logging.info("New data file imported: {}".format(data_uids[index]))
+
+        if True in [r[0] is not None for r in results]:
+            self._unsaved_changes = True
+            logging.debug("Unsaved changes - Patient object expanded with new volumes.")
+        return [tuple(r) for r in results]
+
+    def __get_import_timestamp(self, investigation_ts: str = None) -> str:
+        """
+        When including data for a patient, creating a Timestamp if none exists, otherwise assign to the active one or
+        to the first one.
+        """
+        if not investigation_ts:
+            if len(self.investigation_timestamps) == 0:
+                investigation_ts = 'T0'
+                curr_ts = InvestigationTimestamp(investigation_ts, order=0,
+                                                 output_patient_folder=self._output_folder)
+                self.investigation_timestamps[investigation_ts] = curr_ts
+            elif self._active_investigation_timestamp_uid:
+                investigation_ts = self._active_investigation_timestamp_uid
+            else:
+                investigation_ts = list(self.investigation_timestamps.keys())[0]
+        return investigation_ts
+
+    @staticmethod
+    def __generate_data_uid(filename: str, existing_uids) -> str:
+        """
+        Generating a unique id for a volume, from its filename and not among the existing ones.
+        """
+        base_data_uid = os.path.basename(filename).strip().split('.')[0]
+        non_available_uid = True
+        while non_available_uid:
+            data_uid = str(np.random.randint(0, 10000)) + '_' + base_data_uid
+            if data_uid not in list(existing_uids):
+                non_available_uid = False
+        return data_uid
+
     def import_dicom_data(self, dicom_series: DICOMSeries, inv_ts: str = None) -> Tuple[str, str]:
         """
         Half the content should be deported within the MRI structure, so that the DICOM metadata can be properly
         saved.
         @Behaviour. Should there be a check to avoid importing a volume that has less than 10 slices along one axis?
+        The DICOM series is decoded and converted in memory, then classified and saved only once as nifti inside the
+        patient folder by the radiological or annotation structure.
+
         Parameters
         ----------
         dicom_series: DICOMSeries
@@ -501,18 +744,12 @@ class PatientParameters:
             The internal unique id of the newly created object
         """
         uid = None
-        ori_filename = None
         try:
-            ori_filename = os.path.join(self._output_folder, dicom_series.get_unique_readable_name() + '.nii.gz')
-            filename_taken = os.path.exists(ori_filename)
-            while filename_taken:
-                trail = str(np.random.randint(0, 100000))
-                ori_filename = os.path.join(self._output_folder, dicom_series.get_unique_readable_name() + '_' +
-                                            str(trail) + '.nii.gz')
-                filename_taken = os.path.exists(ori_filename)
-
-            ori_filename = sanitize_filename(ori_filename)
-            sitk.WriteImage(dicom_series.volume, ori_filename)
+            # Nominal filename, the converted volume never exists on disk under this name.
+            ori_filename = sanitize_filename(os.path.join(self._output_folder,
+                                                          dicom_series.get_unique_readable_name() + '.nii.gz'))
+            input_image = convert_sitk_image_to_nibabel(dicom_series.volume)
+            dicom_series.release_volume()
             logging.info("Converted DICOM import to {}".format(ori_filename))
             investigation_dicom_id = dicom_series.get_study_unique_name()
             inv_ts_object = self.get_timestamp_by_dicom_study_id(investigation_dicom_id)
@@ -526,23 +763,20 @@ class PatientParameters:
                 inv_ts_uid = curr_ts.unique_id
             else:
                 inv_ts_uid = inv_ts_object.unique_id
-            input_type = input_file_category_disambiguation(ori_filename)
-            uid = self.import_data(ori_filename, investigation_ts=inv_ts_uid, type=input_type)
+            input_type = input_volume_category_disambiguation(np.asanyarray(input_image.dataobj))
+            uid = self.import_data(ori_filename, investigation_ts=inv_ts_uid, type=input_type, input_image=input_image)
             if uid in list(self.mri_volumes.keys()):
                 self.mri_volumes[uid].dicom_metadata = dicom_series.dicom_tags
 
-            # Removing the temporary MRI Series placeholder.
+            # The nominal filename is replaced by the location where the volume has been saved.
             if uid in list(self.mri_volumes.keys()):
                 self.mri_volumes[uid].set_usable_filepath_as_raw()
             elif uid in list(self.annotation_volumes.keys()):
                 self.annotation_volumes[uid].set_usable_filepath_as_raw()
-            if ori_filename and os.path.exists(ori_filename):
-                os.remove(ori_filename)
             self._unsaved_changes = True
             return uid, input_type
         except Exception as e:
-            if ori_filename and os.path.exists(ori_filename):
-                os.remove(ori_filename)
+            dicom_series.release_volume()
             raise RuntimeError("DICOM data import failed with: {}".format(e))
 
     def import_atlas_structures(self, filename: str, parent_mri_uid: str, investigation_ts_folder_name: str = None,
@@ -564,6 +798,7 @@ class PatientParameters:
                                                             parent_mri_uid=parent_mri_uid,
                                                             inv_ts_folder_name=investigation_ts_folder_name,
                                                             description_filename=description)
+                self.__add_to_indexes('Atlases', data_uid)
             else:  # Reference is MNI space then
                 raise NotImplementedError("Importing atlas structure not inside the patient space failed. NIY...")
         except Exception as e:
@@ -573,54 +808,76 @@ class PatientParameters:
         self._unsaved_changes = True
         return data_uid
 
-    def save_patient(self) -> None:
+    def save_patient(self) -> bool:
         """
         Exporting the scene for the current patient into the specified output_folder
+        The scene content from the previous save is kept, and only the objects with unsaved changes, or not yet part of
+        the scene, are dumped again. Unchanged volumes are hence neither serialized again nor rewritten on disk, and the
+        RTStruct export is only performed for the radiological volumes whose annotations changed.
+        The scene file is first written in a temporary file which then replaces the previous scene, such that an
+        interruption while writing never leaves a truncated scene behind. Concurrent saves (e.g., from the background
+        save queue and a removal) are performed one after the other.
         @TODO. We need the patient in memory when it is saved, to dump the display_volume and so on...
         Do we force a memory load/offload during saving time? But then how do we know if the patient is the active
         patient, whereby it is already in memory and should not be released.
-        """
-        logging.info("Saving patient results in: {}".format(self._output_folder))
-        try:
-            self._last_editing_timestamp = datetime.datetime.now(tz=dateutil.tz.gettz(name='Europe/Oslo'))
-            self._patient_parameters_dict_filename = os.path.join(self._output_folder, self._display_name.strip().lower().replace(" ", "_") + '_scene.raidionics')
-            self._patient_parameters_dict['Parameters']['Default']['unique_id'] = self._unique_id
-            self._patient_parameters_dict['Parameters']['Default']['display_name'] = self._display_name
-            self._patient_parameters_dict['Parameters']['Default']['creation_timestamp'] = self._creation_timestamp.strftime("%d/%m/%Y, %H:%M:%S")
-            self._patient_parameters_dict['Parameters']['Default']['last_editing_timestamp'] = self._last_editing_timestamp.strftime("%d/%m/%Y, %H:%M:%S")
 
-            self._patient_parameters_dict['Timestamps'] = {}
-            self._patient_parameters_dict['Volumes'] = {}
-            self._patient_parameters_dict['Annotations'] = {}
-            self._patient_parameters_dict['Atlases'] = {}
-            self._patient_parameters_dict['Reports'] = {}
-
-            # @TODO. Should the timestamp folder_name be going down here before saving each element?
-            for i, disp in enumerate(list(self.investigation_timestamps.keys())):
-                self._patient_parameters_dict['Timestamps'][disp] = self.investigation_timestamps[disp].save()
-
-            for i, disp in enumerate(list(self.mri_volumes.keys())):
-                self._patient_parameters_dict['Volumes'][disp] = self.mri_volumes[disp].save()
-
-            for i, disp in enumerate(list(self._annotation_volumes.keys())):
-                self._patient_parameters_dict['Annotations'][disp] = self._annotation_volumes[disp].save()
-
-            for i, disp in enumerate(list(self._atlas_volumes.keys())):
-                self._patient_parameters_dict['Atlases'][disp] = self._atlas_volumes[disp].save()
-
-            for i, disp in enumerate(list(self._reportings.keys())):
-                self._patient_parameters_dict['Reports'][disp] = self._reportings[disp].save()
-
-            if UserPreferencesStructure.getInstance().export_results_as_rtstruct:
-                self.__convert_results_as_dicom_rtstruct()
-
-            # Saving the json file last, as it must be populated from the previous dumps beforehand
-            with open(self._patient_parameters_dict_filename, 'w') as outfile:
-                json.dump(self._patient_parameters_dict, outfile, indent=4, sort_keys=True)
+        Returns
+        -------
+        bool
+            True if the patient has been saved, False if the save failed (the error being logged).
+        """
+        with self._save_lock:
+            logging.info("Saving patient results in: {}".format(self._output_folder))
+            # The changes are marked as saved beforehand, such that any modification performed while saving in the
+            # background flags the patient again, to be stored by the next save.
             self._unsaved_changes = False
-        except Exception as e:
-            logging.error("""[Software error] Saving patient on disk failed with: {}.\n {}""".format(
-                e, traceback.format_exc()))
+            outdated_scene_entries = set(self._outdated_scene_entries)
+            self._outdated_scene_entries.clear()
+            try:
+                self._last_editing_timestamp = datetime.datetime.now(tz=dateutil.tz.gettz(name='Europe/Oslo'))
+                self._patient_parameters_dict_filename = os.path.join(self._output_folder, self._display_name.strip().lower().replace(" ", "_") + '_scene.raidionics')
+                self._patient_parameters_dict['Parameters']['Default']['unique_id'] = self._unique_id
+                self._patient_parameters_dict['Parameters']['Default']['display_name'] = self._display_name
+                self._patient_parameters_dict['Parameters']['Default']['creation_timestamp'] = self._creation_timestamp.strftime("%d/%m/%Y, %H:%M:%S")
+                self._patient_parameters_dict['Parameters']['Default']['last_editing_timestamp'] = self._last_editing_timestamp.strftime("%d/%m/%Y, %H:%M:%S")
+
+                # @TODO. Should the timestamp folder_name be going down here before saving each element?
+                outdated_mri_uids = set()
+                for category, objects in self.__get_scene_objects():
+                    if category not in self._patient_parameters_dict.keys():
+                        self._patient_parameters_dict[category] = {}
+                    scene_section = self._patient_parameters_dict[category]
+                    for uid in list(scene_section.keys()):
+                        if uid not in objects.keys():
+                            if category == 'Annotations':
+                                outdated_mri_uids.add(scene_section[uid]['parent_mri_uid'])
+                            del scene_section[uid]
+
+                    for uid in list(objects.keys()):
+                        if uid in scene_section.keys() and not objects[uid].has_unsaved_changes() \
+                                and (category, uid) not in outdated_scene_entries:
+                            continue
+                        scene_section[uid] = objects[uid].save()
+                        if category == 'Volumes':
+                            outdated_mri_uids.add(uid)
+                        elif category == 'Annotations':
+                            outdated_mri_uids.add(objects[uid].get_parent_mri_uid())
+
+                if UserPreferencesStructure.getInstance().export_results_as_rtstruct:
+                    self.__convert_results_as_dicom_rtstruct(outdated_mri_uids=list(outdated_mri_uids))
+
+                # Saving the json file last, as it must be populated from the previous dumps beforehand
+                tmp_filename = self._patient_parameters_dict_filename + '.tmp'
+                with open(tmp_filename, 'w') as outfile:
+                    json.dump(self._patient_parameters_dict, outfile, indent=4, sort_keys=True)
+                os.replace(tmp_filename, self._patient_parameters_dict_filename)
+            except Exception as e:
+                self._unsaved_changes = True
+                self._outdated_scene_entries.update(outdated_scene_entries)
+                logging.error("""[Software error] Saving patient on disk failed with: {}.\n {}""".format(
+                    e, traceback.format_exc()))
+                return False
+            return True
 
     @property
     def reportings(self) -> dict:
@@ -727,11 +984,8 @@ class PatientParameters:
         return self.mri_volumes[mri_uid]
 
     def get_mri_by_display_name(self, display_name: str) -> str:
-        res = "-1"
-        for im in self.mri_volumes:
-            if self.mri_volumes[im].display_name == display_name:
-                return im
-        return res
+        res = self.__lookup('mri_by_display_name', display_name)
+        return res[0] if len(res) != 0 else "-1"
 
     def get_mri_volume_by_display_name(self, display_name: str) -> MRIVolume:
         """
@@ -746,9 +1000,9 @@ class PatientParameters:
         -----
         ValueError if no radiological with the given display name can be found for the current patient.
         """
-        for im in self.mri_volumes:
-            if self.mri_volumes[im].display_name == display_name:
-                return self.mri_volumes[im]
+        res = self.__lookup('mri_by_display_name', display_name)
+        if len(res) != 0:
+            return self.mri_volumes[res[0]]
         raise ValueError("[PatientParametersStructure] No MRI volume exist with the following display name: {}".format(display_name))
 
     def get_mri_volume_by_base_filename(self, base_fn: str) -> Union[None, MRIVolume]:
@@ -791,12 +1045,7 @@ class PatientParameters:
         List[str]
             A list of unique identifiers for each MRI volume object associated with the given input parameters.
         """
-        res = []
-
-        for im in self.mri_volumes:
-            if self.mri_volumes[im].timestamp_uid == timestamp_uid:
-                res.append(im)
-        return res
+        return self.__lookup('mri_by_timestamp', timestamp_uid)
 
     def get_all_mri_volumes_for_sequence_type_and_timestamp(self, sequence_type: MRISequenceType,
                                                             timestamp_order: int) -> List[str]:
@@ -823,9 +1072,8 @@ class PatientParameters:
         if not inv_ts_uid:
             return res
 
-        for im in self.mri_volumes:
-            if self.mri_volumes[im].get_sequence_type_enum() == sequence_type \
-                    and self.mri_volumes[im].timestamp_uid == inv_ts_uid:
+        for im in self.__lookup('mri_by_timestamp', inv_ts_uid):
+            if self.mri_volumes[im].get_sequence_type_enum() == sequence_type:
                 res.append(im)
         return res
 
@@ -843,12 +1091,7 @@ class PatientParameters:
         List[str]
             A list of unique identifiers for each annotation object associated with the given MRI volume.
         """
-        res = []
-
-        for an in self._annotation_volumes:
-            if self._annotation_volumes[an].get_parent_mri_uid() == mri_volume_uid:
-                res.append(self._annotation_volumes[an].unique_id)
-        return res
+        return self.__lookup('annotation_by_mri', mri_volume_uid)
 
     def get_specific_annotations_for_mri(self, mri_volume_uid: str, annotation_class: AnnotationClassType = None,
                                          generation_type: AnnotationGenerationType = None) -> List[str]:
@@ -869,26 +1112,14 @@ class PatientParameters:
         List[str]
             List of annotation object UIDs matching the query.
         """
-        res = []
-
-        for an in self._annotation_volumes:
-            if annotation_class and generation_type:
-                if self._annotation_volumes[an].get_parent_mri_uid() == mri_volume_uid \
-                        and self._annotation_volumes[an].get_annotation_class_enum() == annotation_class \
-                        and self._annotation_volumes[an].get_generation_type_enum() == generation_type:
-                    res.append(self._annotation_volumes[an].unique_id)
-            elif annotation_class:
-                if self._annotation_volumes[an].get_parent_mri_uid() == mri_volume_uid \
-                        and self._annotation_volumes[an].get_annotation_class_enum() == annotation_class:
-                    res.append(self._annotation_volumes[an].unique_id)
-            elif generation_type:
-                if self._annotation_volumes[an].get_parent_mri_uid() == mri_volume_uid \
-                        and self._annotation_volumes[an].get_generation_type_enum() == generation_type:
-                    res.append(self._annotation_volumes[an].unique_id)
-            else:
-                if self._annotation_volumes[an].get_parent_mri_uid() == mri_volume_uid:
-                    res.append(self._annotation_volumes[an].unique_id)
-        return res
+        if annotation_class and generation_type:
+            return self.__lookup('annotation_by_mri_class_and_generation',
+                                 (mri_volume_uid, annotation_class, generation_type))
+        elif annotation_class:
+            return self.__lookup('annotation_by_mri_and_class', (mri_volume_uid, annotation_class))
+        elif generation_type:
+            return self.__lookup('annotation_by_mri_and_generation', (mri_volume_uid, generation_type))
+        return self.__lookup('annotation_by_mri', mri_volume_uid)
 
     def is_annotation_raw_filepath_already_loaded(self, volume_filepath: str) -> bool:
         state = False
@@ -923,12 +1154,7 @@ class PatientParameters:
         List[str]
             A list of unique identifiers for each annotation object associated with the given input parameters.
         """
-        res = []
-
-        for im in list(self._annotation_volumes.keys()):
-            if self._annotation_volumes[im].timestamp_uid == timestamp_uid:
-                res.append(im)
-        return res
+        return self.__lookup('annotation_by_timestamp', timestamp_uid)
 
     def get_all_annotation_uids_for_radiological_volume(self, radiological_uid: str) -> List[str]:
         """
@@ -943,11 +1169,7 @@ class PatientParameters:
         List[str]
             A list of unique identifiers for each annotation object associated with the given input parameters.
         """
-        res = []
-        for im in list(self._annotation_volumes.keys()):
-            if self._annotation_volumes[im].get_parent_mri_uid() == radiological_uid:
-                res.append(im)
-        return res
+        return self.__lookup('annotation_by_mri', radiological_uid)
 
     def get_all_reports_for_mri_and_type(self, mri_volume_uid: str, report_type: str) -> List[ReportingStructure]:
         res = []
@@ -971,12 +1193,7 @@ class PatientParameters:
         List[str]
             A list of unique identifiers for each atlas object associated with the given MRI volume.
         """
-        res = []
-
-        for at in self._atlas_volumes:
-            if self._atlas_volumes[at].get_parent_mri_uid() == mri_volume_uid:
-                res.append(self._atlas_volumes[at].unique_id)
-        return res
+        return self.__lookup('atlas_by_mri', mri_volume_uid)
 
     def get_all_atlas_volumes(self) -> dict:
         return self._atlas_volumes
@@ -1000,12 +1217,7 @@ class PatientParameters:
         List[str]
             A list of unique identifiers for each atlas object associated with the given input parameters.
         """
-        res = []
-
-        for im in list(self._atlas_volumes.keys()):
-            if self._atlas_volumes[im].timestamp_uid == timestamp_uid:
-                res.append(im)
-        return res
+        return self.__lookup('atlas_by_timestamp', timestamp_uid)
 
     def remove_timestamp(self, timestamp_uid: str) -> Tuple[dict, Union[None, str]]:
         """
@@ -1027,27 +1239,28 @@ class PatientParameters:
             (i) Removed internal unique ids, associated by category, as a dict.
             (ii) Error message collected during the recursive removal (as a string), None if no error encountered.
         """
-        results = {}
-        error_message = None
-        linked_scans = self.get_all_mri_volumes_for_timestamp(timestamp_uid=timestamp_uid)
-        ts_order = self.investigation_timestamps[timestamp_uid].order
-        for scan in linked_scans:
-            res, err = self.remove_mri_volume(volume_uid=scan)
-        if len(linked_scans) != 0:
-            results['MRIs'] = linked_scans
-
-        self.investigation_timestamps[timestamp_uid].delete()
-        del self.investigation_timestamps[timestamp_uid]
-        logging.info("Removed timestamp {} for patient {}".format(timestamp_uid, self._unique_id))
-
-        # For all existing timestamp with an order higher than the deleted timestamp, an order decrease by one must be
-        # performed.
-        for uid in list(self.investigation_timestamps.keys()):
-            if self.investigation_timestamps[uid].order > ts_order:
-                self.investigation_timestamps[uid].order = self.investigation_timestamps[uid].order - 1
-        self.save_patient()
-
-        return results, error_message
+        with self._save_lock:
+            results = {}
+            error_message = None
+            linked_scans = self.get_all_mri_volumes_for_timestamp(timestamp_uid=timestamp_uid)
+            ts_order = self.investigation_timestamps[timestamp_uid].order
+            for scan in linked_scans:
+                res, err = self.remove_mri_volume(volume_uid=scan)
+            if len(linked_scans) != 0:
+                results['MRIs'] = linked_scans
+
+            self.investigation_timestamps[timestamp_uid].delete()
+            del self.investigation_timestamps[timestamp_uid]
+            logging.info("Removed timestamp {} for patient {}".format(timestamp_uid, self._unique_id))
+
+            # For all existing timestamp with an order higher than the deleted timestamp, an order decrease by one must be
+            # performed.
+            for uid in list(self.investigation_timestamps.keys()):
+                if self.investigation_timestamps[uid].order > ts_order:
+                    self.investigation_timestamps[uid].order = self.investigation_timestamps[uid].order - 1
+            self.save_patient()
+
+            return results, error_message
 
     def remove_mri_volume(self, volume_uid: str) -> Tuple[dict, Union[None, str]]:
         """
@@ -1068,46 +1281,52 @@ class PatientParameters:
             (i) Removed internal unique ids, associated by category, as a dict.
             (ii) Error message collected during the recursive removal (as a string), None if no error encountered.
         """
-        results = {}
-        error_message = None
-        linked_annos = self.get_all_annotations_for_mri(mri_volume_uid=volume_uid)
-        for anno in linked_annos:
-            self.remove_annotation(annotation_uid=anno)
-        if len(linked_annos) != 0:
-            results['Annotations'] = linked_annos
-
-        linked_atlases = self.get_all_atlases_for_mri(mri_volume_uid=volume_uid)
-        for atlas in linked_atlases:
-            self.remove_atlas(atlas_uid=atlas)
-        if len(linked_atlases) != 0:
-            results['Atlases'] = linked_atlases
-
-        self.mri_volumes[volume_uid].delete()
-        del self.mri_volumes[volume_uid]
-        logging.info("Removed MRI volume {} for patient {}".format(volume_uid, self._unique_id))
-        self.save_patient()
-
-        return results, error_message
+        with self._save_lock:
+            results = {}
+            error_message = None
+            linked_annos = self.get_all_annotations_for_mri(mri_volume_uid=volume_uid)
+            for anno in linked_annos:
+                self.remove_annotation(annotation_uid=anno)
+            if len(linked_annos) != 0:
+                results['Annotations'] = linked_annos
+
+            linked_atlases = self.get_all_atlases_for_mri(mri_volume_uid=volume_uid)
+            for atlas in linked_atlases:
+                self.remove_atlas(atlas_uid=atlas)
+            if len(linked_atlases) != 0:
+                results['Atlases'] = linked_atlases
+
+            self.mri_volumes[volume_uid].delete()
+            self.__remove_from_indexes('Volumes', volume_uid)
+            del self.mri_volumes[volume_uid]
+            logging.info("Removed MRI volume {} for patient {}".format(volume_uid, self._unique_id))
+            self.save_patient()
+
+            return results, error_message
 
     def remove_annotation(self, annotation_uid: str) -> None:
         """
         Delete the specified annotation from the patient parameters, and additionally deletes on disk (within the
         patient folder) all elements linked to it (e.g., the corresponding display volume).
         """
-        self._annotation_volumes[annotation_uid].delete()
-        del self._annotation_volumes[annotation_uid]
-        logging.info("Removed annotation {} for patient {}".format(annotation_uid, self._unique_id))
-        self.save_patient()
+        with self._save_lock:
+            self._annotation_volumes[annotation_uid].delete()
+            self.__remove_from_indexes('Annotations', annotation_uid)
+            del self._annotation_volumes[annotation_uid]
+            logging.info("Removed annotation {} for patient {}".format(annotation_uid, self._unique_id))
+            self.save_patient()
 
     def remove_atlas(self, atlas_uid: str) -> None:
         """
         Delete the specified atlas from the patient parameters, and additionally deletes on disk (within the
         patient folder) all elements linked to it (e.g., the corresponding display volume).
         """
-        self._atlas_volumes[atlas_uid].delete()
-        del self._atlas_volumes[atlas_uid]
-        logging.info("Removed atlas {} for patient {}".format(atlas_uid, self._unique_id))
-        self.save_patient()
+        with self._save_lock:
+            self._atlas_volumes[atlas_uid].delete()
+            self.__remove_from_indexes('Atlases', atlas_uid)
+            del self._atlas_volumes[atlas_uid]
+            logging.info("Removed atlas {} for patient {}".format(atlas_uid, self._unique_id))
+            self.save_patient()
 
     def insert_investigation_timestamp(self, order: int) -> Tuple[str, int]:
         """
@@ -1158,9 +1377,15 @@ class PatientParameters:
                 res.append(im)
         return res
 
-    def __convert_results_as_dicom_rtstruct(self) -> None:
+    def __convert_results_as_dicom_rtstruct(self, outdated_mri_uids: List[str] = None) -> None:
         """
         Exporting all annotations into a DICOM RTStruct.
+
+        Parameters
+        ----------
+        outdated_mri_uids: List[str]
+            Radiological volumes for which the annotations changed since the last export. The RTStruct for any other
+            volume is only exported if not yet existing on disk. All RTStructs are exported again if None.
         """
         # @TODO. Preferences option to always dump the RTStruct additionally.
         # Create one structure for each MRI, and save on disk only if not empty.
@@ -1171,6 +1396,13 @@ class PatientParameters:
                 image_object = self.get_mri_by_uid(mri_uid=im_uid)
                 linked_annotation_uids = self.get_all_annotations_for_mri(mri_volume_uid=im_uid)
                 existing_annotations = len(linked_annotation_uids) != 0
+                dest_rt_struct_filename = os.path.join(os.path.dirname(image_object.usable_input_filepath),
+                                                       image_object.display_name,
+                                                       image_object.display_name + '_structures')
+                if outdated_mri_uids is not None and im_uid not in outdated_mri_uids \
+                        and os.path.exists(dest_rt_struct_filename + '.dcm'):
+                    # Skipping radiological volumes with an RTStruct already up-to-date on disk.
+                    continue
                 if existing_annotations:
                     # @TODO. Should the original DICOM files be used, or just convert on the fly with the existing
                     # DICOM tags, already stored in the Image structure?
@@ -1253,9 +1485,6 @@ class PatientParameters:
                     #         except Exception:
                     #             logging.warning("Failure to save {} atlas structure number {} as RTStruct.".format(atlas.display_name, s))
 
-                    dest_rt_struct_filename = os.path.join(os.path.dirname(image_object.usable_input_filepath),
-                                                           image_object.display_name,
-                                                           image_object.display_name + '_structures')
                     rt_struct.save(dest_rt_struct_filename)
                 else:
                     # Skipping radiological volumes without any annotation linked to.
@@ -41,7 +41,7 @@ class ReportingStructure:
     _output_patient_folder = ""  # Global output directory for the current patient.
     _timestamp_uid = None  # Internal unique identifier to the investigation timestamp, for saving on disk purposes.
     _timestamp_folder_name = ""  # Folder name for the aforementioned timestamp (based off its display name)
-    _unsaved_changes = False
+    _unsaved_changes = False  # Documenting any change, for re-dumping the report parameters when saving the patient
 
     def __init__(self, uid: str, report_filename: str, output_patient_folder: str, inv_ts_uid: str,
                  inv_ts_folder_name: str = None, reload_params: dict = None) -> None:
@@ -87,6 +87,12 @@ class ReportingStructure:
     def timestamp_uid(self) -> str:
         return self._timestamp_uid
 
+    def set_unsaved_changes_state(self, state: bool) -> None:
+        self._unsaved_changes = state
+
+    def has_unsaved_changes(self) -> bool:
+        return self._unsaved_changes
+
     @property
     def timestamp_folder_name(self) -> str:
         return self._timestamp_folder_name
@@ -124,6 +130,7 @@ class ReportingStructure:
                                                     self.output_patient_folder).split('/')[1:])
                 self._report_filename_csv = os.path.join(self.output_patient_folder, self._timestamp_folder_name,
                                                          rel_path)
+        self._unsaved_changes = True
 
     @property
     def report_filename(self) -> str:
@@ -149,6 +156,7 @@ class ReportingStructure:
             if self._report_filename_csv is not None and os.path.exists(self._report_filename_csv):
                 self._report_filename_csv = self._report_filename_csv.replace(self._output_patient_folder, output_folder)
             self._output_patient_folder = output_folder
+            self._unsaved_changes = True
         except Exception as e:
             raise ValueError("Changing the patient folder for the reporting structure failed with: {}".format(e))
 
@@ -159,6 +167,7 @@ class ReportingStructure:
     @parent_mri_uid.setter
     def parent_mri_uid(self, uid: str) -> None:
         self._parent_mri_uid = uid
+        self._unsaved_changes = True
 
     @property
     def report_task(self) -> ReportingType:
@@ -180,8 +189,10 @@ class ReportingStructure:
             ctype = get_type_from_string(ReportingType, rep_type)
             if ctype != -1:
                 self._report_task = ctype
+                self._unsaved_changes = True
         elif isinstance(rep_type, ReportingType):
             self._report_task = rep_type
+            self._unsaved_changes = True
 
     def __init_from_scratch(self):
         report_filename_csv = self._report_filename[:-5] + ".csv"
@@ -215,6 +226,8 @@ class ReportingStructure:
 
         """
         try:
+            self._unsaved_changes = False
+
             # Parameters-filling operations
             report_params = {}
             report_params['unique_id'] = self._unique_id
@@ -231,7 +244,7 @@ class ReportingStructure:
             report_params['report_filename'] = os.path.relpath(self._report_filename, base_patient_folder)
             if self._report_filename_csv:
                 report_params['report_filename_csv'] = os.path.relpath(self._report_filename_csv, base_patient_folder)
-            self._unsaved_changes = False
             return report_params
         except Exception as e:
+            self._unsaved_changes = True
             logging.error("ReportingStructure saving failed with: {}".format(e))
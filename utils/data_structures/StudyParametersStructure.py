@@ -6,12 +6,16 @@ import shutil
 import datetime
 import dateutil
 import json
+import threading
 import traceback
 from copy import deepcopy
 import nibabel as nib
 import pandas as pd
 from typing import Union, Any, Tuple, List
 
+from utils.data_structures.StudyRunJournalStructure import StudyRunJournal
+from utils.utilities import get_compact_volume_data
+
 
 class StudyParameters:
     """
@@ -33,6 +37,9 @@ class StudyParameters:
     _reporting_statistics_filename = None  # Overall file on disk to save all reporting statistics
     _display_name = ""  # Human-readable name for the study
     _unsaved_changes = False  # Documenting any change, for suggesting saving when exiting the software
+    _statistics_lock = None  # Lock protecting the statistics tables, filled concurrently during batch processing
+    _run_journal = None  # Record of the batch runs over the study patients, for resuming interrupted runs
+    _save_lock = None  # Lock preventing concurrent saves, as the study can be saved in the background
 
     def __init__(self, uid: str = "-1", dest_location: str = None, study_filename: str = None) -> None:
         """
@@ -72,6 +79,9 @@ class StudyParameters:
         self._reporting_statistics_filename = None
         self._display_name = ""
         self._unsaved_changes = False
+        self._statistics_lock = threading.RLock()
+        self._run_journal = None
+        self._save_lock = threading.RLock()
 
     def __init_json_config(self):
         """
@@ -176,6 +186,16 @@ class StudyParameters:
     def get_total_included_patients(self) -> int:
         return len(self._included_patients_uids.keys())
 
+    def get_run_journal(self) -> StudyRunJournal:
+        """
+        Access to the journal of batch runs, stored next to the study file. The journal is reloaded if the study
+        folder has been moved in the meantime (e.g., after a renaming).
+        """
+        journal_filename = os.path.join(self._output_study_folder, 'run_journal.json')
+        if self._run_journal is None or self._run_journal.journal_filename != journal_filename:
+            self._run_journal = StudyRunJournal(journal_filename=journal_filename)
+        return self._run_journal
+
     @property
     def segmentation_statistics_df(self) -> pd.DataFrame:
         return self._segmentation_statistics_df
@@ -214,6 +234,8 @@ class StudyParameters:
         else:
             del self._included_patients_uids[uid]
             self._unsaved_changes = True
+            if os.path.exists(self.get_run_journal().journal_filename):
+                self.get_run_journal().remove_patient(uid)
             # @TODO. Removing a patient from the study should also remove its statistics from the Dataframes
             return 1
 
@@ -272,40 +294,54 @@ class StudyParameters:
         return error_message
 
     def save(self) -> None:
-        os.makedirs(self._output_study_folder, exist_ok=True)
-
-        # Disk operations
-        if self._segmentation_statistics_df is not None:
-            self._segmentation_statistics_filename = os.path.join(self._output_study_folder,
-                                                                  "segmentation_statistics.csv")
-            self._segmentation_statistics_df.to_csv(self._segmentation_statistics_filename, index=False)
-
-        if self._reporting_statistics_df is not None:
-            self._reporting_statistics_filename = os.path.join(self._output_study_folder,
-                                                                  "reporting_statistics.csv")
-            self._reporting_statistics_df.to_csv(self._reporting_statistics_filename, index=False)
-
-        # Saving the study-specific parameters.
-        self._last_editing_timestamp = datetime.datetime.now(tz=dateutil.tz.gettz(name='Europe/Oslo'))
-        self._study_parameters_filename = os.path.join(self._output_study_folder,
-                                                       self._display_name.strip().lower().replace(" ", "_") + '_study.sraidionics')
-        self._study_parameters['Default']['unique_id'] = self._unique_id
-        self._study_parameters['Default']['display_name'] = self._display_name
-        self._study_parameters['Default']['creation_timestamp'] = self._creation_timestamp.strftime("%d/%m/%Y, %H:%M:%S")
-        self._study_parameters['Default']['last_editing_timestamp'] = self._last_editing_timestamp.strftime("%d/%m/%Y, %H:%M:%S")
-        if self._segmentation_statistics_filename and os.path.exists(self._segmentation_statistics_filename):
-            self._study_parameters['Statistics']["annotations_filename"] = os.path.relpath(self._segmentation_statistics_filename,
-                                                                                           self._output_study_folder)
-        if self._reporting_statistics_filename and os.path.exists(self._reporting_statistics_filename):
-            self._study_parameters['Statistics']["reportings_filename"] = os.path.relpath(self._reporting_statistics_filename,
-                                                                                          self._output_study_folder)
-        self._study_parameters['Study']['Patients']['listing'] = self._included_patients_uids
-
-        # Saving the json file last, as it must be populated from the previous dumps beforehand
-        with open(self._study_parameters_filename, 'w') as outfile:
-            json.dump(self._study_parameters, outfile, indent=4, sort_keys=True)
-        logging.info("Saving study parameters in: {}".format(self._study_parameters_filename))
-        self._unsaved_changes = False
+        """
+        Dumps the study statistics and parameters on disk. The study can be saved in the background while being
+        modified, hence concurrent saves are performed one after the other, and the parameters file is first written
+        in a temporary file which then replaces the previous one.
+        """
+        with self._save_lock:
+            # Cleared beforehand, such that modifications performed while saving are kept for the next save
+            self._unsaved_changes = False
+            try:
+                os.makedirs(self._output_study_folder, exist_ok=True)
+
+                # Disk operations
+                with self._statistics_lock:
+                    if self._segmentation_statistics_df is not None:
+                        self._segmentation_statistics_filename = os.path.join(self._output_study_folder,
+                                                                              "segmentation_statistics.csv")
+                        self._segmentation_statistics_df.to_csv(self._segmentation_statistics_filename, index=False)
+
+                    if self._reporting_statistics_df is not None:
+                        self._reporting_statistics_filename = os.path.join(self._output_study_folder,
+                                                                              "reporting_statistics.csv")
+                        self._reporting_statistics_df.to_csv(self._reporting_statistics_filename, index=False)
+
+                # Saving the study-specific parameters.
+                self._last_editing_timestamp = datetime.datetime.now(tz=dateutil.tz.gettz(name='Europe/Oslo'))
+                self._study_parameters_filename = os.path.join(self._output_study_folder,
+                                                               self._display_name.strip().lower().replace(" ", "_") + '_study.sraidionics')
+                self._study_parameters['Default']['unique_id'] = self._unique_id
+                self._study_parameters['Default']['display_name'] = self._display_name
+                self._study_parameters['Default']['creation_timestamp'] = self._creation_timestamp.strftime("%d/%m/%Y, %H:%M:%S")
+                self._study_parameters['Default']['last_editing_timestamp'] = self._last_editing_timestamp.strftime("%d/%m/%Y, %H:%M:%S")
+                if self._segmentation_statistics_filename and os.path.exists(self._segmentation_statistics_filename):
+                    self._study_parameters['Statistics']["annotations_filename"] = os.path.relpath(self._segmentation_statistics_filename,
+                                                                                                   self._output_study_folder)
+                if self._reporting_statistics_filename and os.path.exists(self._reporting_statistics_filename):
+                    self._study_parameters['Statistics']["reportings_filename"] = os.path.relpath(self._reporting_statistics_filename,
+                                                                                                  self._output_study_folder)
+                self._study_parameters['Study']['Patients']['listing'] = self._included_patients_uids
+
+                # Saving the json file last, as it must be populated from the previous dumps beforehand
+                tmp_filename = self._study_parameters_filename + '.tmp'
+                with open(tmp_filename, 'w') as outfile:
+                    json.dump(self._study_parameters, outfile, indent=4, sort_keys=True)
+                os.replace(tmp_filename, self._study_parameters_filename)
+                logging.info("Saving study parameters in: {}".format(self._study_parameters_filename))
+            except Exception:
+                self._unsaved_changes = True
+                raise
 
     def __init_from_scratch(self, dest_location: str) -> None:
         self._display_name = self._unique_id
@@ -320,26 +356,45 @@ class StudyParameters:
         self.__init_json_config()
         self._segmentation_statistics_df = pd.DataFrame(data=None, columns=self._seg_stats_cnames)
 
-    def include_segmentation_statistics(self, patient_uid: str, annotation_uids: List[str], patient_parameters) -> None:
+    def has_patient_statistics(self, patient_uid: str) -> bool:
         """
+        Checks whether any segmentation or reporting statistics have already been included for the given patient.
+        """
+        with self._statistics_lock:
+            for df in [self._segmentation_statistics_df, self._reporting_statistics_df]:
+                if df is not None and len(df[df['Patient uid'] == patient_uid]) != 0:
+                    return True
+        return False
 
+    def include_segmentation_statistics(self, patient_uid: str, annotation_uids: List[str], patient_parameters) -> None:
+        """
+        Computes the volume of each annotation and appends the results to the segmentation statistics table.
+        The statistics are computed outside the lock, such that patients processed concurrently in batch mode only
+        serialize when merging their rows into the table.
         """
         if len(annotation_uids) == 0:
             # Including statistics from scratch
             annotation_uids = patient_parameters.get_all_annotation_volumes_uids()
 
+        rows_df = []
         for anno in annotation_uids:
             anno_object = patient_parameters.get_annotation_by_uid(anno)
             volume_nib = nib.load(anno_object.raw_input_filepath)
-            anno_volume = np.count_nonzero(volume_nib.get_fdata()[:]) * np.prod(volume_nib.header.get_zooms()) * 1e-3
+            anno_volume = np.count_nonzero(get_compact_volume_data(volume_nib, labels=True)) * \
+                          np.prod(volume_nib.header.get_zooms()) * 1e-3
             row_values = [patient_uid, patient_parameters.display_name, anno_object.timestamp_folder_name,
                           patient_parameters.get_mri_by_uid(anno_object.get_parent_mri_uid()).get_sequence_type_str(),
                           anno_object.get_generation_type_str(), anno_object.get_annotation_class_str(),
                           np.round(anno_volume, 3)]
             row_df = pd.DataFrame(data=np.array(row_values).reshape(1, len(self._seg_stats_cnames)),
                                   columns=self._seg_stats_cnames)
+            rows_df.append(row_df)
+
+        if len(rows_df) == 0:
+            return
+        with self._statistics_lock:
             # @TODO. Check that a similar row does not already exist?
-            self._segmentation_statistics_df = pd.concat([self._segmentation_statistics_df, pd.DataFrame(row_df)],
+            self._segmentation_statistics_df = pd.concat([self._segmentation_statistics_df] + rows_df,
                                                       ignore_index=True)
 
     def include_reporting_statistics(self, patient_uid: str, reporting_uids: List[str], patient_parameters) -> None:
@@ -354,17 +409,18 @@ class StudyParameters:
         for rep in reporting_uids:
             if patient_parameters.get_reporting(rep).get_report_task_str() == "Tumor characteristics":
                 rep_df = pd.read_csv(patient_parameters.get_reporting(rep).report_filename_csv)
-                if not self._reporting_stats_cnames:
-                    self._reporting_stats_cnames = ["Patient uid", "Patient", "Timestamp"] + list(rep_df.columns.values)
-                    self._reporting_statistics_df = pd.DataFrame(data=None,  columns=self._reporting_stats_cnames)
-
-                row_values = [patient_uid, patient_parameters.display_name,
-                              patient_parameters.get_reporting(rep).timestamp_folder_name] + list(rep_df.values[0])
-                row_df = pd.DataFrame(data=np.array(row_values).reshape(1, len(self._reporting_stats_cnames)),
-                                      columns=self._reporting_stats_cnames)
-                # @TODO. Check that a similar row does not already exist?
-                self._reporting_statistics_df  = pd.concat([self._reporting_statistics_df , pd.DataFrame(row_df)],
-                                                           ignore_index=True)
+                with self._statistics_lock:
+                    if not self._reporting_stats_cnames:
+                        self._reporting_stats_cnames = ["Patient uid", "Patient", "Timestamp"] + list(rep_df.columns.values)
+                        self._reporting_statistics_df = pd.DataFrame(data=None,  columns=self._reporting_stats_cnames)
+
+                    row_values = [patient_uid, patient_parameters.display_name,
+                                  patient_parameters.get_reporting(rep).timestamp_folder_name] + list(rep_df.values[0])
+                    row_df = pd.DataFrame(data=np.array(row_values).reshape(1, len(self._reporting_stats_cnames)),
+                                          columns=self._reporting_stats_cnames)
+                    # @TODO. Check that a similar row does not already exist?
+                    self._reporting_statistics_df  = pd.concat([self._reporting_statistics_df , pd.DataFrame(row_df)],
+                                                               ignore_index=True)
 
     def refresh_patient_statistics(self, patient_uid: str, patient_parameters):
         """
@@ -379,11 +435,12 @@ class StudyParameters:
         patient_parameters:
             Internal parameters for the patient to refresh.
         """
-        if self._segmentation_statistics_df is not None and len(self._segmentation_statistics_df[self._segmentation_statistics_df['Patient uid'] == patient_uid]) != 0:
-            self._segmentation_statistics_df = self._segmentation_statistics_df[self._segmentation_statistics_df['Patient uid'] != patient_uid]
-        if self._reporting_statistics_df is not None and len(self._reporting_statistics_df[self._reporting_statistics_df['Patient uid'] == patient_uid]) != 0:
-            self._reporting_statistics_df = self._reporting_statistics_df[self._reporting_statistics_df['Patient uid'] != patient_uid]
-
-        if patient_parameters:
-            self.include_segmentation_statistics(patient_uid, [], patient_parameters)
-            self.include_reporting_statistics(patient_uid, [], patient_parameters)
+        with self._statistics_lock:
+            if self._segmentation_statistics_df is not None and len(self._segmentation_statistics_df[self._segmentation_statistics_df['Patient uid'] == patient_uid]) != 0:
+                self._segmentation_statistics_df = self._segmentation_statistics_df[self._segmentation_statistics_df['Patient uid'] != patient_uid]
+            if self._reporting_statistics_df is not None and len(self._reporting_statistics_df[self._reporting_statistics_df['Patient uid'] == patient_uid]) != 0:
+                self._reporting_statistics_df = self._reporting_statistics_df[self._reporting_statistics_df['Patient uid'] != patient_uid]
+
+            if patient_parameters:
+                self.include_segmentation_statistics(patient_uid, [], patient_parameters)
+                self.include_reporting_statistics(patient_uid, [], patient_parameters)
@@ -0,0 +1,193 @@
+import datetime
+import dateutil
+import json
+import logging
+import os
+import threading
+import traceback
+
+from utils.data_structures.AnnotationStructure import AnnotationGenerationType
+from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
+from utils.logic.PipelineResultsCache import PipelineResultsCache
+from utils.utilities import compute_file_hash, compute_dict_hash
+
+
+def compute_patient_inputs_hash(patient_parameters) -> str:
+    """
+    Computes a digest of all patient elements used as inputs by the backend, i.e. the content of each MRI volume
+    together with its sequence type and timestamp order, and the content of the manual annotations when the user
+    opted for reusing them. The results produced by a previous run (e.g., automatic annotations) are not included,
+    such that the digest is identical before and after processing a patient.
+
+    Parameters
+    ----------
+    patient_parameters: PatientParameters
+        Internal patient parameters structure.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the patient inputs.
+    """
+    inputs = {}
+    use_manual_annotations = UserPreferencesStructure.getInstance().use_manual_annotations
+    for im in sorted(patient_parameters.get_all_mri_volumes_uids()):
+        volume = patient_parameters.get_mri_by_uid(im)
+        inputs[im] = {'content': compute_file_hash(volume.usable_input_filepath),
+                      'sequence': volume.get_sequence_type_str(),
+                      'timestamp': patient_parameters.get_timestamp_by_uid(volume.timestamp_uid).order}
+    if use_manual_annotations:
+        for anno_uid in sorted(patient_parameters.get_all_annotation_volumes_uids()):
+            anno = patient_parameters.get_annotation_by_uid(anno_uid)
+            if anno.get_generation_type_enum() == AnnotationGenerationType.Manual:
+                inputs[anno_uid] = {'content': compute_file_hash(anno.usable_input_filepath),
+                                    'class': anno.get_annotation_class_str(),
+                                    'parent': anno.get_parent_mri_uid()}
+    return compute_dict_hash(inputs)
+
+
+class StudyRunJournal:
+    """
+    Persistent record of the batch runs performed over the patients of a study, stored as json next to the study file
+    (*.sraidionics), for resuming an interrupted batch without reprocessing the patients already done.
+    Each run is identified by its definition (i.e., task, tumor type, generated pipeline, state of the models, and the
+    runtime preferences impacting the results), and holds for each patient the processing status, the digest of its inputs, and the collected results.
+    The journal is written to disk after every status update, using an atomic replacement of the file.
+    """
+    _journal_filename = ""  # Location on disk of the journal, next to the study file
+    _runs = {}  # Runs definition and patients status, by run unique key
+    _lock = None  # Lock protecting the journal, updated concurrently during batch processing
+
+    def __init__(self, journal_filename: str) -> None:
+        self.__reset()
+        self._journal_filename = journal_filename
+        if os.path.exists(self._journal_filename):
+            self.__reload_from_disk()
+
+    def __reset(self):
+        """
+        All objects share class or static variables.
+        An instance or non-static variables are different for different objects (every object has a copy).
+        """
+        self._journal_filename = ""
+        self._runs = {}
+        self._lock = threading.RLock()
+
+    def __reload_from_disk(self) -> None:
+        try:
+            with open(self._journal_filename, 'r') as infile:
+                self._runs = json.load(infile)['Runs']
+        except Exception:
+            # A corrupted journal only means that all patients will be processed again.
+            logging.warning("Study run journal could not be read from {}, starting from scratch.\n{}".format(
+                self._journal_filename, traceback.format_exc()))
+            self._runs = {}
+
+    @property
+    def journal_filename(self) -> str:
+        return self._journal_filename
+
+    def start_run(self, task: str, tumor_type: str, pipeline: dict, models_folder: str = None) -> str:
+        """
+        Registers a new run with the given definition, or returns the already existing run with the same definition.
+        The generated pipeline and the state of its models are part of the definition, such that patients processed
+        before a model update are processed again.
+
+        Parameters
+        ----------
+        task: str
+            Tag describing the pipeline process.
+        tumor_type: str
+            Name of the segmentation model to use.
+        pipeline: dict
+            Pipeline to execute, as generated by create_pipeline.
+        models_folder: str
+            Folder where the models are stored on disk.
+
+        Returns
+        -------
+        str
+            Unique key of the run inside the journal.
+        """
+        definition = {'task': task, 'tumor_type': tumor_type, 'pipeline': pipeline,
+                      'models': PipelineResultsCache.compute_models_fingerprint(pipeline, models_folder)
+                      if models_folder else {},
+                      'options': UserPreferencesStructure.getInstance().get_pipeline_runtime_options()}
+        run_key = compute_dict_hash(definition)
+        with self._lock:
+            if run_key not in self._runs.keys():
+                self._runs[run_key] = {'definition': definition, 'Patients': {}}
+            self._runs[run_key]['last_start_timestamp'] = datetime.datetime.now(
+                tz=dateutil.tz.gettz(name='Europe/Oslo')).strftime("%d/%m/%Y, %H:%M:%S")
+            self.save()
+        return run_key
+
+    def is_patient_completed(self, run_key: str, patient_uid: str, inputs_hash: str) -> bool:
+        """
+        Checks whether the patient was already successfully processed in the given run, with identical inputs.
+        """
+        with self._lock:
+            if run_key not in self._runs.keys() or patient_uid not in self._runs[run_key]['Patients'].keys():
+                return False
+            patient_record = self._runs[run_key]['Patients'][patient_uid]
+            return patient_record['status'] == 'completed' and patient_record['inputs_hash'] == inputs_hash
+
+    def get_patient_results(self, run_key: str, patient_uid: str) -> dict:
+        with self._lock:
+            if run_key not in self._runs.keys() or patient_uid not in self._runs[run_key]['Patients'].keys():
+                return {}
+            return self._runs[run_key]['Patients'][patient_uid]['results']
+
+    def set_patient_status(self, run_key: str, patient_uid: str, status: str, inputs_hash: str = None,
+                           results: dict = None, error_message: str = None) -> None:
+        """
+        Updates the record for the given patient in the given run, and saves the journal on disk.
+
+        Parameters
+        ----------
+        run_key: str
+            Unique key of the run, as returned by start_run.
+        patient_uid: str
+            Internal unique identifier for the patient.
+        status: str
+            Processing status, to select from ["running", "completed", "failed"].
+        inputs_hash: str
+            Digest of the patient inputs, as computed by compute_patient_inputs_hash.
+        results: dict
+            Unique ids of the objects created during the processing, by category, as returned by run_pipeline.
+        error_message: str
+            Description of the failure, if any.
+        """
+        with self._lock:
+            record = self._runs[run_key]['Patients'].get(patient_uid, {'inputs_hash': None, 'results': {}})
+            record['status'] = status
+            if inputs_hash is not None:
+                record['inputs_hash'] = inputs_hash
+            if results is not None:
+                record['results'] = results
+            record['error'] = error_message
+            record['timestamp'] = datetime.datetime.now(tz=dateutil.tz.gettz(name='Europe/Oslo')).strftime(
+                "%d/%m/%Y, %H:%M:%S")
+            self._runs[run_key]['Patients'][patient_uid] = record
+            self.save()
+
+    def remove_patient(self, patient_uid: str) -> None:
+        """
+        Discards all records for the given patient, e.g. when removed from the study.
+        """
+        with self._lock:
+            for r in self._runs.keys():
+                self._runs[r]['Patients'].pop(patient_uid, None)
+            self.save()
+
+    def save(self) -> None:
+        """
+        Dumps the journal on disk, first in a temporary file which then replaces the previous journal, such that an
+        interruption while writing never leaves a truncated journal behind.
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self._journal_filename), exist_ok=True)
+            tmp_filename = self._journal_filename + '.tmp'
+            with open(tmp_filename, 'w') as outfile:
+                json.dump({'Runs': self._runs}, outfile, indent=4, sort_keys=True)
+            os.replace(tmp_filename, self._journal_filename)
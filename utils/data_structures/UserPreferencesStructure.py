@@ -24,6 +24,8 @@ class UserPreferencesStructure:
     _use_registered_inputs = False  # True to use inputs already registered (e.g., altas-registered, multi-sequences co-registered)
     _export_results_as_rtstruct = False  # True to export all masks as DICOM RTStruct in addition
     _display_space = 'Patient'  # Space to use for displaying the results
+    _memory_mapped_volumes = True  # True to store the resampled volumes uncompressed (.npy) for memory-mapped reloading, False for compressed nifti
+    _resampling_threads = 0  # Number of threads used for resampling the imported volumes, 0 for automatic
     _segmentation_runtime_tta = False  # Boolean to indicate if test-time augmentation should be performed
     _segmentation_runtime_tta_iterations = 1  # Number of additional iterations with test-time augmentation
     _segmentation_runtime_tta_strategy = "average"  # Strategy to fuse the test-time augmentation predictions, to select from ["average", "maximum"]
@@ -38,6 +40,13 @@ class UserPreferencesStructure:
     _subcortical_structures_list = ["BCB", "BrainGrid"]  # List of subcortical atlases to include
     _compute_braingrid_structures = False  # True to include braingrid features computation in the standardized reporting
     _braingrid_structures_list = ["Voxels"]  # List of BrainGrid features to include
+    _backend_workers_number = 1  # Number of backend processes kept alive for running the pipelines concurrently
+    _backend_max_tasks_per_worker = 10  # Number of pipelines after which a backend process is recycled, 0 for never
+    _backend_max_memory_per_worker = 8192  # Memory ceiling (in MB) after which a backend process is recycled, 0 for none
+    _backend_threads_per_model = 4  # Estimated number of CPU threads used by one model inference, for sizing the batch mode
+    _batch_concurrent_patients = 0  # Number of patients processed concurrently in batch mode, 0 for automatic
+    _batch_memory_budget = 0  # Memory budget (in MB) of the software in batch mode, 0 for no limit
+    _results_cache_size = 5120  # Maximum size (in MB) of the local cache of backend results, 0 to disable the cache
     _use_dark_mode = False  # True for dark mode and False for regular mode
     _disable_modal_warnings = False  # True to disable opening QDialogs with error or warning messages (for integration tests)
 
@@ -77,6 +86,8 @@ class UserPreferencesStructure:
         self.use_registered_inputs = False
         self.export_results_as_rtstruct = False
         self.display_space = 'Patient'
+        self.memory_mapped_volumes = True
+        self.resampling_threads = 0
         self.segmentation_runtime_tta = False
         self.segmentation_runtime_tta_iterations = 1
         self.segmentation_runtime_tta_strategy = "average"
@@ -91,6 +102,13 @@ class UserPreferencesStructure:
         self.subcortical_structures_list = ["BCB", "BrainGrid"]
         self.compute_braingrid_structures = False
         self.braingrid_structures_list = ["Voxels"]
+        self.backend_workers_number = 1
+        self.backend_max_tasks_per_worker = 10
+        self.backend_max_memory_per_worker = 8192
+        self.backend_threads_per_model = 4
+        self.batch_concurrent_patients = 0
+        self.batch_memory_budget = 0
+        self.results_cache_size = 5120
         self.use_dark_mode = False
         self.disable_modal_warnings = False
         self.save_preferences()
@@ -197,6 +215,39 @@ class UserPreferencesStructure:
         self._display_space = space
         self.save_preferences()
 
+    @property
+    def memory_mapped_volumes(self) -> bool:
+        return self._memory_mapped_volumes
+
+    @memory_mapped_volumes.setter
+    def memory_mapped_volumes(self, state: bool) -> None:
+        self._memory_mapped_volumes = state
+        self.save_preferences()
+
+    @property
+    def resampling_threads(self) -> int:
+        return self._resampling_threads
+
+    @resampling_threads.setter
+    def resampling_threads(self, number: int) -> None:
+        logging.info("Number of threads for resampling volumes set to {}.\n".format(number))
+        self._resampling_threads = number
+        self.save_preferences()
+
+    def get_resampling_threads(self) -> int:
+        """
+        Number of threads to use for resampling a volume. When left to automatic (i.e., 0), all available CPU cores
+        are used.
+
+        Returns
+        -------
+        int
+            Number of threads, at least 1.
+        """
+        if self._resampling_threads > 0:
+            return self._resampling_threads
+        return max(1, os.cpu_count() or 1)
+
     @property
     def segmentation_runtime_tta(self) -> bool:
         return self._segmentation_runtime_tta
@@ -323,6 +374,91 @@ class UserPreferencesStructure:
         self._braingrid_structures_list = structures
         self.save_preferences()
 
+    @property
+    def backend_workers_number(self) -> int:
+        return self._backend_workers_number
+
+    @backend_workers_number.setter
+    def backend_workers_number(self, number: int) -> None:
+        logging.info("Number of backend workers set to {}.\n".format(number))
+        self._backend_workers_number = number
+        self.save_preferences()
+
+    @property
+    def backend_max_tasks_per_worker(self) -> int:
+        return self._backend_max_tasks_per_worker
+
+    @backend_max_tasks_per_worker.setter
+    def backend_max_tasks_per_worker(self, number: int) -> None:
+        self._backend_max_tasks_per_worker = number
+        self.save_preferences()
+
+    @property
+    def backend_max_memory_per_worker(self) -> int:
+        return self._backend_max_memory_per_worker
+
+    @backend_max_memory_per_worker.setter
+    def backend_max_memory_per_worker(self, value: int) -> None:
+        self._backend_max_memory_per_worker = value
+        self.save_preferences()
+
+    @property
+    def backend_threads_per_model(self) -> int:
+        return self._backend_threads_per_model
+
+    @backend_threads_per_model.setter
+    def backend_threads_per_model(self, number: int) -> None:
+        self._backend_threads_per_model = number
+        self.save_preferences()
+
+    @property
+    def batch_concurrent_patients(self) -> int:
+        return self._batch_concurrent_patients
+
+    @batch_concurrent_patients.setter
+    def batch_concurrent_patients(self, number: int) -> None:
+        logging.info("Number of concurrent patients in batch mode set to {}.\n".format(number))
+        self._batch_concurrent_patients = number
+        self.save_preferences()
+
+    @property
+    def batch_memory_budget(self) -> int:
+        return self._batch_memory_budget
+
+    @batch_memory_budget.setter
+    def batch_memory_budget(self, value: int) -> None:
+        """
+        Above the budget, no new patient is started in batch mode until the patients being processed are released
+        from memory.
+        """
+        logging.info("Memory budget in batch mode set to {} MB.\n".format(value))
+        self._batch_memory_budget = value
+        self.save_preferences()
+
+    @property
+    def results_cache_size(self) -> int:
+        return self._results_cache_size
+
+    @results_cache_size.setter
+    def results_cache_size(self, value: int) -> None:
+        logging.info("Results cache size set to {} MB.\n".format(value))
+        self._results_cache_size = value
+        self.save_preferences()
+
+    def get_batch_concurrent_patients(self) -> int:
+        """
+        Number of patients to process concurrently in batch mode. When left to automatic (i.e., 0), the number of
+        available CPU cores is divided by the number of threads used by one model inference.
+
+        Returns
+        -------
+        int
+            Number of concurrent patients, at least 1.
+        """
+        if self._batch_concurrent_patients > 0:
+            return self._batch_concurrent_patients
+        return max(1, (os.cpu_count() or 1) // max(1, self._backend_threads_per_model))
+
     @property
     def disable_modal_warnings(self) -> bool:
         return self._disable_modal_warnings
@@ -333,6 +469,34 @@ class UserPreferencesStructure:
         self._disable_modal_warnings = state
         self.save_preferences()
 
+    def get_pipeline_runtime_options(self) -> dict:
+        """
+        Gathers all preferences which are impacting the content of the pipeline results, for identifying whether a
+        previous execution is still valid (e.g., for resuming a study batch run).
+
+        Returns
+        -------
+        dict
+            The relevant preferences, by name.
+        """
+        options = {}
+        options['use_manual_sequences'] = self.use_manual_sequences
+        options['use_manual_annotations'] = self.use_manual_annotations
+        options['use_stripped_inputs'] = self.use_stripped_inputs
+        options['use_registered_inputs'] = self.use_registered_inputs
+        options['segmentation_runtime_tta'] = self.segmentation_runtime_tta
+        options['segmentation_runtime_tta_iterations'] = self.segmentation_runtime_tta_iterations
+        options['segmentation_runtime_tta_strategy'] = self.segmentation_runtime_tta_strategy
+        options['segmentation_runtime_ensembling'] = self.segmentation_runtime_ensembling
+        options['segmentation_runtime_ensembling_strategy'] = self.segmentation_runtime_ensembling_strategy
+        options['perform_segmentation_refinement'] = self.perform_segmentation_refinement
+        options['segmentation_refinement_type'] = self.segmentation_refinement_type
+        options['segmentation_refinement_dilation_percentage'] = self.segmentation_refinement_dilation_percentage
+        options['cortical_structures'] = self.cortical_structures_list if self.compute_cortical_structures else []
+        options['subcortical_structures'] = self.subcortical_structures_list if self.compute_subcortical_structures else []
+        options['braingrid_structures'] = self.braingrid_structures_list if self.compute_braingrid_structures else []
+        return options
+
     def __parse_preferences(self) -> None:
         """
         Loads the saved user preferences from disk (located in raidionics_preferences.json) and updates all internal
@@ -348,6 +512,10 @@ class UserPreferencesStructure:
         if 'Display' in preferences.keys():
             if 'display_space' in preferences['Display'].keys():
                 self.display_space = preferences['Display']['display_space']
+            if 'memory_mapped_volumes' in preferences['Display'].keys():
+                self.memory_mapped_volumes = preferences['Display']['memory_mapped_volumes']
+            if 'resampling_threads' in preferences['Display'].keys():
+                self.resampling_threads = preferences['Display']['resampling_threads']
         if 'Processing' in preferences.keys():
             if 'use_manual_sequences' in preferences['Processing'].keys():
                 self.use_manual_sequences = preferences['Processing']['use_manual_sequences']
@@ -390,6 +558,21 @@ class UserPreferencesStructure:
                     self.compute_braingrid_structures = preferences['Processing']['Reporting']['compute_braingrid_structures']
                 if 'braingrid_structures_list' in preferences['Processing']['Reporting'].keys():
                     self.braingrid_structures_list = preferences['Processing']['Reporting']['braingrid_structures_list']
+            if 'Backend' in preferences['Processing'].keys():
+                if 'workers_number' in preferences['Processing']['Backend'].keys():
+                    self.backend_workers_number = preferences['Processing']['Backend']['workers_number']
+                if 'max_tasks_per_worker' in preferences['Processing']['Backend'].keys():
+                    self.backend_max_tasks_per_worker = preferences['Processing']['Backend']['max_tasks_per_worker']
+                if 'max_memory_per_worker' in preferences['Processing']['Backend'].keys():
+                    self.backend_max_memory_per_worker = preferences['Processing']['Backend']['max_memory_per_worker']
+                if 'threads_per_model' in preferences['Processing']['Backend'].keys():
+                    self.backend_threads_per_model = preferences['Processing']['Backend']['threads_per_model']
+                if 'batch_concurrent_patients' in preferences['Processing']['Backend'].keys():
+                    self.batch_concurrent_patients = preferences['Processing']['Backend']['batch_concurrent_patients']
+                if 'batch_memory_budget' in preferences['Processing']['Backend'].keys():
+                    self.batch_memory_budget = preferences['Processing']['Backend']['batch_memory_budget']
+                if 'results_cache_size' in preferences['Processing']['Backend'].keys():
+                    self.results_cache_size = preferences['Processing']['Backend']['results_cache_size']
         if 'Appearance' in preferences.keys():
             if 'dark_mode' in preferences['Appearance'].keys():
                 self.use_dark_mode = preferences['Appearance']['dark_mode']
@@ -407,6 +590,8 @@ class UserPreferencesStructure:
         preferences['Models']['active_update'] = self._active_model_update
         preferences['Display'] = {}
         preferences['Display']['display_space'] = self.display_space
+        preferences['Display']['memory_mapped_volumes'] = self.memory_mapped_volumes
+        preferences['Display']['resampling_threads'] = self.resampling_threads
         preferences['Processing'] = {}
         preferences['Processing']['use_manual_sequences'] = self.use_manual_sequences
         preferences['Processing']['use_manual_annotations'] = self.use_manual_annotations
@@ -430,6 +615,14 @@ class UserPreferencesStructure:
         preferences['Processing']['Reporting']['subcortical_structures_list'] = self.subcortical_structures_list
         preferences['Processing']['Reporting']['compute_braingrid_structures'] = self.compute_braingrid_structures
         preferences['Processing']['Reporting']['braingrid_structures_list'] = self.braingrid_structures_list
+        preferences['Processing']['Backend'] = {}
+        preferences['Processing']['Backend']['workers_number'] = self.backend_workers_number
+        preferences['Processing']['Backend']['max_tasks_per_worker'] = self.backend_max_tasks_per_worker
+        preferences['Processing']['Backend']['max_memory_per_worker'] = self.backend_max_memory_per_worker
+        preferences['Processing']['Backend']['threads_per_model'] = self.backend_threads_per_model
+        preferences['Processing']['Backend']['batch_concurrent_patients'] = self.batch_concurrent_patients
+        preferences['Processing']['Backend']['batch_memory_budget'] = self.batch_memory_budget
+        preferences['Processing']['Backend']['results_cache_size'] = self.results_cache_size
         preferences['Appearance'] = {}
         preferences['Appearance']['dark_mode'] = self.use_dark_mode
         preferences['Appearance']['disable_modal_warnings'] = self.disable_modal_warnings
@@ -0,0 +1,319 @@
+import collections
+import logging
+import os
+import sys
+import threading
+import traceback
+import multiprocessing as mp
+from multiprocessing.connection import Connection, wait
+from typing import Tuple, Union
+
+
+def get_process_memory_usage() -> Union[None, float]:
+    """
+    Current resident memory (in MB) used by the calling process, as measured by psutil, or read from /proc on Linux
+    if psutil is not available.
+
+    Returns
+    -------
+    float
+        Resident memory in MB, or None if it cannot be measured on the current platform.
+    """
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024. * 1024.)
+    except ImportError:
+        pass
+
+    try:
+        with open('/proc/self/statm', 'r') as infile:
+            resident_pages = int(infile.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024. * 1024.)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def get_peak_memory_usage() -> Union[None, float]:
+    """
+    Peak resident memory (in MB) used by the calling process since it started, which never decreases.
+
+    Returns
+    -------
+    float
+        Peak resident memory in MB, or None if it cannot be measured on the current platform.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Expressed in kilobytes on Linux, but in bytes on macOS.
+        if sys.platform == 'darwin':
+            return peak / (1024. * 1024.)
+        return peak / 1024.
+    except (ImportError, AttributeError):
+        return None
+
+
+def backend_worker_loop(task_connection: Connection, result_connection: Connection, max_tasks: int,
+                        max_memory: int) -> None:
+    """
+    Main loop for a backend worker process. The RADS backend (and with it TensorFlow/ONNX) is imported only once, and
+    stays resident in the process until the worker is recycled.
+    Every message sent back to the supervisor is a tuple (task id, code, error message, recycling state).
+
+    Parameters
+    ----------
+    task_connection: Connection
+        Pipe end specific to the worker, each item being (task_id, (rads_config_filename, log_filename)), or None to
+        stop.
+    result_connection: Connection
+        Pipe end specific to the worker, to notify the supervisor about finished tasks.
+    max_tasks: int
+        Number of tasks after which the worker exits, to contain the memory leaks inside the backend. 0 for unlimited.
+    max_memory: int
+        Resident memory ceiling in MB after which the worker exits. 0 for unlimited.
+    """
+    run_rads = None
+    performed_tasks = 0
+    while True:
+        try:
+            task = task_connection.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        task_id, params = task
+        code = 0
+        error_message = None
+        try:
+            if run_rads is None:
+                from raidionicsrads.compute import run_rads
+            run_rads(params[0], params[1])
+        except Exception:
+            code = 1
+            error_message = traceback.format_exc()
+
+        performed_tasks = performed_tasks + 1
+        memory_usage = get_process_memory_usage()
+        if memory_usage is None:
+            # Conservative estimate, the worker being recycled as soon as its peak memory exceeds the ceiling
+            memory_usage = get_peak_memory_usage()
+        recycling = (max_tasks > 0 and performed_tasks >= max_tasks) or \
+                    (max_memory > 0 and memory_usage is not None and memory_usage > max_memory)
+        result_connection.send((task_id, code, error_message, recycling))
+        if recycling:
+            break
+
+
+class BackendWorkerPool:
+    """
+    Supervised pool of long-lived processes running the RADS backend.
+    Rather than spawning a fresh process (and reimporting the backend and its deep learning libraries) for every
+    pipeline execution, the workers are kept alive between calls and are only recycled after a given number of tasks,
+    or when their resident memory exceeds a given ceiling (to contain the known memory leaks inside TensorFlow).
+    A worker dying unexpectedly is replaced, and the task it was running is reported as failed.
+    Each worker communicates through its own pipes, such that a crashing worker cannot corrupt or lock the others.
+    """
+    _workers_number = 1  # Number of backend processes running concurrently
+    _max_tasks_per_worker = 0  # Number of tasks after which a worker process is recycled, 0 for never
+    _max_memory_per_worker = 0  # Resident memory ceiling (in MB) after which a worker process is recycled, 0 for none
+
+    def __init__(self, workers_number: int = 1, max_tasks_per_worker: int = 0, max_memory_per_worker: int = 0) -> None:
+        self._workers_number = max(1, workers_number)
+        self._max_tasks_per_worker = max_tasks_per_worker
+        self._max_memory_per_worker = max_memory_per_worker
+        self._context = mp.get_context('spawn')
+        self._workers = []  # Process, pipe ends, and task id being processed (or None if idle), for each worker
+        self._waiting_tasks = collections.deque()  # Tasks submitted but not yet dispatched to a worker
+        self._pending_tasks = {}  # Event and (code, error message) placeholder, by task id
+        self._task_counter = 0
+        self._lock = threading.Lock()
+        self._supervisor_thread = None
+        self._is_running = False
+
+    @property
+    def workers_number(self) -> int:
+        return self._workers_number
+
+    def is_running(self) -> bool:
+        return self._is_running
+
+    def start(self) -> None:
+        """
+        Spawns all worker processes and the supervisor thread. Nothing happens if the pool is already running.
+        """
+        with self._lock:
+            if self._is_running:
+                return
+            self._is_running = True
+            for _ in range(self._workers_number):
+                self.__spawn_worker()
+        self._supervisor_thread = threading.Thread(target=self.__supervise, daemon=True)
+        self._supervisor_thread.start()
+        logging.info("Backend worker pool started with {} worker(s).".format(self._workers_number))
+
+    def add_workers(self, workers_number: int) -> None:
+        """
+        Grows the pool up to workers_number processes, without interrupting the tasks being processed. Nothing happens
+        if the pool already has as many workers.
+        """
+        with self._lock:
+            if workers_number <= self._workers_number:
+                return
+            added = workers_number - self._workers_number
+            self._workers_number = workers_number
+            if not self._is_running:
+                return
+            for _ in range(added):
+                self.__spawn_worker()
+            self.__dispatch()
+        logging.info("Backend worker pool grown to {} worker(s).".format(workers_number))
+
+    def stop(self, timeout: float = 10.) -> None:
+        """
+        Stops all worker processes, waiting for the running tasks to finish for up to timeout seconds per worker,
+        after which the processes are terminated. All tasks not completed are reported as failed.
+        """
+        with self._lock:
+            if not self._is_running:
+                return
+            self._is_running = False
+            workers = self._workers
+            self._workers = []
+        self._supervisor_thread.join()
+        for w in workers:
+            try:
+                w['tasks'].send(None)
+            except OSError:
+                pass
+        for w in workers:
+            w['process'].join(timeout)
+            if w['process'].is_alive():
+                w['process'].terminate()
+                w['process'].join()
+            w['tasks'].close()
+            w['results'].close()
+        with self._lock:
+            self._waiting_tasks.clear()
+            for task_id in list(self._pending_tasks.keys()):
+                self.__resolve_task(task_id, 1, "Backend worker pool stopped before the task completion.")
+        logging.info("Backend worker pool stopped.")
+
+    def run(self, rads_config_filename: str, log_filename: str) -> Tuple[int, Union[None, str]]:
+        """
+        Submits a RADS backend execution to the pool and blocks until its completion. Can be called concurrently from
+        multiple threads, in which case up to workers_number executions run in parallel.
+
+        Parameters
+        ----------
+        rads_config_filename: str
+            Runtime configuration filename for the backend.
+        log_filename: str
+            Log filename shared between the software and the backend.
+
+        Returns
+        -------
+        Tuple[int, Union[None, str]]
+            Execution code (0 for success, 1 for failure), and the backend traceback in case of failure.
+        """
+        if not self._is_running:
+            self.start()
+
+        done = threading.Event()
+        with self._lock:
+            self._task_counter = self._task_counter + 1
+            task_id = self._task_counter
+            self._pending_tasks[task_id] = [done, (1, None)]
+            self._waiting_tasks.append((task_id, (rads_config_filename, log_filename)))
+            self.__dispatch()
+        done.wait()
+        with self._lock:
+            code, error_message = self._pending_tasks.pop(task_id)[1]
+        return code, error_message
+
+    def __spawn_worker(self) -> None:
+        """
+        Must be called while holding the lock.
+        """
+        task_reader, task_writer = self._context.Pipe(duplex=False)
+        result_reader, result_writer = self._context.Pipe(duplex=False)
+        worker = self._context.Process(target=backend_worker_loop, args=(task_reader, result_writer,
+                                                                         self._max_tasks_per_worker,
+                                                                         self._max_memory_per_worker), daemon=True)
+        worker.start()
+        # The ends used by the worker are not needed anymore in the current process
+        task_reader.close()
+        result_writer.close()
+        self._workers.append({'process': worker, 'tasks': task_writer, 'results': result_reader, 'task': None})
+        logging.debug("Backend worker spawned with pid {}.".format(worker.pid))
+
+    def __retire_worker(self, worker: dict) -> None:
+        """
+        Must be called while holding the lock.
+        """
+        self._workers.remove(worker)
+        worker['process'].join()
+        worker['tasks'].close()
+        worker['results'].close()
+
+    def __dispatch(self) -> None:
+        """
+        Hands over the waiting tasks to the idle workers, in submission order. Must be called while holding the lock.
+        """
+        for w in self._workers:
+            if len(self._waiting_tasks) == 0:
+                break
+            if w['task'] is None and w['process'].is_alive():
+                task = self._waiting_tasks.popleft()
+                w['task'] = task[0]
+                try:
+                    w['tasks'].send(task)
+                except OSError:
+                    # The worker died in the meantime, the task will be reported as failed by the supervisor.
+                    pass
+
+    def __resolve_task(self, task_id: int, code: int, error_message: Union[None, str]) -> None:
+        """
+        Must be called while holding the lock.
+        """
+        if task_id in self._pending_tasks.keys():
+            self._pending_tasks[task_id][1] = (code, error_message)
+            self._pending_tasks[task_id][0].set()
+
+    def __supervise(self) -> None:
+        """
+        Collects the messages from the workers, dispatches the results to the waiting callers, and replaces the
+        workers which have been recycled or have died unexpectedly.
+        """
+        while self._is_running:
+            with self._lock:
+                handles = [w['results'] for w in self._workers] + [w['process'].sentinel for w in self._workers]
+            wait(handles, timeout=0.5)
+
+            with self._lock:
+                if not self._is_running:
+                    break
+                for w in list(self._workers):
+                    message = None
+                    try:
+                        if w['results'].poll():
+                            message = w['results'].recv()
+                    except (EOFError, OSError):
+                        message = None
+
+                    if message is not None:
+                        task_id, code, error_message, recycling = message
+                        w['task'] = None
+                        self.__resolve_task(task_id, code, error_message)
+                        if recycling:
+                            self.__retire_worker(w)
+                            logging.debug("Backend worker with pid {} recycled.".format(w['process'].pid))
+                            self.__spawn_worker()
+                    elif not w['process'].is_alive():
+                        self.__retire_worker(w)
+                        logging.error("[Software error] Backend worker with pid {} died unexpectedly.".format(
+                            w['process'].pid))
+                        if w['task'] is not None:
+                            self.__resolve_task(w['task'], 1, "Backend worker died unexpectedly.")
+                        self.__spawn_worker()
+                self.__dispatch()
@@ -0,0 +1,95 @@
+import logging
+import threading
+from typing import Union
+
+from utils.logic.BackendWorkerPool import get_process_memory_usage
+
+
+class BatchMemoryMonitor:
+    """
+    Keeps the memory used by the software below a budget while processing the patients of a study in batch mode.
+    A patient can only start processing when the resident memory of the software is below the budget, otherwise it
+    waits until one of the patients currently processed is done (and released from memory). At least one patient is
+    always allowed to run, such that the batch progresses even with an undersized budget.
+    The budget is compared against the current resident memory, which decreases when patients are released. When it
+    cannot be measured on the platform, the budget is disabled rather than enforced against an estimate.
+    The high-water mark of the resident memory over the batch is recorded for reporting purposes.
+    """
+    _budget = 0  # Memory budget in MB, 0 for no limit
+    _running = 0  # Number of patients currently being processed
+    _current_usage = None  # Last measured resident memory in MB, None if it cannot be measured on the platform
+    _high_water_mark = None  # Highest resident memory in MB measured since the beginning of the batch
+    _budget_disabled = False  # Indication that the budget cannot be enforced, the memory being unmeasurable
+    _condition = None  # Condition protecting the aforementioned attributes, notified when a patient is done
+
+    def __init__(self, budget: int = 0) -> None:
+        self.__reset()
+        self._budget = budget
+
+    def __reset(self):
+        """
+        All objects share class or static variables.
+        An instance or non-static variables are different for different objects (every object has a copy).
+        """
+        self._budget = 0
+        self._running = 0
+        self._current_usage = None
+        self._high_water_mark = None
+        self._budget_disabled = False
+        self._condition = threading.Condition(threading.RLock())
+
+    @property
+    def budget(self) -> int:
+        return self._budget
+
+    @property
+    def current_usage(self) -> Union[None, float]:
+        return self._current_usage
+
+    @property
+    def high_water_mark(self) -> Union[None, float]:
+        return self._high_water_mark
+
+    def sample(self) -> Union[None, float]:
+        """
+        Measures the resident memory of the software, and updates the high-water mark accordingly.
+
+        Returns
+        -------
+        float
+            Resident memory in MB, or None if it cannot be measured on the current platform.
+        """
+        usage = get_process_memory_usage()
+        with self._condition:
+            self._current_usage = usage
+            if usage is not None and (self._high_water_mark is None or usage > self._high_water_mark):
+                self._high_water_mark = usage
+        return usage
+
+    def acquire(self) -> None:
+        """
+        Blocks until a new patient can be processed within the memory budget, and registers it as running.
+        """
+        with self._condition:
+            while self._budget > 0 and not self._budget_disabled and self._running > 0:
+                usage = self.sample()
+                if usage is None:
+                    self._budget_disabled = True
+                    logging.warning("The memory used by the software cannot be measured on this platform, the batch "
+                                    "memory budget of {} MB is disabled.".format(self._budget))
+                    break
+                if usage < self._budget:
+                    break
+                logging.debug("Batch memory usage of {:.0f} MB above the {} MB budget, waiting for a patient to be "
+                              "released.".format(usage, self._budget))
+                self._condition.wait(timeout=5.)
+            self._running = self._running + 1
+
+    def release(self) -> None:
+        """
+        Registers that a patient is done processing (and released from memory), allowing a waiting patient to start.
+        """
+        self.sample()
+        with self._condition:
+            self._running = max(0, self._running - 1)
+            self._condition.notify_all()
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import traceback
+from typing import List, Tuple, Union
+
+
+class DICOMIndex:
+    """
+    Local index of the DICOM folders already scanned, for browsing again the same archives without reading the files.
+    The index is a SQLite database mapping each file (path, modification time, and size) to the series it belongs to,
+    and each series to its patient/study/series unique identifiers, its ordered list of files, and the tags read from
+    its header (as used by DICOMSeries).
+    The folders are the indexing unit, as the series are identified and sorted by GDCM over a whole folder: a folder
+    is only scanned again when one of its files has been added, removed, or modified. The folders which no longer
+    exist on disk are dropped from the index when opening it, such that it does not grow without bound.
+    """
+    _index_filename = ""  # Location on disk of the SQLite database
+    _connection = None  # Connection to the database, shared between the scanning threads
+    _lock = None  # Lock protecting the connection, accessed concurrently while scanning
+
+    def __init__(self, index_filename: str) -> None:
+        self.__reset()
+        self._index_filename = index_filename
+        os.makedirs(os.path.dirname(self._index_filename), exist_ok=True)
+        self.__open()
+        self.prune()
+
+    def __reset(self):
+        """
+        All objects share class or static variables.
+        An instance or non-static variables are different for different objects (every object has a copy).
+        """
+        self._index_filename = ""
+        self._connection = None
+        self._lock = threading.RLock()
+
+    @property
+    def index_filename(self) -> str:
+        return self._index_filename
+
+    def __open(self) -> None:
+        """
+        Opens the database, creating the tables if needed. A corrupted database is discarded, as it only means that
+        the folders will be scanned again.
+        """
+        try:
+            self._connection = sqlite3.connect(self._index_filename, check_same_thread=False)
+            self.__create_tables()
+        except sqlite3.DatabaseError:
+            logging.warning("DICOM index could not be read from {}, starting from scratch.\n{}".format(
+                self._index_filename, traceback.format_exc()))
+            if self._connection is not None:
+                self._connection.close()
+            os.remove(self._index_filename)
+            self._connection = sqlite3.connect(self._index_filename, check_same_thread=False)
+            self.__create_tables()
+
+    def __create_tables(self) -> None:
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, folder TEXT NOT NULL, "
+                                     "mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, series_uid TEXT)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS files_folder ON files (folder)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS series (folder TEXT NOT NULL, position INTEGER NOT NULL, "
+                                     "patient_uid TEXT, study_uid TEXT, series_uid TEXT, filenames TEXT NOT NULL, "
+                                     "tags TEXT NOT NULL, PRIMARY KEY (folder, position))")
+
+    @staticmethod
+    def __list_folder_files(folder: str) -> dict:
+        """
+        Modification time and size of all files directly inside the folder, by filepath.
+        """
+        files = {}
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def get_folder_series(self, folder: str) -> Union[None, List[Tuple[List[str], dict]]]:
+        """
+        Retrieves the series stored inside the folder, if the folder content is unchanged since it was indexed.
+
+        Parameters
+        ----------
+        folder: str
+            Folder directly containing the DICOM files.
+
+        Returns
+        -------
+        List[Tuple[List[str], dict]]
+            Ordered filenames and header tags for each series in the folder, or None if the folder was never indexed
+            or has changed since.
+        """
+        folder = os.path.normpath(folder)
+        current_files = self.__list_folder_files(folder)
+        with self._lock:
+            indexed_files = {r[0]: (r[1], r[2]) for r in self._connection.execute(
+                "SELECT path, mtime_ns, size FROM files WHERE folder = ?", (folder,))}
+            if len(indexed_files) == 0 or indexed_files != current_files:
+                return None
+            rows = self._connection.execute("SELECT filenames, tags FROM series WHERE folder = ? ORDER BY position",
+                                            (folder,)).fetchall()
+        return [(json.loads(r[0]), json.loads(r[1])) for r in rows]
+
+    def update_folder(self, folder: str, series: list) -> None:
+        """
+        Replaces the index content for the folder with the series which have just been scanned.
+
+        Parameters
+        ----------
+        folder: str
+            Folder directly containing the DICOM files.
+        series: List[DICOMSeries]
+            All the series found inside the folder.
+        """
+        folder = os.path.normpath(folder)
+        try:
+            current_files = self.__list_folder_files(folder)
+            series_by_file = {}
+            for s in series:
+                for f in s.sitk_reader.GetFileNames():
+                    series_by_file[os.path.normpath(f)] = s.series_id
+            with self._lock, self._connection:
+                self._connection.execute("DELETE FROM files WHERE folder = ?", (folder,))
+                self._connection.execute("DELETE FROM series WHERE folder = ?", (folder,))
+                self._connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                                             [(f, folder, current_files[f][0], current_files[f][1],
+                                               series_by_file.get(f, None)) for f in current_files.keys()])
+                self._connection.executemany("INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                             [(folder, i, s.get_patient_id(), s.get_metadata_value('0020|000d'),
+                                               s.series_id, json.dumps(list(s.sitk_reader.GetFileNames())),
+                                               json.dumps(s.dicom_tags)) for i, s in enumerate(series)])
+        except Exception:
+            logging.warning("DICOM index could not be updated for {}.\n{}".format(folder, traceback.format_exc()))
+
+    def prune(self) -> int:
+        """
+        Removes from the index all folders which no longer exist on disk (e.g., deleted or unmounted archives).
+
+        Returns
+        -------
+        int
+            Number of folders removed from the index.
+        """
+        try:
+            with self._lock:
+                folders = [r[0] for r in self._connection.execute("SELECT DISTINCT folder FROM files UNION "
+                                                                  "SELECT DISTINCT folder FROM series")]
+                removed_folders = [(f,) for f in folders if not os.path.isdir(f)]
+                if len(removed_folders) != 0:
+                    with self._connection:
+                        self._connection.executemany("DELETE FROM files WHERE folder = ?", removed_folders)
+                        self._connection.executemany("DELETE FROM series WHERE folder = ?", removed_folders)
+                    self._connection.execute("VACUUM")
+            if len(removed_folders) != 0:
+                logging.info("Removed {} missing folders from the DICOM index.".format(len(removed_folders)))
+            return len(removed_folders)
+        except Exception:
+            logging.warning("DICOM index could not be pruned.\n{}".format(traceback.format_exc()))
+            return 0
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM files")
+            self._connection.execute("DELETE FROM series")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
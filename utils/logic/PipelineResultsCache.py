@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import traceback
+
+from utils.utilities import compute_file_hash, compute_dict_hash
+
+
+class PipelineResultsCache:
+    """
+    Local content-addressed cache of the backend outputs, for skipping the backend execution when the exact same
+    inputs have already been processed with the same pipeline and runtime options.
+    Each entry is a copy of the backend output folder (i.e., the patient 'reporting' folder before the results are
+    collected), stored under the digest of the backend inputs. The total size is bounded, the least recently used
+    entries being evicted first.
+    """
+    _cache_folder = ""  # Root location on disk for all cache entries
+    _max_size = 0  # Maximum total size of the cache in MB, 0 to disable the cache
+    _index = {}  # Size (in bytes) and last access time for each entry, by key
+    _lock = None  # Lock protecting the cache, accessed concurrently during batch processing
+
+    def __init__(self, cache_folder: str, max_size: int) -> None:
+        self.__reset()
+        self._cache_folder = cache_folder
+        self._max_size = max_size
+        os.makedirs(self._cache_folder, exist_ok=True)
+        self.__reload_index()
+
+    def __reset(self):
+        """
+        All objects share class or static variables.
+        An instance or non-static variables are different for different objects (every object has a copy).
+        """
+        self._cache_folder = ""
+        self._max_size = 0
+        self._index = {}
+        self._lock = threading.RLock()
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value: int) -> None:
+        with self._lock:
+            self._max_size = value
+            self.__evict()
+
+    def is_enabled(self) -> bool:
+        return self._max_size > 0
+
+    def __index_filename(self) -> str:
+        return os.path.join(self._cache_folder, 'cache_index.json')
+
+    def __reload_index(self) -> None:
+        """
+        Loads the index from disk, dropping the entries without matching folder and the folders without index entry
+        (e.g., after an interruption while storing an entry).
+        """
+        try:
+            if os.path.exists(self.__index_filename()):
+                with open(self.__index_filename(), 'r') as infile:
+                    self._index = json.load(infile)
+        except Exception:
+            logging.warning("Results cache index could not be read, starting from scratch.\n{}".format(
+                traceback.format_exc()))
+            self._index = {}
+
+        for key in list(self._index.keys()):
+            if not os.path.isdir(os.path.join(self._cache_folder, key)):
+                del self._index[key]
+        for entry in os.listdir(self._cache_folder):
+            if os.path.isdir(os.path.join(self._cache_folder, entry)) and entry not in self._index.keys():
+                shutil.rmtree(os.path.join(self._cache_folder, entry), ignore_errors=True)
+
+    def __save_index(self) -> None:
+        tmp_filename = self.__index_filename() + '.tmp'
+        with open(tmp_filename, 'w') as outfile:
+            json.dump(self._index, outfile, indent=4, sort_keys=True)
+        os.replace(tmp_filename, self.__index_filename())
+
+    def __evict(self) -> None:
+        """
+        Removes the least recently used entries until the total size fits inside the maximum size.
+        Must be called while holding the lock.
+        """
+        total_size = sum([self._index[k]['size'] for k in self._index.keys()])
+        for key in sorted(self._index.keys(), key=lambda k: self._index[k]['last_access']):
+            if total_size <= self._max_size * 1024 * 1024:
+                break
+            total_size = total_size - self._index[key]['size']
+            shutil.rmtree(os.path.join(self._cache_folder, key), ignore_errors=True)
+            del self._index[key]
+            logging.debug("Results cache entry {} evicted.".format(key))
+        self.__save_index()
+
+    @staticmethod
+    def compute_key(input_folder: str, pipeline: dict, runtime_options: dict, models_folder: str = None) -> str:
+        """
+        Computes the cache key for a backend execution, from the content and layout of its input folder, the
+        pipeline to execute, and the runtime options. When provided, the state of the models used in the pipeline is
+        also taken into account, such that updated models invalidate the previous results.
+
+        Parameters
+        ----------
+        input_folder: str
+            Folder containing all the inputs given to the backend (i.e., the surrogate folder).
+        pipeline: dict
+            Pipeline to execute, as generated by create_pipeline.
+        runtime_options: dict
+            Options impacting the results, as given by UserPreferencesStructure.get_pipeline_runtime_options.
+        models_folder: str
+            Folder where the models are stored on disk.
+
+        Returns
+        -------
+        str
+            Hexadecimal digest identifying the execution.
+        """
+        inputs = {}
+        for root, _, files in os.walk(input_folder):
+            for f in files:
+                inputs[os.path.relpath(os.path.join(root, f), input_folder)] = compute_file_hash(os.path.join(root, f))
+        models = PipelineResultsCache.compute_models_fingerprint(pipeline, models_folder) if models_folder else {}
+        return compute_dict_hash({'inputs': inputs, 'pipeline': pipeline, 'options': runtime_options,
+                                  'models': models})
+
+    @staticmethod
+    def compute_models_fingerprint(pipeline: dict, models_folder: str) -> dict:
+        """
+        Identifies the state on disk of each model used in the pipeline, from the relative path, size, and
+        modification time of every file inside the model folder. Updating a model rewrites its files, while the
+        modification time of the model folder itself only changes when files are added or removed.
+
+        Parameters
+        ----------
+        pipeline: dict
+            Pipeline to execute, as generated by create_pipeline.
+        models_folder: str
+            Folder where the models are stored on disk.
+
+        Returns
+        -------
+        dict
+            Hexadecimal digest of the model files, or None for a missing model, by model name.
+        """
+        models = {}
+        for step in pipeline.keys():
+            if "model" not in pipeline[step].keys():
+                continue
+            model_folder = os.path.join(models_folder, pipeline[step]["model"])
+            if not os.path.isdir(model_folder):
+                models[pipeline[step]["model"]] = None
+                continue
+            files = []
+            for root, _, filenames in os.walk(model_folder):
+                for f in filenames:
+                    stat = os.stat(os.path.join(root, f))
+                    files.append([os.path.relpath(os.path.join(root, f), model_folder).replace(os.sep, '/'),
+                                  stat.st_size, stat.st_mtime_ns])
+            models[pipeline[step]["model"]] = compute_dict_hash({'files': sorted(files)})
+        return models
+
+    def retrieve(self, key: str, destination_folder: str) -> bool:
+        """
+        Copies the content of the cache entry inside the destination folder, if the entry exists.
+
+        Returns
+        -------
+        bool
+            True if the entry was found and restored, False otherwise.
+        """
+        if not self.is_enabled():
+            return False
+        with self._lock:
+            if key not in self._index.keys():
+                return False
+            try:
+                shutil.copytree(os.path.join(self._cache_folder, key), destination_folder, dirs_exist_ok=True)
+                self._index[key]['last_access'] = time.time()
+                self.__save_index()
+            except Exception:
+                logging.warning("Results cache entry {} could not be restored.\n{}".format(key, traceback.format_exc()))
+                return False
+        logging.info("Backend results restored from cache entry {}.".format(key))
+        return True
+
+    def store(self, key: str, source_folder: str) -> None:
+        """
+        Copies the content of the source folder as a new cache entry, and evicts the least recently used entries if
+        the maximum size is exceeded. Entries larger than the maximum size are not stored.
+        """
+        if not self.is_enabled():
+            return
+        with self._lock:
+            if key in self._index.keys():
+                return
+            entry_folder = os.path.join(self._cache_folder, key)
+            tmp_folder = entry_folder + '_tmp'
+            try:
+                if os.path.exists(tmp_folder):
+                    shutil.rmtree(tmp_folder)
+                shutil.copytree(source_folder, tmp_folder)
+                size = 0
+                for root, _, files in os.walk(tmp_folder):
+                    size = size + sum([os.path.getsize(os.path.join(root, f)) for f in files])
+                if size > self._max_size * 1024 * 1024:
+                    shutil.rmtree(tmp_folder)
+                    return
+                os.replace(tmp_folder, entry_folder)
+                self._index[key] = {'size': size, 'last_access': time.time()}
+                self.__evict()
+            except Exception:
+                logging.warning("Backend results could not be stored in cache.\n{}".format(traceback.format_exc()))
+                shutil.rmtree(tmp_folder, ignore_errors=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._index.keys()):
+                shutil.rmtree(os.path.join(self._cache_folder, key), ignore_errors=True)
+            self._index = {}
+            self.__save_index()
+
+    def get_size(self) -> int:
+        """
+        Total size of the cache entries, in bytes.
+        """
+        with self._lock:
+            return sum([self._index[k]['size'] for k in self._index.keys()])
@@ -0,0 +1,122 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Tuple
+
+import numpy as np
+
+
+class ResamplingGridCache:
+    """
+    In-memory cache of the sampling maps used when resampling label volumes to the output space, shared by all the
+    annotations and atlases resting on the same voxel grid (e.g., the multiple labels produced by a pipeline for one
+    MRI series).
+    A sampling map holds, for each output voxel, the flat index of the nearest input voxel together with the mask of
+    the output voxels falling outside of the input volume. It is identified by the input affine, shape, and memory
+    layout (the flat indices differing between C and Fortran orders), and the least recently used maps are evicted
+    first as they can be as large as the output volume.
+    """
+    __instance = None
+    _max_entries = 2  # Maximum number of sampling maps kept in memory
+    _maps = None  # Sampling maps by (affine, shape, layout) key, from the least to the most recently used
+    _pending = None  # Event and result placeholder for the maps being computed, by (affine, shape, layout) key
+    _lock = None  # Lock protecting the cache, as volumes can be loaded concurrently
+
+    @staticmethod
+    def getInstance():
+        """ Static access method. """
+        if ResamplingGridCache.__instance == None:
+            ResamplingGridCache()
+        return ResamplingGridCache.__instance
+
+    def __init__(self):
+        """ Virtually private constructor. """
+        if ResamplingGridCache.__instance != None:
+            raise Exception("This class is a singleton!")
+        else:
+            ResamplingGridCache.__instance = self
+            self.__reset()
+
+    def __reset(self):
+        """
+        All objects share class or static variables.
+        An instance or non-static variables are different for different objects (every object has a copy).
+        """
+        self._max_entries = 2
+        self._maps = OrderedDict()
+        self._pending = {}
+        self._lock = threading.RLock()
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    @max_entries.setter
+    def max_entries(self, value: int) -> None:
+        with self._lock:
+            self._max_entries = value
+            self.__evict()
+
+    def get_sampling_map(self, affine: np.ndarray, shape: Tuple[int, ...], layout: str,
+                         compute_function: Callable[[], Tuple[np.ndarray, np.ndarray]]) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the sampling map for the given input grid, computed with compute_function upon the first request. The
+        computation is performed outside of the lock, such that maps for different grids are computed concurrently,
+        while labels loaded concurrently on the same grid wait for a single computation instead of each performing
+        their own.
+
+        Parameters
+        ----------
+        affine: np.ndarray
+            Voxel to world affine of the input volume.
+        shape: Tuple[int, ...]
+            Shape of the input volume.
+        layout: str
+            Memory layout of the input volume, either 'C' or 'F'.
+        compute_function: Callable[[], Tuple[np.ndarray, np.ndarray]]
+            Function computing the sampling map when missing from the cache.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            The flat input indices and the outside mask, to be used read-only.
+        """
+        key = (np.asarray(affine, dtype=np.float64).tobytes(), tuple([int(s) for s in shape]), layout)
+        with self._lock:
+            if key in self._maps:
+                self._maps.move_to_end(key)
+                return self._maps[key]
+            computing = key not in self._pending
+            if computing:
+                self._pending[key] = [threading.Event(), None]
+            pending = self._pending[key]
+
+        if not computing:
+            pending[0].wait()
+            if pending[1] is None:
+                # The computation failed in the other thread, performing it again to raise the error here as well
+                return self.get_sampling_map(affine, shape, layout, compute_function)
+            return pending[1]
+
+        try:
+            sampling_map = compute_function()
+            pending[1] = sampling_map
+            with self._lock:
+                if self._max_entries > 0:
+                    self._maps[key] = sampling_map
+                    self.__evict()
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending[0].set()
+        return sampling_map
+
+    def clear(self) -> None:
+        with self._lock:
+            self._maps.clear()
+
+    def __evict(self) -> None:
+        while len(self._maps) > max(0, self._max_entries):
+            self._maps.popitem(last=False)
+            logging.debug("Evicted the least recently used resampling map from the cache.")
@@ -0,0 +1,152 @@
+import collections
+import logging
+import threading
+import traceback
+from typing import Callable, Union
+
+
+class SaveQueue:
+    """
+    Background writer for the patients and studies, such that saving on disk never freezes the interface.
+    The save requests are processed one at a time by a single thread, in the order they were issued. A request for an
+    element (e.g., a patient) which is already waiting in the queue is coalesced with the pending one, and a request
+    issued while the element is being saved is queued again, such that the modifications performed in the meantime are
+    stored by a subsequent save without having to wait for the current one.
+    """
+    _pending = None  # Save functions waiting to be processed, by element key, in order of request
+    _descriptions = None  # Human-readable description of each pending element, for progress reporting
+    _in_flight = None  # Key of the element currently being saved, None when idle
+    _condition = None  # Condition protecting the aforementioned attributes, notified on every state change
+    _thread = None  # Writer thread, started upon the first request
+    _stopping = False  # Indication that the writer thread should exit once the queue is empty
+    _progress_callback = None  # Function(description, state, remaining) called when a save starts or ends
+
+    def __init__(self, progress_callback: Callable[[str, str, int], None] = None) -> None:
+        self.__reset()
+        self._progress_callback = progress_callback
+
+    def __reset(self):
+        """
+        All objects share class or static variables.
+        An instance or non-static variables are different for different objects (every object has a copy).
+        """
+        self._pending = collections.OrderedDict()
+        self._descriptions = {}
+        self._in_flight = None
+        self._condition = threading.Condition(threading.RLock())
+        self._thread = None
+        self._stopping = False
+        self._progress_callback = None
+
+    @property
+    def progress_callback(self) -> Callable[[str, str, int], None]:
+        return self._progress_callback
+
+    @progress_callback.setter
+    def progress_callback(self, callback: Callable[[str, str, int], None]) -> None:
+        """
+        The callback is called from the writer thread with the description of the element, the state of the save
+        (i.e., started, finished, or failed), and the number of saves remaining including the current one if started.
+        """
+        self._progress_callback = callback
+
+    def get_remaining_saves(self) -> int:
+        with self._condition:
+            return len(self._pending) + (1 if self._in_flight is not None else 0)
+
+    def request_save(self, key: str, save_function: Callable[[], Union[None, bool]], description: str = None) -> None:
+        """
+        Queues a save operation, returning immediately.
+
+        Parameters
+        ----------
+        key: str
+            Unique identifier of the element to save (e.g., the patient unique id), used for coalescing the requests.
+        save_function: Callable
+            Function performing the save, executed in the writer thread. The save is reported as failed if the
+            function raises an exception or returns False.
+        description: str
+            Human-readable name of the element, for progress reporting.
+        """
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError("The save queue has been stopped, no further save can be requested.")
+            self._pending[key] = save_function
+            self._descriptions[key] = description if description else key
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.__run, name='SaveQueue', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, key: str = None, timeout: float = None) -> bool:
+        """
+        Waits until all requested saves, or all saves for the given element, have been performed.
+
+        Parameters
+        ----------
+        key: str
+            Unique identifier of the element to wait for, or None for waiting until the queue is empty.
+        timeout: float
+            Maximum waiting time in seconds, None for waiting indefinitely.
+
+        Returns
+        -------
+        bool
+            True if the saves have been performed, False if the timeout expired beforehand.
+        """
+        with self._condition:
+            if key is None:
+                return self._condition.wait_for(lambda: len(self._pending) == 0 and self._in_flight is None,
+                                                timeout=timeout)
+            return self._condition.wait_for(lambda: key not in self._pending and self._in_flight != key,
+                                            timeout=timeout)
+
+    def stop(self, timeout: float = None) -> bool:
+        """
+        Performs all remaining saves, then stops the writer thread. Must be called before exiting the software.
+
+        Returns
+        -------
+        bool
+            True if all saves have been performed, False if the timeout expired beforehand.
+        """
+        flushed = self.flush(timeout=timeout)
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        return flushed
+
+    def __run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._pending) != 0 or self._stopping)
+                if len(self._pending) == 0:
+                    break
+                key, save_function = self._pending.popitem(last=False)
+                description = self._descriptions.pop(key)
+                self._in_flight = key
+                remaining = len(self._pending) + 1
+            self.__notify_progress(description, 'started', remaining)
+
+            state = 'finished'
+            try:
+                if save_function() is False:
+                    state = 'failed'
+            except Exception:
+                state = 'failed'
+                logging.error("[Software error] Saving {} on disk failed with: {}".format(description,
+                                                                                         traceback.format_exc()))
+
+            with self._condition:
+                self._in_flight = None
+                remaining = len(self._pending)
+                self._condition.notify_all()
+            self.__notify_progress(description, state, remaining)
+
+    def __notify_progress(self, description: str, state: str, remaining: int) -> None:
+        if self._progress_callback is None:
+            return
+        try:
+            self._progress_callback(description, state, remaining)
+        except Exception:
+            logging.warning("Save progress could not be reported.\n{}".format(traceback.format_exc()))
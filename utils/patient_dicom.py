@@ -2,8 +2,10 @@ import datetime
 import logging
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from copy import deepcopy
 from glob import glob
+from typing import Callable, List, Tuple, Union
 import SimpleITK as sitk
 
 from utils.utilities import folder_eligibility_check
@@ -37,9 +39,27 @@ class PatientDICOM:
         self._gender = ""
         self._birth_date = ""
 
-    def parse_dicom_folder(self) -> None:
+    def parse_dicom_folder(self, progress_callback: Callable[[int, int], None] = None, dicom_index=None) -> None:
         """
         Initial parsing of a DICOM folder to retrieve the metadata and readers, to let the user choose which to import.
+        The folders and series are scanned concurrently, c.f. parse_dicom_folders.
+
+        Parameters
+        ----------
+        progress_callback: Callable[[int, int], None]
+            Optional function called with the number of series scanned so far and the number of series found so far,
+            every time a series has been scanned.
+        dicom_index: DICOMIndex
+            Optional index of the DICOM folders already scanned, to only scan the new or modified folders.
+        """
+        errors = parse_dicom_folders([self], progress_callback=progress_callback, dicom_index=dicom_index)
+        if self.dicom_folder in errors.keys():
+            raise errors[self.dicom_folder]
+
+    def get_series_folders(self) -> List[str]:
+        """
+        Lists all the folders which can directly contain DICOM series files, i.e. the leaf directories of the DICOM
+        tree, or the patient folder itself when it contains no sub-folder.
         """
         patient_base_dicom = os.path.join(self.dicom_folder, 'DICOM')
         if not os.path.exists(patient_base_dicom) or not os.path.isdir(patient_base_dicom):
@@ -47,97 +67,170 @@ class PatientDICOM:
 
         if True not in [os.path.isdir(os.path.join(patient_base_dicom, x)) for x in os.listdir(patient_base_dicom)]:
             logging.warning('No existing DICOM folder in {}.\n Treating folder as a single volume.'.format(patient_base_dicom))
+            return [patient_base_dicom]
+
+        # Careful with glob and separators (windows <=> unix confusions)
+        all_dir = glob(os.path.join(self.dicom_folder, "**/"), recursive=True)
+        # # Alternative solution:
+        # all_dir = glob(os.path.join(self.dicom_folder, "**"), recursive=True)
+        # Might need a wider check on which folders might not be eligible.
+        all_dir = [d for d in all_dir if folder_eligibility_check(d)]
+        return [d for d in all_dir if True not in [os.path.isdir(os.path.join(d, x)) for x in os.listdir(d)]]
+
+    def insert_series(self, dicom_series) -> Union[None, str]:
+        """
+        Adds a scanned DICOM series to its study, and fills the patient info as the series are being inserted.
+
+        Returns
+        -------
+        str
+            Warning message if the series could not be inserted, None otherwise.
+        """
+        log_message = None
+        study_id = dicom_series.get_metadata_value('0020|0010')
+        if study_id is None:
+            raise ValueError("DICOM metadata is missing the study id field [0020|0010]")
+        study_desc = dicom_series.get_metadata_value('0008|1030') if dicom_series.get_metadata_value('0008|1030') is not None else ""
+        study_name = deepcopy(study_id) + '_' + study_desc
+
+        if study_name not in list(self.studies.keys()):
+            self.studies[study_name] = DICOMStudy(study_id)
+            self.studies[study_name].insert_series(dicom_series)
+        # If a folder of DICOM folders is imported, multiple patients are mixed, which cannot be
+        # handled here. The user should select a folder containing data for only one patient.
+        elif dicom_series.get_patient_id() == self.studies[study_name].patient_id:
+            self.studies[study_name].insert_series(dicom_series)
+        else:
+            log_message = "[Software warning] Trying to load a DICOM folder containing data for multiple patients. Please only try importing a single patient's DICOM folder."
+
+        # Filling the patient info as the iteration over the series goes.
+        if self.patient_id is None and dicom_series.get_patient_id() is not None:
+            self.patient_id = dicom_series.get_patient_id()
+        if self.gender == "" and dicom_series.get_patient_gender() is not None:
+            self.gender = dicom_series.get_patient_gender()
+        if self.birth_date == "" and dicom_series.get_patient_birthdate() is not None:
+            self.birth_date = dicom_series.get_patient_birthdate()
+        return log_message
+
+
+def scan_dicom_folder(folder: str, dicom_index=None) -> Tuple[List[str], list]:
+    """
+    Identifiers of all DICOM series stored directly inside the folder. When the folder content is unchanged since it
+    was last indexed, the series are directly recreated from the index without reading any file.
+
+    Returns
+    -------
+    Tuple[List[str], List[DICOMSeries]]
+        GDCM identifiers of the series left to scan, and series retrieved from the index.
+    """
+    if dicom_index is not None:
+        indexed_series = dicom_index.get_folder_series(folder)
+        if indexed_series is not None:
+            return [], [create_dicom_series(filenames, tags) for filenames, tags in indexed_series]
+    return list(sitk.ImageSeriesReader.GetGDCMSeriesIDs(folder)), []
+
+
+def scan_dicom_series(folder: str, series_id: str):
+    """
+    Creates the DICOMSeries for one series stored inside the folder, reading only the header of its first file.
+    """
+    return create_dicom_series(sitk.ImageSeriesReader.GetGDCMSeriesFileNames(folder, series_id))
+
+
+def create_dicom_series(dicom_names: List[str], dicom_tags: dict = None):
+    # One reader per series, as the pixel data are only decoded later on upon import.
+    series_reader = sitk.ImageSeriesReader()
+    series_reader.SetFileNames(dicom_names)
+    series_reader.LoadPrivateTagsOn()
+    series_reader.SetMetaDataDictionaryArrayUpdate(True)
+    return DICOMSeries(series_reader, dicom_tags=dicom_tags)
+
+
+def parse_dicom_folders(dicom_holders: List[PatientDICOM], progress_callback: Callable[[int, int], None] = None,
+                        max_workers: int = None, dicom_index=None) -> dict:
+    """
+    Scans the DICOM folders of multiple patients concurrently. The leaf directories of all patients are first listed
+    in a thread pool, and each series found is then scanned in the same pool. The series are inserted inside their
+    patient structure, from the calling thread, as soon as they have been scanned.
+    A failure for one patient does not prevent the other patients from being scanned.
+
+    Parameters
+    ----------
+    dicom_holders: List[PatientDICOM]
+        Patient structures to fill, one per DICOM folder.
+    progress_callback: Callable[[int, int], None]
+        Optional function called from the calling thread with the number of series scanned so far and the number of
+        series found so far, every time a series has been scanned.
+    max_workers: int
+        Number of threads in the pool, the default from ThreadPoolExecutor if None.
+    dicom_index: DICOMIndex
+        Optional index of the folders already scanned, only the new or modified folders being scanned. The index is
+        updated with the newly scanned folders.
+
+    Returns
+    -------
+    dict
+        Exception (as RuntimeError) raised while scanning, by DICOM folder, for the patients which could not be
+        scanned.
+    """
+    errors = {}
+    log_messages = {}
+    folders_series = {}  # Series scanned so far, in GDCM order, for the folders to index
+    series_found = 0
+    series_scanned = 0
+
+    def insert_series(holder: PatientDICOM, dicom_series: DICOMSeries) -> None:
+        nonlocal series_scanned
+        log_message = holder.insert_series(dicom_series)
+        if log_message is not None:
+            log_messages[holder.dicom_folder] = log_message
+        series_scanned = series_scanned + 1
+        if progress_callback is not None:
+            progress_callback(series_scanned, series_found)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        for holder in dicom_holders:
             try:
-                reader = sitk.ImageSeriesReader()
-                serie_names = reader.GetGDCMSeriesIDs(self.dicom_folder)
-
-                for s, serie in enumerate(serie_names):
-                    dicom_names = reader.GetGDCMSeriesFileNames(patient_base_dicom, serie)
-                    reader.SetFileNames(dicom_names)
-                    reader.LoadPrivateTagsOn()
-                    reader.SetMetaDataDictionaryArrayUpdate(True)
-                    dicom_series = DICOMSeries(reader)
-                    study_id = dicom_series.get_metadata_value('0020|0010')
-                    study_desc = dicom_series.get_metadata_value('0008|1030')
-                    study_name = deepcopy(study_id) + '_' + study_desc
-
-                    if study_name not in list(self.studies.keys()):
-                        self.studies[study_name] = DICOMStudy(study_id)
-                    self.studies[study_name].insert_series(dicom_series)
-
-                    # Filling the patient info as the iteration over the series goes.
-                    if self.patient_id is None and dicom_series.get_patient_id() is not None:
-                        self.patient_id = dicom_series.get_patient_id()
-                    if self.gender == "" and dicom_series.get_patient_gender() is not None:
-                        self.gender = dicom_series.get_patient_gender()
-                    if self.birth_date == "" and dicom_series.get_patient_birthdate() is not None:
-                        self.birth_date = dicom_series.get_patient_birthdate()
-                return
+                for d in holder.get_series_folders():
+                    pending[executor.submit(scan_dicom_folder, d, dicom_index)] = (holder, d, None)
             except Exception as e:
-                error_msg = 'Provided folder does not contain any DICOM folder tree, nor can it be parsed as a' + \
-                'single MRI volume.<br> Loading aborted with: {}.'.format(e)
-                raise RuntimeError(error_msg)
-
-        try:
-            # Careful with glob and separators (windows <=> unix confusions)
-            all_dir = glob(os.path.join(self.dicom_folder, "**/"), recursive=True)
-            # # Alternative solution:
-            # all_dir = glob(os.path.join(self.dicom_folder, "**"), recursive=True)
-            all_dir = [d for d in all_dir if folder_eligibility_check(d)]
-
-            scans_dir = []
-            log_message = None
-            for d in all_dir:
-                # Might need a wider check on which folders might not be eligible.
-
-                if True not in [os.path.isdir(os.path.join(d, x)) for x in os.listdir(d)]:
-                    reader = sitk.ImageSeriesReader()
-                    serie_names = reader.GetGDCMSeriesIDs(d)
-
-                    # dicom_names = reader.GetGDCMSeriesFileNames(current_dicom_investigation_path, useSeriesDetails=True)
-                    # tmp_data = Path(current_dicom_investigation_path)
-                    # tmp_dicom_names = list(tmp_data.glob('*'))
-                    # dicom_names_set = [dicom_names]
-                    # if len(tmp_dicom_names) > len(dicom_names):
-                    #     dicom_names_set = [[str(x) for x in tmp_dicom_names[:len(dicom_names)]],
-                    #                        [str(x) for x in tmp_dicom_names[len(dicom_names):]]]
-                    #     print('Nested images into one DICOM sub-folder......')
-
-                    for s, serie in enumerate(serie_names):
-                        dicom_names = reader.GetGDCMSeriesFileNames(d, serie)
-                        reader.SetFileNames(dicom_names)
-                        reader.LoadPrivateTagsOn()
-                        reader.SetMetaDataDictionaryArrayUpdate(True)
-                        dicom_series = DICOMSeries(reader)
-                        study_id = dicom_series.get_metadata_value('0020|0010')
-                        if study_id is None:
-                            raise ValueError("DICOM metadata is missing the study id field [0020|0010]")
-                        study_desc = dicom_series.get_metadata_value('0008|1030') if dicom_series.get_metadata_value('0008|1030') is not None else ""
-                        study_name = deepcopy(study_id) + '_' + study_desc
-
-                        if study_name not in list(self.studies.keys()):
-                            self.studies[study_name] = DICOMStudy(study_id)
-                            self.studies[study_name].insert_series(dicom_series)
-                        # If a folder of DICOM folders is imported, multiple patients are mixed, which cannot be
-                        # handled here. The user should select a folder containing data for only one patient.
-                        elif dicom_series.get_patient_id() == self.studies[study_name].patient_id:
-                            self.studies[study_name].insert_series(dicom_series)
-                        else:
-                            log_message = "[Software warning] Trying to load a DICOM folder containing data for multiple patients. Please only try importing a single patient's DICOM folder."
-
-                        # Filling the patient info as the iteration over the series goes.
-                        if self.patient_id is None and dicom_series.get_patient_id() is not None:
-                            self.patient_id = dicom_series.get_patient_id()
-                        if self.gender == "" and dicom_series.get_patient_gender() is not None:
-                            self.gender = dicom_series.get_patient_gender()
-                        if self.birth_date == "" and dicom_series.get_patient_birthdate() is not None:
-                            self.birth_date = dicom_series.get_patient_birthdate()
-        except Exception as e:
-            raise RuntimeError("Provided DICOM could not be processed, with: {}".format(e))
-
-        # In order to only print once and for all any non-critical error/warning message obtained during parsing.
-        if log_message is not None:
-            logging.warning(log_message)
+                errors[holder.dicom_folder] = RuntimeError("Provided DICOM could not be processed, with: {}".format(e))
+
+        while len(pending) != 0:
+            done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+            for f in done:
+                holder, folder, position = pending.pop(f)
+                if holder.dicom_folder in errors.keys():
+                    continue
+                try:
+                    if position is not None:
+                        folders_series[folder][position] = f.result()
+                        insert_series(holder, f.result())
+                    else:
+                        series_ids, indexed_series = f.result()
+                        series_found = series_found + len(series_ids) + len(indexed_series)
+                        for dicom_series in indexed_series:
+                            insert_series(holder, dicom_series)
+                        if len(indexed_series) == 0:
+                            folders_series[folder] = [None] * len(series_ids)
+                        for i, serie in enumerate(series_ids):
+                            pending[executor.submit(scan_dicom_series, folder, serie)] = (holder, folder, i)
+                except Exception as e:
+                    errors[holder.dicom_folder] = RuntimeError("Provided DICOM could not be processed, with: {}".format(e))
+                    continue
+
+                # Indexing the folder once all its series have been scanned.
+                if folder in folders_series.keys() and None not in folders_series[folder]:
+                    scanned_series = folders_series.pop(folder)
+                    if dicom_index is not None:
+                        dicom_index.update_folder(folder, scanned_series)
+
+    # In order to only print once and for all any non-critical error/warning message obtained during parsing.
+    for folder in log_messages.keys():
+        logging.warning(log_messages[folder])
+    return errors
+
 
 class DICOMStudy():
     _patient_id = None
@@ -213,17 +306,30 @@ class DICOMStudy():
 
 
 class DICOMSeries():
+    """
+    Metadata for one DICOM series, as displayed while browsing a DICOM folder. Only the header of the first file is
+    read upon creation, the pixel data of the whole series being decoded on first access to the volume (i.e., when
+    the series is actually imported).
+    """
     _series_id = None
     _series_description = None
+    _volume = None
 
-    def __init__(self, sitk_reader):
+    def __init__(self, sitk_reader, dicom_tags: dict = None):
         self.__reset()
         self.sitk_reader = sitk_reader
-        self.volume = sitk_reader.Execute()
         self.dicom_tags = {}
 
-        for k in sitk_reader.GetMetaDataKeys(0):
-            self.dicom_tags[k] = sitk_reader.GetMetaData(0, k).strip()
+        if dicom_tags is not None:
+            # Tags already known, e.g. from the DICOM index.
+            self.dicom_tags = dict(dicom_tags)
+        else:
+            header_reader = sitk.ImageFileReader()
+            header_reader.SetFileName(sitk_reader.GetFileNames()[0])
+            header_reader.LoadPrivateTagsOn()
+            header_reader.ReadImageInformation()
+            for k in header_reader.GetMetaDataKeys():
+                self.dicom_tags[k] = header_reader.GetMetaData(k).strip()
 
         self._series_id = self.get_metadata_value('0020|000e')
         self.series_number = self.get_metadata_value('0020|0011')
@@ -241,8 +347,24 @@ class DICOMSeries():
     def series_description(self) -> str:
         return self._series_description
 
+    @property
+    def volume(self) -> sitk.Image:
+        """
+        Full DICOM series as a SimpleITK image, decoded upon the first call.
+        """
+        if self._volume is None:
+            self._volume = self.sitk_reader.Execute()
+        return self._volume
+
+    def release_volume(self) -> None:
+        """
+        Drops the decoded pixel data, e.g. once the series has been imported, while keeping the metadata.
+        """
+        self._volume = None
+
     def __reset(self):
         self._series_id = None
+        self._volume = None
 
     def get_metadata_value(self, key):
         res = None
@@ -14,6 +14,10 @@ from utils.data_structures.PatientParametersStructure import PatientParameters
 from utils.data_structures.StudyParametersStructure import StudyParameters
 from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
 from utils.data_structures.AnnotationStructure import AnnotationClassType, AnnotationGenerationType
+from utils.logic.BackendWorkerPool import BackendWorkerPool
+from utils.logic.PipelineResultsCache import PipelineResultsCache
+from utils.logic.DICOMIndex import DICOMIndex
+from utils.logic.SaveQueue import SaveQueue
 
 
 class SoftwareConfigResources:
@@ -27,6 +31,10 @@ class SoftwareConfigResources:
     _session_log_filename = None  # log filename containing the runtime logging for each software execution and backend.
     _software_version = "1.3.1"  # Current software version (minor) for selecting which models to use in the backend.
     _software_medical_specialty = "neurology"  # Overall medical target [neurology, thoracic]
+    _backend_workers = None  # Pool of warm processes running the RADS backend, shared by all pipeline executions
+    _results_cache = None  # Local cache of the backend results, for skipping identical executions
+    _dicom_index = None  # Local index of the DICOM folders already scanned, for faster repeated imports
+    _save_queue = None  # Background writer for the patients and studies, to keep the interface responsive
 
     @staticmethod
     def getInstance():
@@ -109,6 +117,133 @@ class SoftwareConfigResources:
     def get_session_log_filename(self):
         return self._session_log_filename
 
+    def get_backend_workers(self) -> BackendWorkerPool:
+        """
+        Access to the pool of backend processes, which is started on first access if not already running.
+        """
+        if self._backend_workers is None or not self._backend_workers.is_running():
+            self.start_backend_workers()
+        return self._backend_workers
+
+    def start_backend_workers(self, workers_number: int = None) -> None:
+        """
+        Spawns the pool of processes running the RADS backend, sized according to the user preferences. Any previously
+        running pool is stopped beforehand, for the new preferences to be taken into account.
+
+        Parameters
+        ----------
+        workers_number: int
+            Number of backend processes to spawn, to override the user preferences (e.g., for the batch mode).
+        """
+        self.stop_backend_workers()
+        if workers_number is None:
+            workers_number = UserPreferencesStructure.getInstance().backend_workers_number
+        try:
+            self._backend_workers = BackendWorkerPool(
+                workers_number=workers_number,
+                max_tasks_per_worker=UserPreferencesStructure.getInstance().backend_max_tasks_per_worker,
+                max_memory_per_worker=UserPreferencesStructure.getInstance().backend_max_memory_per_worker)
+            self._backend_workers.start()
+        except Exception as e:
+            raise RuntimeError("Starting the backend workers failed with: {}".format(e))
+
+    def ensure_backend_workers(self, workers_number: int) -> BackendWorkerPool:
+        """
+        Makes sure the pool of backend processes can run at least workers_number pipelines concurrently, adding workers
+        to the running pool if needed such that the pipelines already in progress are not interrupted.
+        """
+        workers_number = max(workers_number, UserPreferencesStructure.getInstance().backend_workers_number)
+        if self._backend_workers is None or not self._backend_workers.is_running():
+            self.start_backend_workers(workers_number)
+        else:
+            try:
+                self._backend_workers.add_workers(workers_number)
+            except Exception as e:
+                raise RuntimeError("Adding backend workers failed with: {}".format(e))
+        return self._backend_workers
+
+    def stop_backend_workers(self) -> None:
+        """
+        Tears down the pool of processes running the RADS backend, to be called when exiting the software.
+        """
+        if self._backend_workers is not None:
+            self._backend_workers.stop()
+            self._backend_workers = None
+
+    def get_results_cache(self) -> PipelineResultsCache:
+        """
+        Access to the local cache of backend results, located inside the .raidionics folder and bounded in size
+        according to the user preferences.
+        """
+        if self._results_cache is None:
+            self._results_cache = PipelineResultsCache(cache_folder=os.path.join(self._software_home_location,
+                                                                                 'cache', 'results'),
+                                                       max_size=UserPreferencesStructure.getInstance().results_cache_size)
+        elif self._results_cache.max_size != UserPreferencesStructure.getInstance().results_cache_size:
+            self._results_cache.max_size = UserPreferencesStructure.getInstance().results_cache_size
+        return self._results_cache
+
+    def get_dicom_index(self) -> DICOMIndex:
+        """
+        Access to the local index of the DICOM folders already scanned, located inside the .raidionics folder.
+        """
+        if self._dicom_index is None:
+            self._dicom_index = DICOMIndex(index_filename=os.path.join(self._software_home_location, 'cache',
+                                                                       'dicom_index.sqlite'))
+        return self._dicom_index
+
+    def close_dicom_index(self) -> None:
+        """
+        Closes the local index of the DICOM folders, to be called when exiting the software.
+        """
+        if self._dicom_index is not None:
+            self._dicom_index.close()
+            self._dicom_index = None
+
+    def get_save_queue(self) -> SaveQueue:
+        """
+        Access to the background writer, shared by all patients and studies.
+        """
+        if self._save_queue is None:
+            self._save_queue = SaveQueue()
+        return self._save_queue
+
+    def stop_save_queue(self) -> None:
+        """
+        Waits for all requested saves to be written on disk, to be called when exiting the software.
+        """
+        if self._save_queue is not None:
+            self._save_queue.stop()
+            self._save_queue = None
+
+    def request_patient_save(self, uid: str) -> None:
+        """
+        Saves the patient on disk in the background, returning immediately. Successive requests for the same patient
+        are coalesced if the previous one has not been processed yet.
+
+        Parameters
+        ----------
+        uid: str
+            Internal unique identifier for the patient to save.
+        """
+        patient = self.patients_parameters[uid]
+        self.get_save_queue().request_save(key='Patient_' + uid, save_function=patient.save_patient,
+                                           description=patient.display_name)
+
+    def request_study_save(self, uid: str) -> None:
+        """
+        Saves the study on disk in the background, returning immediately. Successive requests for the same study
+        are coalesced if the previous one has not been processed yet.
+
+        Parameters
+        ----------
+        uid: str
+            Internal unique identifier for the study to save.
+        """
+        study = self.study_parameters[uid]
+        self.get_save_queue().request_save(key='Study_' + uid, save_function=study.save,
+                                           description=study.display_name)
+
     def get_accepted_image_formats(self) -> list:
         return self.accepted_image_format
 
@@ -159,6 +294,9 @@ class SoftwareConfigResources:
         patient_id = None
         logging.debug("Patient loading requested from {}.".format(filename))
         try:
+            if self._save_queue is not None:
+                # The scene file might still be written in the background, if the patient was just closed.
+                self._save_queue.flush()
             patient_instance = PatientParameters(dest_location=UserPreferencesStructure.getInstance().user_home_location,
                                                  patient_filename=filename)
             _ = patient_instance.import_patient(filename)
@@ -324,6 +462,9 @@ class SoftwareConfigResources:
         logging.info("Study loading requested from {}.".format(filename))
         try:
             study_id = None
+            if self._save_queue is not None:
+                # The study file might still be written in the background, if the study was just closed.
+                self._save_queue.flush()
             study_instance = StudyParameters(study_filename=filename)
             error_message = study_instance.import_study(filename)
             # To prevent the save changes dialog to pop-up straight up after loading a patient scene file.
@@ -1,14 +1,23 @@
+import hashlib
+import json
 import logging
 import shutil
 
 from copy import deepcopy
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Tuple
 import time
 from aenum import Enum, unique
 from typing import Union
 import os
 import SimpleITK as sitk
 import numpy as np
+import nibabel as nib
+from concurrent.futures import ThreadPoolExecutor
+from nibabel.processing import resample_to_output, vox2out_vox
+from scipy import ndimage
+
+from utils.data_structures.UserPreferencesStructure import UserPreferencesStructure
+from utils.logic.ResamplingGridCache import ResamplingGridCache
 
 
 def get_type_from_string(enum_type: Enum, string: str) -> Union[str, int]:
@@ -40,6 +49,8 @@ def input_file_category_disambiguation(input_filename: str) -> str:
     Identifying whether the volume stored on disk under input_filename contains a raw MRI volume or is an integer-like
     volume with labels.
     The category belongs to [MRI, Annotation].
+    Nifti files are streamed by slabs from disk, such that for most MRI volumes only the first slabs are decoded before
+    reaching a decision. Other formats are fully read with SimpleITK beforehand.
 
     Parameters
     ----------
@@ -51,25 +62,108 @@ def input_file_category_disambiguation(input_filename: str) -> str:
     str
         Human-readable category identified for the input.
     """
-    category = None
     try:
+        if input_filename.endswith('.nii') or input_filename.endswith('.nii.gz'):
+            # Keeping the file open, for the gzip stream to be read sequentially across slabs.
+            image_nib = nib.load(input_filename, keep_file_open=True)
+            return volume_chunks_category_disambiguation(get_nifti_volume_chunks(image_nib))
         reader = sitk.ImageFileReader()
         reader.SetFileName(input_filename)
         image = reader.Execute()
-        image_type = image.GetPixelIDTypeAsString()
-        array = sitk.GetArrayFromImage(image)
+        return input_volume_category_disambiguation(sitk.GetArrayViewFromImage(image))
     except Exception as e:
         raise ValueError("Loading the input following input file {} with SimpleITK failed with: \n{}".format(input_filename, e))
 
-    if len(np.unique(array)) > 255 or np.max(array) > 255 or np.min(array) < -1:
-        category = "MRI"
-    # If the input radiological volume has values within [0, 255] only. Empirical solution for now, since less than
-    # 10 classes are usually handle at any given time.
-    elif len(np.unique(array)) >= 25:
-        category = "MRI"
-    else:
-        category = "Annotation"
-    return category
+
+def input_volume_category_disambiguation(volume: np.ndarray) -> str:
+    """
+    Identifying whether the volume content is a raw MRI volume or is an integer-like volume with labels, c.f.
+    volume_chunks_category_disambiguation.
+
+    Parameters
+    ----------
+    volume: np.ndarray
+        Content of the volume to disambiguate.
+
+    Returns
+    ----------
+    str
+        Human-readable category identified for the input, from [MRI, Annotation].
+    """
+    return volume_chunks_category_disambiguation(get_volume_chunks(volume))
+
+
+def get_volume_chunks(volume: np.ndarray, chunk_size: int = 2 ** 20) -> Iterator[np.ndarray]:
+    """
+    Iterates over the voxels of the volume by chunks of chunk_size voxels, in memory order.
+    """
+    flat_volume = np.ravel(volume, order='K')
+    for i in range(0, flat_volume.size, chunk_size):
+        yield flat_volume[i:i + chunk_size]
+
+
+def get_nifti_volume_chunks(image_nib: nib.Nifti1Image, chunk_size: int = 2 ** 20) -> Iterator[np.ndarray]:
+    """
+    Iterates over the voxels of a nifti volume by slabs along its last axis, each slab holding around chunk_size
+    voxels, such that only the slabs actually used are read from disk.
+    """
+    shape = image_nib.shape
+    if len(shape) == 0 or np.prod(shape) == 0:
+        return
+    slab_size = max(1, chunk_size // max(1, int(np.prod(shape[:-1]))))
+    for i in range(0, shape[-1], slab_size):
+        yield np.asanyarray(image_nib.dataobj[..., i:i + slab_size])
+
+
+def volume_chunks_category_disambiguation(chunks: Iterable[np.ndarray]) -> str:
+    """
+    Single pass classification of a volume streamed by chunks, as MRI if any value lies outside [-1, 255] or if at
+    least 25 distinct values are found, and as Annotation otherwise (i.e., less than 10 classes are usually handled at
+    any given time). The iteration stops as soon as the volume is identified as MRI.
+    The distinct values are counted without sorting, the integral ones being recorded in a presence table over
+    [-1, 255] and the other ones in a set which never exceeds 25 elements. The type of the chunks (i.e., the type from
+    the header after scaling) is checked first, to skip the range check for types fitting inside [-1, 255] and the
+    check for non-integral values for integer types.
+
+    Parameters
+    ----------
+    chunks: Iterable[np.ndarray]
+        Content of the volume, by chunks.
+
+    Returns
+    ----------
+    str
+        Human-readable category identified for the input, from [MRI, Annotation].
+    """
+    max_labels = 25
+    integral_values = np.zeros(257, dtype=bool)  # Presence of each integer value in [-1, 255], shifted by one
+    other_values = set()  # Non-integral values found so far
+    for chunk in chunks:
+        if chunk.size == 0:
+            continue
+        integer_type = chunk.dtype.kind in 'biu'
+        bounded_type = chunk.dtype.kind == 'b' or (integer_type and np.iinfo(chunk.dtype).min >= -1 and
+                                                   np.iinfo(chunk.dtype).max <= 255)
+        if not bounded_type and (np.max(chunk) > 255 or np.min(chunk) < -1):
+            return "MRI"
+
+        if integer_type and chunk.dtype.kind in 'bu':
+            integral_values[np.flatnonzero(np.bincount(chunk.ravel())) + 1] = True
+        elif integer_type:
+            integral_values[np.bincount(chunk.ravel().astype(np.intp) + 1, minlength=257) != 0] = True
+        else:
+            rounded = chunk.astype(np.int16)
+            if np.array_equal(rounded, chunk):
+                integral_values[np.bincount(rounded.ravel().astype(np.intp) + 1, minlength=257) != 0] = True
+            else:
+                values = np.unique(chunk)
+                integral = values == np.floor(values)
+                integral_values[values[integral].astype(np.intp) + 1] = True
+                other_values.update(values[~integral].tolist())
+
+        if np.count_nonzero(integral_values) + len(other_values) >= max_labels:
+            return "MRI"
+    return "Annotation"
 
 
 def input_file_type_conversion(input_filename: str, output_folder: str) -> str:
@@ -101,6 +195,66 @@ def input_file_type_conversion(input_filename: str, output_folder: str) -> str:
     return filename
 
 
+def save_input_image(input_image: nib.Nifti1Image, input_filename: str, output_folder: str) -> str:
+    """
+    Counterpart of input_file_type_conversion for a volume only existing in memory (e.g., converted from a DICOM
+    series), which is saved once as nifti inside the output folder.
+
+    Parameters
+    ----------
+    input_image: nib.Nifti1Image
+        Content of the volume to save.
+    input_filename: str
+        Nominal filename for the volume, only its basename is used.
+    output_folder: str
+        Destination folder on disk.
+
+    Returns
+    -------
+    str
+        Disk location where the volume has been saved.
+    """
+    filename = os.path.join(output_folder, os.path.basename(input_filename))
+    while os.path.exists(filename):
+        filename = os.path.join(output_folder, str(np.random.randint(0, 10000)) + "_" +
+                                os.path.basename(input_filename))
+    nib.save(input_image, filename)
+    return filename
+
+
+def convert_sitk_image_to_nibabel(image: sitk.Image) -> nib.Nifti1Image:
+    """
+    In-memory equivalent of saving a 3D SimpleITK image as nifti and reading it back with nibabel, i.e. going from the
+    ITK (LPS) to the nifti (RAS) world coordinates.
+
+    Parameters
+    ----------
+    image: sitk.Image
+        Volume to convert, e.g., as read from a DICOM series.
+
+    Returns
+    -------
+    nib.Nifti1Image
+        Converted volume, with the same voxel values and type.
+    """
+    if image.GetDimension() != 3:
+        raise ValueError("Only 3D images can be converted, got a {}D image.".format(image.GetDimension()))
+    lps_to_ras = np.diag([-1., -1., 1.])
+    direction = np.asarray(image.GetDirection()).reshape(3, 3)
+    affine = np.eye(4)
+    affine[:3, :3] = lps_to_ras @ direction @ np.diag(image.GetSpacing())
+    affine[:3, 3] = lps_to_ras @ np.asarray(image.GetOrigin())
+
+    # SimpleITK arrays are indexed as [z, y, x] (and components last for vector images)
+    array = sitk.GetArrayFromImage(image)
+    axes = (2, 1, 0) if array.ndim == 3 else (2, 1, 0) + tuple(range(3, array.ndim))
+    image_nib = nib.Nifti1Image(np.transpose(array, axes), affine)
+    image_nib.set_qform(affine, code=1)
+    image_nib.set_sform(affine, code=1)
+    image_nib.header.set_xyzt_units('mm', 'sec')
+    return image_nib
+
+
 def dicom_write_slice(writer: sitk.ImageFileWriter, series_tag_values: List[Tuple[str, str]], new_img: sitk.Image,
                       i: int, dest_dir: str) -> None:
     """
@@ -179,4 +333,472 @@ def folder_eligibility_check(folder_path: str) -> bool:
         return False
     if folder_name != ".raidionics" and folder_name.startswith('.'):
         return False
-    return True
\ No newline at end of file
+    return True
+
+
+def compute_file_hash(filename: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Computes the SHA-256 digest of a file content, read by chunks to keep a low memory footprint on large volumes.
+
+    Parameters
+    ----------
+    filename: str
+        Full filepath to the file to hash.
+    chunk_size: int
+        Number of bytes read at once.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_dict_hash(content: dict) -> str:
+    """
+    Computes the SHA-256 digest of a json-serializable dictionary, independently of the keys ordering.
+    """
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def stage_file(src: str, dst: str) -> str:
+    """
+    Makes the source file available at the destination location without duplicating its content on disk whenever
+    possible. A hard link is attempted first (same filesystem only), then a symbolic link (might require specific
+    privileges on Windows), and the file is copied as a last resort.
+    The staged files must be considered read-only, as editing a linked file in-place alters the source file.
+
+    Parameters
+    ----------
+    src: str
+        Full filepath to the existing file.
+    dst: str
+        Full filepath where the file should be made available.
+
+    Returns
+    -------
+    str
+        Staging method used, from ["hardlink", "symlink", "copy"].
+    """
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except (OSError, NotImplementedError):
+        pass
+    try:
+        os.symlink(os.path.abspath(src), dst)
+        return "symlink"
+    except (OSError, NotImplementedError):
+        pass
+    shutil.copyfile(src=src, dst=dst)
+    return "copy"
+
+
+def remove_staged_folder(folder: str) -> None:
+    """
+    Removes a folder populated with stage_file, only unlinking the staged files and never following symbolic links,
+    such that the source files are left untouched.
+
+    Parameters
+    ----------
+    folder: str
+        Full path to the folder to remove.
+    """
+    if os.path.islink(folder):
+        os.unlink(folder)
+        return
+    for root, dirs, files in os.walk(folder, topdown=False, followlinks=False):
+        for f in files:
+            os.unlink(os.path.join(root, f))
+        for d in dirs:
+            if os.path.islink(os.path.join(root, d)):
+                os.unlink(os.path.join(root, d))
+            else:
+                os.rmdir(os.path.join(root, d))
+    os.rmdir(folder)
+
+
+def get_compact_volume_data(image_nib: nib.Nifti1Image, labels: bool = False) -> np.ndarray:
+    """
+    Retrieves the content of a nifti image in a compact dtype, rather than the float64 array given by get_fdata.
+    Label volumes (e.g., annotations, atlases) are stored in the smallest unsigned integer type able to hold all
+    labels (i.e., uint8 in most cases), while intensity volumes keep their on-disk integer dtype (e.g., int16) when
+    no intensity scaling is specified, and are otherwise stored in float32.
+
+    Parameters
+    ----------
+    image_nib: nib.Nifti1Image
+        Nifti image, either loaded from disk or computed in memory (e.g., after resampling).
+    labels: bool
+        True if the volume contains labels, False if it contains intensities.
+
+    Returns
+    -------
+    np.ndarray
+        Volume content in a compact dtype.
+    """
+    data = np.asanyarray(image_nib.dataobj)
+    if labels:
+        max_label = int(np.max(data)) if data.size != 0 else 0
+        return data.astype(np.min_scalar_type(max(max_label, 0)), copy=False)
+    if data.dtype == np.float64:
+        return data.astype(np.float32)
+    return data
+
+
+def save_resampled_volume(volume: np.ndarray, filepath: str, affine) -> None:
+    """
+    Dumps on disk a volume internally computed by the software (e.g., resampled input). The format is decided by the
+    filepath extension: raw numpy binary (.npy) kept at the volume dtype and uncompressed for direct memory-mapping
+    when reloading, or nifti otherwise.
+
+    Parameters
+    ----------
+    volume: np.ndarray
+        Array to save on disk.
+    filepath: str
+        Destination filepath, either with a .npy extension or any nifti extension (.nii, .nii.gz).
+    affine: list
+        Affine matrix to use in case of saving in nifti format.
+    """
+    if filepath.endswith('.npy'):
+        tmp_filepath = filepath[:-len('.npy')] + '_tmp.npy'
+        np.save(tmp_filepath, np.ascontiguousarray(volume))
+        os.replace(tmp_filepath, filepath)
+    else:
+        nib.save(nib.Nifti1Image(volume, affine=affine), filepath)
+
+
+def load_resampled_volume(filepath: str, labels: bool = False) -> np.ndarray:
+    """
+    Reloads a volume saved with save_resampled_volume. Raw numpy binaries are memory-mapped in read-only mode, such
+    that reloading is close to instantaneous and only the parts of the volume actually accessed are read from disk.
+    Nifti files are fully decompressed in memory, see get_compact_volume_data.
+
+    Parameters
+    ----------
+    filepath: str
+        Location on disk of the volume.
+    labels: bool
+        True if the volume contains labels, False if it contains intensities, only used for nifti files.
+
+    Returns
+    -------
+    np.ndarray
+        Volume content, as a read-only np.memmap for .npy files, or in a compact dtype for nifti files.
+    """
+    if filepath.endswith('.npy'):
+        return np.load(filepath, mmap_mode='r')
+    return get_compact_volume_data(nib.load(filepath), labels=labels)
+
+
+def get_resampled_volume_extension() -> str:
+    """
+    File extension to use for the volumes internally computed by the software, according to the user preferences.
+    """
+    if UserPreferencesStructure.getInstance().memory_mapped_volumes:
+        return '.npy'
+    return '.nii.gz'
+
+
+def get_contrast_window_lut(dtype: np.dtype, window_min: int, window_max: int) -> np.ndarray:
+    """
+    Lookup table mapping every value of a (u)int8 or (u)int16 dtype to its uint8 display intensity for the given
+    contrast window. The table is ordered by the unsigned bit pattern of the values, such that it can be indexed with
+    an unsigned view of the volume.
+    """
+    unsigned_type = np.dtype('uint{}'.format(8 * np.dtype(dtype).itemsize))
+    values = np.arange(2 ** (8 * unsigned_type.itemsize), dtype=unsigned_type).view(dtype).astype(np.int64)
+    np.clip(values, window_min, window_max, out=values)
+    if (window_max - window_min) != 0:
+        return ((values - window_min) / (window_max - window_min) * 255.).astype('uint8')
+    return values.astype('uint8')
+
+
+def apply_contrast_window(volume: np.ndarray, window_min: int, window_max: int, out: np.ndarray = None,
+                          work_buffer: np.ndarray = None) -> np.ndarray:
+    """
+    Scales the intensities of a volume to uint8 according to a contrast window, where intensities below (resp. above)
+    the window are set to 0 (resp. 255). No full-size temporary array is allocated when the output and work buffers
+    are provided, such that the contrast can be modified interactively.
+    Volumes with up to 16-bit integer intensities (e.g., int16 MRI) are converted in a single pass through a lookup
+    table, other volumes (e.g., float32) are clipped and rescaled in place inside the work buffer.
+
+    Parameters
+    ----------
+    volume: np.ndarray
+        Intensity volume to scale, left untouched.
+    window_min: int
+        Lower boundary of the contrast window.
+    window_max: int
+        Upper boundary of the contrast window.
+    out: np.ndarray
+        Preallocated uint8 array with the same shape as the volume, in which the result is written. A new array is
+        allocated if None.
+    work_buffer: np.ndarray
+        Preallocated floating-point array with the same shape as the volume, only used for volumes which cannot be
+        converted through a lookup table. A new array is allocated if None, see get_contrast_window_work_buffer.
+
+    Returns
+    -------
+    np.ndarray
+        The uint8 scaled volume, i.e., out if provided.
+    """
+    if out is None:
+        out = np.empty(volume.shape, dtype='uint8')
+    if volume.dtype.kind in ['i', 'u'] and volume.dtype.itemsize <= 2:
+        lut = get_contrast_window_lut(volume.dtype, window_min, window_max)
+        indices = volume.view('uint{}'.format(8 * volume.dtype.itemsize))
+        # Indexing by slabs, as numpy converts the whole indices array to int64 otherwise
+        slab_size = max(1, 2 ** 20 // max(1, int(np.prod(volume.shape[1:]))))
+        for i in range(0, volume.shape[0], slab_size):
+            np.take(lut, indices[i:i + slab_size], out=out[i:i + slab_size], mode='clip')
+        return out
+
+    if work_buffer is None:
+        work_buffer = get_contrast_window_work_buffer(volume)
+    np.clip(volume, window_min, window_max, out=work_buffer)
+    if (window_max - window_min) != 0:
+        np.subtract(work_buffer, window_min, out=work_buffer)
+        np.divide(work_buffer, window_max - window_min, out=work_buffer)
+        np.multiply(work_buffer, 255., out=work_buffer)
+    np.copyto(out, work_buffer, casting='unsafe')
+    return out
+
+
+def get_contrast_window_work_buffer(volume: np.ndarray) -> Union[np.ndarray, None]:
+    """
+    Allocates the floating-point buffer needed by apply_contrast_window for the given volume, or returns None when the
+    volume is converted through a lookup table and does not need any.
+    """
+    if volume.dtype.kind in ['i', 'u'] and volume.dtype.itemsize <= 2:
+        return None
+    return np.empty(volume.shape, dtype=np.result_type(volume.dtype, np.float32))
+
+
+def get_output_axes_mapping(shape: Tuple[int, ...], affine: np.ndarray, tolerance: float = 1e-4) \
+        -> Union[None, Tuple[Tuple[int, ...], Tuple[bool, ...], Tuple[int, ...], np.ndarray]]:
+    """
+    Orientation analysis of a volume, identifying whether its resampling to the output voxel axes (i.e., as performed
+    by nibabel resample_to_output with unit voxel sizes) amounts to permuting and flipping its axes, which is the case
+    for volumes with unit spacing whose affine is axis-aligned. Each output voxel then falls exactly on an input voxel,
+    and no interpolation is needed.
+
+    Parameters
+    ----------
+    shape: Tuple[int, ...]
+        Shape of the volume, only 3D volumes are handled.
+    affine: np.ndarray
+        Voxel to world affine of the volume.
+    tolerance: float
+        Maximum deviation, in voxels, from an exact permutation of the axes.
+
+    Returns
+    -------
+    Tuple
+        (i) the input axis for each output axis, (ii) whether each output axis must be flipped, (iii) the output shape,
+        and (iv) the output affine, or None if an actual resampling is needed.
+    """
+    if len(shape) != 3:
+        return None
+    out_shape, out_affine = vox2out_vox((shape, affine))
+    try:
+        out_vox_to_in_vox = np.linalg.inv(affine).dot(out_affine)
+    except np.linalg.LinAlgError:
+        return None
+    rotation = out_vox_to_in_vox[:3, :3]
+    translation = out_vox_to_in_vox[:3, 3]
+    rounded_rotation = np.round(rotation)
+    if not np.allclose(rotation, rounded_rotation, rtol=0., atol=tolerance) \
+            or not np.array_equal(np.abs(rounded_rotation).sum(axis=0), [1, 1, 1]) \
+            or not np.array_equal(np.abs(rounded_rotation).sum(axis=1), [1, 1, 1]):
+        return None
+
+    permutation = tuple([int(np.argmax(np.abs(rounded_rotation[:, k]))) for k in range(3)])
+    flips = tuple([bool(rounded_rotation[permutation[k], k] < 0) for k in range(3)])
+    for k in range(3):
+        expected_translation = shape[permutation[k]] - 1 if flips[k] else 0
+        if abs(translation[permutation[k]] - expected_translation) > tolerance \
+                or out_shape[k] != shape[permutation[k]]:
+            return None
+    return permutation, flips, tuple(out_shape), out_affine
+
+
+def resample_to_output_space(image_nib: nib.Nifti1Image, order: int, threads: int = None) -> nib.Nifti1Image:
+    """
+    Resamples a volume to the output voxel axes with unit voxel sizes, as nibabel resample_to_output does. When the
+    volume is already isotropic and axis-aligned, which is the case for most pipeline outputs, the resampling is
+    performed by permuting and flipping the axes, without any interpolation. An actual resampling is performed
+    otherwise, split over multiple threads for linear interpolations, while nearest-neighbour interpolations of label
+    volumes reuse the sampling map shared by all volumes on the same grid.
+
+    Parameters
+    ----------
+    image_nib: nib.Nifti1Image
+        Volume to resample.
+    order: int
+        Order of the spline interpolation when an actual resampling is needed (e.g., 0 for labels, 1 for intensities).
+    threads: int
+        Number of threads for the actual resampling, None to use the value from the user preferences, and 1 to use the
+        single-threaded nibabel implementation.
+
+    Returns
+    -------
+    nib.Nifti1Image
+        The resampled volume.
+    """
+    mapping = get_output_axes_mapping(image_nib.shape, image_nib.affine)
+    if mapping is None:
+        if threads is None:
+            threads = UserPreferencesStructure.getInstance().get_resampling_threads()
+        if order == 0 and len(image_nib.shape) == 3:
+            return resample_labels_to_output_space(image_nib, threads)
+        if threads <= 1 or order > 1 or len(image_nib.shape) != 3:
+            return resample_to_output(image_nib, order=order)
+        out_shape, out_affine = vox2out_vox((image_nib.shape, image_nib.affine))
+        data = resample_volume_threaded(np.asanyarray(image_nib.dataobj),
+                                        np.linalg.inv(image_nib.affine).dot(out_affine), tuple(out_shape), order,
+                                        threads)
+        return nib.Nifti1Image(data, out_affine, image_nib.header)
+
+    permutation, flips, out_shape, out_affine = mapping
+    data = np.transpose(np.asanyarray(image_nib.dataobj), permutation)
+    data = data[tuple([slice(None, None, -1) if f else slice(None) for f in flips])]
+    return nib.Nifti1Image(np.ascontiguousarray(data), out_affine, image_nib.header)
+
+
+def resample_volume_threaded(volume: np.ndarray, out_vox_to_in_vox: np.ndarray, out_shape: Tuple[int, int, int],
+                             order: int, threads: int, cval: float = 0.) -> np.ndarray:
+    """
+    Resamples a 3D volume onto a new voxel grid, with the output grid split into slabs along its first axis which are
+    interpolated concurrently, scipy releasing the GIL while interpolating. Points outside of the input volume are set
+    to cval, 0 by default as done by nibabel resample_to_output.
+    The result matches the single-threaded scipy affine_transform up to floating-point rounding, which only impacts the
+    voxels lying exactly halfway between two input voxels for a nearest-neighbour interpolation.
+
+    Parameters
+    ----------
+    volume: np.ndarray
+        Input volume.
+    out_vox_to_in_vox: np.ndarray
+        4x4 affine mapping the output voxel coordinates to the input voxel coordinates.
+    out_shape: Tuple[int, int, int]
+        Shape of the output volume.
+    order: int
+        Order of the interpolation, either 0 (nearest-neighbour) or 1 (linear).
+    threads: int
+        Number of threads to use.
+    cval: float
+        Value for the points outside of the input volume.
+
+    Returns
+    -------
+    np.ndarray
+        The resampled volume, with the same dtype as the input volume.
+    """
+    if order > 1:
+        raise ValueError("Only nearest-neighbour and linear interpolations can be split, received order {}.".format(
+            order))
+    output = np.empty(out_shape, dtype=volume.dtype)
+    rotation = out_vox_to_in_vox[:3, :3]
+    translation = out_vox_to_in_vox[:3, 3]
+    # Several slabs per thread for balancing the load, as slabs outside of the input volume are faster to process
+    slab_size = max(1, int(np.ceil(out_shape[0] / (threads * 4))))
+
+    def resample_slab(start: int) -> None:
+        stop = min(start + slab_size, out_shape[0])
+        i = np.arange(start, stop, dtype=np.float64)[:, None, None]
+        j = np.arange(out_shape[1], dtype=np.float64)[None, :, None]
+        k = np.arange(out_shape[2], dtype=np.float64)[None, None, :]
+        coordinates = np.empty((3, stop - start, out_shape[1], out_shape[2]), dtype=np.float64)
+        for d in range(3):
+            coordinates[d] = rotation[d, 0] * i + rotation[d, 1] * j + rotation[d, 2] * k + translation[d]
+        ndimage.map_coordinates(volume, coordinates, output=output[start:stop], order=order, mode='constant',
+                                cval=cval)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(resample_slab, range(0, out_shape[0], slab_size)))
+    return output
+
+
+def compute_label_sampling_map(shape: Tuple[int, int, int], affine: np.ndarray, layout: str, threads: int) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Computes the nearest-neighbour sampling map from a 3D voxel grid to the output space, by resampling a volume
+    holding the flat index of each input voxel.
+
+    Parameters
+    ----------
+    shape: Tuple[int, int, int]
+        Shape of the input volume.
+    affine: np.ndarray
+        Voxel to world affine of the input volume.
+    layout: str
+        Memory layout of the input volumes the flat indices refer to, either 'C' or 'F'.
+    threads: int
+        Number of threads for the resampling, 1 to use the single-threaded scipy implementation as nibabel does.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The flat index of the input voxel for each output voxel, and the mask of the output voxels falling outside of
+        the input volume (whose index is set to 0), both with the output shape.
+    """
+    voxels = int(np.prod(shape))
+    index_dtype = np.int32 if voxels < np.iinfo(np.int32).max else np.int64
+    index_volume = np.arange(voxels, dtype=index_dtype).reshape(shape, order=layout)
+    out_shape, out_affine = vox2out_vox((shape, affine))
+    out_vox_to_in_vox = np.linalg.inv(affine).dot(out_affine)
+    if threads <= 1:
+        sampling_map = ndimage.affine_transform(index_volume, out_vox_to_in_vox[:3, :3], out_vox_to_in_vox[:3, 3],
+                                                tuple(out_shape), order=0, mode='constant', cval=-1)
+    else:
+        sampling_map = resample_volume_threaded(index_volume, out_vox_to_in_vox, tuple(out_shape), 0, threads,
+                                                cval=-1)
+    outside_mask = sampling_map < 0
+    sampling_map[outside_mask] = 0
+    sampling_map.setflags(write=False)
+    outside_mask.setflags(write=False)
+    return sampling_map, outside_mask
+
+
+def resample_labels_to_output_space(image_nib: nib.Nifti1Image, threads: int) -> nib.Nifti1Image:
+    """
+    Nearest-neighbour resampling of a 3D label volume to the output space, as nibabel resample_to_output with order 0
+    does, where each output voxel is gathered from the input volume through the sampling map of its voxel grid. The
+    sampling map is only computed for the first label volume on a given grid, and reused from the cache for the other
+    ones (e.g., the multiple annotations of a same MRI series).
+
+    Parameters
+    ----------
+    image_nib: nib.Nifti1Image
+        Label volume to resample.
+    threads: int
+        Number of threads for computing the sampling map when missing from the cache.
+
+    Returns
+    -------
+    nib.Nifti1Image
+        The resampled volume.
+    """
+    shape = tuple(image_nib.shape)
+    data = np.asanyarray(image_nib.dataobj)
+    # Gathering straight from the memory of the volume, i.e. Fortran-ordered when loaded from disk by nibabel
+    layout = 'F' if data.flags.f_contiguous and not data.flags.c_contiguous else 'C'
+    if not data.flags[layout + '_CONTIGUOUS']:
+        data = np.ascontiguousarray(data)
+    sampling_map, outside_mask = ResamplingGridCache.getInstance().get_sampling_map(
+        image_nib.affine, shape, layout, lambda: compute_label_sampling_map(shape, image_nib.affine, layout, threads))
+    flat_data = data.ravel(order=layout)
+    output = np.empty(sampling_map.shape, dtype=data.dtype)
+    # Gathering slab by slab, np.take converting the whole index array otherwise
+    for start in range(0, output.shape[0], 16):
+        np.take(flat_data, sampling_map[start:start + 16], out=output[start:start + 16])
+    output[outside_mask] = 0
+    _, out_affine = vox2out_vox((shape, image_nib.affine))
+    return nib.Nifti1Image(output, out_affine, image_nib.header)